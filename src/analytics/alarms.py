@@ -0,0 +1,180 @@
+import numpy as np
+from utils.tracing import traced
+
+RULE_TYPES = ('limite', 'taxa', 'estado')
+
+
+class AlarmRule:
+    # limite: valor fora de [limite_inferior, limite_superior]; taxa: mesma faixa aplicada à variação por hora;
+    # estado: valor igual a valor_estado. duracao (s) exige a condição contínua antes de disparar e
+    # histerese só normaliza quando o valor volta para dentro da faixa com essa folga
+    def __init__(self, id, nome, tabela, metrica, tipo, limite_inferior=None, limite_superior=None,
+                 histerese=0.0, duracao=0.0, valor_estado=None, severidade='media', chave=None):
+        if tipo not in RULE_TYPES:
+            raise ValueError(f"Tipo de regra desconhecido: {tipo}")
+        self.id = id
+        self.nome = nome
+        self.tabela = tabela
+        self.metrica = metrica
+        self.tipo = tipo
+        self.limite_inferior = limite_inferior
+        self.limite_superior = limite_superior
+        self.histerese = histerese or 0.0
+        self.duracao = duracao or 0.0
+        self.valor_estado = valor_estado
+        self.severidade = severidade
+        self.chave = chave
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(*row)
+
+    def compile(self):
+        # Devolve a função vetorizada que classifica cada amostra em fora (+1), normal (-1) ou indefinida (0)
+        if self.tipo == 'estado':
+            target = self.valor_estado
+
+            def classify(values, rates):
+                out = values == target
+                return np.where(out, 1, -1).astype(np.int8)
+            return classify
+
+        low, high, band = self.limite_inferior, self.limite_superior, self.histerese
+        use_rate = self.tipo == 'taxa'
+
+        def classify(values, rates):
+            x = rates if use_rate else values.astype(float)
+            out = np.zeros(len(x), dtype=bool)
+            clear = ~np.isnan(x)
+            with np.errstate(invalid='ignore'):
+                if high is not None:
+                    out |= x > high
+                    clear &= x <= high - band
+                if low is not None:
+                    out |= x < low
+                    clear &= x >= low + band
+            return np.where(out, 1, np.where(clear, -1, 0)).astype(np.int8)
+        return classify
+
+
+class _KeyState:
+    __slots__ = ('active', 'run_start', 'firing', 'last_value', 'last_time')
+
+    def __init__(self, active=False, run_start=np.nan, firing=False, last_value=np.nan, last_time=np.nan):
+        self.active = active
+        self.run_start = run_start
+        self.firing = firing
+        self.last_value = last_value
+        self.last_time = last_time
+
+
+def _forward_fill_index(defined):
+    # Índice da última posição "definida" até cada linha (np.maximum.accumulate faz o papel do laço)
+    index = np.where(defined, np.arange(len(defined)), 0)
+    return np.maximum.accumulate(index)
+
+
+class AlarmEngine:
+    def __init__(self, rules=()):
+        self.rules = {}
+        self.by_metric = {}
+        self.states = {}
+        for rule in rules:
+            self.add_rule(rule)
+
+    def add_rule(self, rule):
+        self.rules[rule.id] = (rule, rule.compile())
+        self.by_metric.setdefault((rule.tabela, rule.metrica), []).append(rule.id)
+
+    def metrics(self, tabela):
+        return sorted({metrica for (table, metrica) in self.by_metric if table == tabela})
+
+    def restore_open(self, rule_id, key, started_at):
+        # Alarmes abertos no banco voltam ao estado em memória: evita duplicar e permite normalizar depois
+        self.states[(rule_id, key)] = _KeyState(active=True, run_start=started_at, firing=True)
+
+    @traced('alarms.evaluate', 'data')
+    def evaluate(self, tabela, metrica, keys, times, values):
+        # Um lote de uma métrica: keys (TAG/chave), times (segundos) e values. Devolve eventos
+        # (instante, 'disparo' | 'normalizado', regra, chave, valor) em ordem de tempo
+        rule_ids = self.by_metric.get((tabela, metrica))
+        if not rule_ids or len(keys) == 0:
+            return []
+        keys = np.asarray(keys, dtype=str)
+        times = np.asarray(times, dtype=float)
+        values = np.asarray(values)
+        order = np.lexsort((times, keys))
+        keys, times, values = keys[order], times[order], values[order]
+
+        events = []
+        for rule_id in rule_ids:
+            rule, classify = self.rules[rule_id]
+            if rule.chave is not None:
+                mask = keys == rule.chave
+                if not mask.any():
+                    continue
+                events.extend(self._evaluate_rule(rule, classify, keys[mask], times[mask], values[mask]))
+            else:
+                events.extend(self._evaluate_rule(rule, classify, keys, times, values))
+        events.sort(key=lambda event: event[0])
+        return events
+
+    def _evaluate_rule(self, rule, classify, keys, times, values):
+        n = len(keys)
+        starts = np.ones(n, dtype=bool)
+        starts[1:] = keys[1:] != keys[:-1]
+        start_positions = np.flatnonzero(starts)
+        group_keys = keys[start_positions]
+        states = [self.states.get((rule.id, key)) or _KeyState() for key in group_keys]
+
+        rates = None
+        if rule.tipo == 'taxa':
+            numeric = values.astype(float)
+            prev_values = np.empty(n)
+            prev_times = np.empty(n)
+            prev_values[1:], prev_times[1:] = numeric[:-1], times[:-1]
+            prev_values[start_positions] = [state.last_value for state in states]
+            prev_times[start_positions] = [state.last_time for state in states]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                hours = (times - prev_times) / 3600.0
+                rates = np.where(hours > 0, (numeric - prev_values) / hours, np.nan)
+
+        # Histerese: amostras indefinidas (entre limite e limite - folga) herdam o estado anterior do mesmo grupo
+        signal = classify(values, rates)
+        carried_active = np.array([1 if state.active else -1 for state in states], dtype=np.int8)
+        first = signal[start_positions]
+        signal[start_positions] = np.where(first == 0, carried_active, first)
+        active = signal[_forward_fill_index(signal != 0)] > 0
+
+        # Duração: início de cada sequência ativa propagado até o fim dela
+        prev_active = np.empty(n, dtype=bool)
+        prev_active[1:] = active[:-1]
+        prev_active[start_positions] = carried_active > 0
+        run_begin = np.where(active & ~prev_active, times, np.nan)
+        carried_start = np.array([state.run_start for state in states])
+        continuing = active[start_positions] & prev_active[start_positions]
+        run_begin[start_positions[continuing]] = np.where(
+            np.isnan(carried_start[continuing]), times[start_positions[continuing]], carried_start[continuing])
+        run_start = run_begin[_forward_fill_index(~np.isnan(run_begin))]
+        firing = active & (times - run_start >= rule.duracao)
+
+        prev_firing = np.empty(n, dtype=bool)
+        prev_firing[1:] = firing[:-1]
+        prev_firing[start_positions] = [state.firing for state in states]
+        raised = np.flatnonzero(firing & ~prev_firing)
+        cleared = np.flatnonzero(~firing & prev_firing)
+
+        end_positions = np.append(start_positions[1:] - 1, n - 1)
+        for key, end in zip(group_keys, end_positions):
+            self.states[(rule.id, key)] = _KeyState(
+                active=bool(active[end]),
+                run_start=float(run_start[end]) if active[end] else np.nan,
+                firing=bool(firing[end]),
+                last_value=float(values[end]) if rule.tipo == 'taxa' else np.nan,
+                last_time=float(times[end]),
+            )
+
+        reported = rates if rule.tipo == 'taxa' else values
+        events = [(times[i], 'disparo', rule, keys[i], reported[i]) for i in raised]
+        events.extend((times[i], 'normalizado', rule, keys[i], reported[i]) for i in cleared)
+        return events
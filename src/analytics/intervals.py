@@ -0,0 +1,109 @@
+import numpy as np
+
+
+class IntervalIndex:
+    # Intervalos (início, fim) agrupados por raia (TAG) em arrays ordenados: raia a raia, por início.
+    # Para cada raia guarda também o máximo acumulado dos fins, que é monótono; com ele e os inícios
+    # ordenados, os intervalos que tocam [x0, x1) saem com duas buscas binárias, sem percorrer a raia
+    def __init__(self, lanes, starts, ends, flags=None):
+        lanes = np.asarray(lanes)
+        starts = np.asarray(starts, dtype=np.float64)
+        ends = np.maximum(np.asarray(ends, dtype=np.float64), starts)
+        flags = np.zeros(len(starts), dtype=bool) if flags is None else np.asarray(flags, dtype=bool)
+
+        self.lanes, codes = np.unique(lanes, return_inverse=True)
+        order = np.lexsort((starts, codes))
+        self.codes = codes[order]
+        self.starts = starts[order]
+        self.ends = ends[order]
+        self.flags = flags[order]
+        self.rows = order
+        self.offsets = np.searchsorted(self.codes, np.arange(len(self.lanes) + 1))
+
+        # Máximo acumulado dos fins dentro de cada raia: reinicia no começo de cada uma
+        self.reach = self.ends.copy()
+        for lane in range(len(self.lanes)):
+            lo, hi = self.offsets[lane], self.offsets[lane + 1]
+            np.maximum.accumulate(self.reach[lo:hi], out=self.reach[lo:hi])
+
+    def __len__(self):
+        return len(self.starts)
+
+    def extend(self, lanes, starts, ends, flags=None):
+        # Acrescenta intervalos sem reordenar tudo: cada novo entra na sua raia por busca binária e o máximo
+        # acumulado é refeito só nas raias tocadas. Os novos recebem rows len(self), len(self) + 1, ... na
+        # ordem em que chegaram, como se tivessem sido passados no construtor depois dos antigos
+        lanes = np.asarray(lanes)
+        starts = np.asarray(starts, dtype=np.float64)
+        ends = np.maximum(np.asarray(ends, dtype=np.float64), starts)
+        flags = np.zeros(len(starts), dtype=bool) if flags is None else np.asarray(flags, dtype=bool)
+        if not len(starts):
+            return
+        rows = np.arange(len(self), len(self) + len(starts))
+
+        names = np.union1d(self.lanes, lanes)
+        if len(names) != len(self.lanes):
+            # TAG nova: os códigos das raias existentes mudam de posição na lista ordenada
+            self.codes = np.searchsorted(names, self.lanes)[self.codes]
+            self.lanes = names
+        codes = np.searchsorted(self.lanes, lanes)
+        order = np.lexsort((starts, codes))
+        codes, starts, ends, flags, rows = codes[order], starts[order], ends[order], flags[order], rows[order]
+
+        offsets = np.searchsorted(self.codes, np.arange(len(self.lanes) + 1))
+        positions = np.empty(len(codes), dtype=np.int64)
+        touched = np.unique(codes)
+        for lane in touched:
+            mask = codes == lane
+            lo, hi = offsets[lane], offsets[lane + 1]
+            positions[mask] = lo + np.searchsorted(self.starts[lo:hi], starts[mask], side='right')
+
+        self.codes = np.insert(self.codes, positions, codes)
+        self.starts = np.insert(self.starts, positions, starts)
+        self.ends = np.insert(self.ends, positions, ends)
+        self.flags = np.insert(self.flags, positions, flags)
+        self.rows = np.insert(self.rows, positions, rows)
+        self.reach = np.insert(self.reach, positions, ends)
+        self.offsets = np.searchsorted(self.codes, np.arange(len(self.lanes) + 1))
+        for lane in touched:
+            lo, hi = self.offsets[lane], self.offsets[lane + 1]
+            self.reach[lo:hi] = np.maximum.accumulate(self.ends[lo:hi])
+
+    def bounds(self):
+        if not len(self.starts):
+            return None
+        return float(self.starts.min()), float(self.ends.max())
+
+    def visible(self, lane, x0, x1):
+        # Fatia [lo, hi) da raia com intervalos que podem tocar [x0, x1): início < x1 e algum fim anterior > x0
+        base, top = self.offsets[lane], self.offsets[lane + 1]
+        lo = base + int(np.searchsorted(self.reach[base:top], x0, side='right'))
+        hi = base + int(np.searchsorted(self.starts[base:top], x1, side='left'))
+        return lo, max(lo, hi)
+
+    def blocks(self, lane, x0, x1, min_gap=0.0):
+        # Intervalos visíveis da raia com nível de detalhe: vizinhos separados por menos de min_gap
+        # (tipicamente um pixel em unidades de dados) viram um bloco só.
+        # Devolve (inícios, fins, quantidade de intervalos, algum marcado) por bloco
+        lo, hi = self.visible(lane, x0, x1)
+        starts, ends = self.starts[lo:hi], self.ends[lo:hi]
+        keep = ends > x0
+        starts, ends, flags = starts[keep], ends[keep], self.flags[lo:hi][keep]
+        if not len(starts):
+            empty = np.empty(0)
+            return empty, empty, np.empty(0, dtype=np.int64), np.empty(0, dtype=bool)
+        reach = np.maximum.accumulate(ends)
+        breaks = np.flatnonzero(np.r_[True, starts[1:] - reach[:-1] > min_gap])
+        counts = np.diff(np.r_[breaks, len(starts)])
+        return (starts[breaks], np.maximum.reduceat(ends, breaks), counts,
+                np.logical_or.reduceat(flags, breaks))
+
+    def at(self, lane, x, tolerance=0.0):
+        # Posições (no índice) dos intervalos da raia que contêm x, com folga de 'tolerance' para cada lado
+        lo, hi = self.visible(lane, x - tolerance, x + tolerance)
+        hits = lo + np.flatnonzero(self.ends[lo:hi] >= x - tolerance)
+        return hits
+
+    def memory_bytes(self):
+        return int(sum(array.nbytes for array in (self.codes, self.starts, self.ends, self.flags, self.rows,
+                                                  self.offsets, self.reach)))
@@ -0,0 +1,149 @@
+import numpy as np
+from utils.tracing import traced
+
+INPUT_METRICS = {
+    'UmidadeSoja': 'Umidade da Soja (%)',
+    'ImpurezasSoja': 'Impurezas da Soja (%)',
+    'ProteinaBrutaSoja': 'Proteína Bruta da Soja (%)',
+}
+
+OUTPUT_METRICS = {
+    'UmidadeFarelo': 'Umidade do Farelo (%)',
+    'ProteinaBrutaFarelo': 'Proteína Bruta do Farelo (%)',
+    'GorduraFarelo': 'Gordura do Farelo (%)',
+}
+
+
+class QualityCorrelation:
+    def __init__(self, db_handler):
+        self.db_handler = db_handler
+        self.dates = np.array([], dtype='datetime64[D]')
+        self.series = {}
+        self._cross_cache = {}
+
+    @traced('quality.load', 'data')
+    def load(self):
+        # Uma única ida ao banco por tabela; lag e janela são recalculados sobre os arrays em memória
+        try:
+            soja = self.db_handler.read(f"SELECT Data, {', '.join(INPUT_METRICS)} FROM ProducaoSoja ORDER BY Data")
+            farelo = self.db_handler.read(f"SELECT Data, {', '.join(OUTPUT_METRICS)} FROM FareloSojaTostado ORDER BY Data")
+        except Exception as e:
+            print(f"Erro ao buscar dados de qualidade: {e}")
+            soja, farelo = [], []
+
+        self._cross_cache.clear()
+        self.series = {}
+        if not soja and not farelo:
+            self.dates = np.array([], dtype='datetime64[D]')
+            return
+
+        soja_dates = np.array([r[0][:10] for r in soja], dtype='datetime64[D]')
+        farelo_dates = np.array([r[0][:10] for r in farelo], dtype='datetime64[D]')
+        all_dates = np.concatenate([soja_dates, farelo_dates])
+        start, end = all_dates.min(), all_dates.max()
+        self.dates = np.arange(start, end + np.timedelta64(1, 'D'), dtype='datetime64[D]')
+
+        self._place_daily(soja_dates, soja, INPUT_METRICS, start)
+        self._place_daily(farelo_dates, farelo, OUTPUT_METRICS, start)
+
+    def _place_daily(self, dates, rows, metrics, start):
+        # Calendário diário contínuo: dias sem leitura ficam NaN e vários registros no mesmo dia viram média
+        size = len(self.dates)
+        positions = (dates - start).astype(np.int64)
+        values = np.array([r[1:] for r in rows], dtype=float).reshape(len(rows), len(metrics))
+        counts = np.bincount(positions, minlength=size).astype(float)
+        for col, name in enumerate(metrics):
+            column = values[:, col]
+            valid = ~np.isnan(column)
+            sums = np.bincount(positions[valid], weights=column[valid], minlength=size)
+            valid_counts = np.bincount(positions[valid], minlength=size).astype(float)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                daily = sums / valid_counts
+            daily[counts == 0] = np.nan
+            self.series[name] = daily
+
+    def clear(self):
+        self.dates = np.array([], dtype='datetime64[D]')
+        self.series = {}
+        self._cross_cache.clear()
+
+    def is_empty(self):
+        return len(self.dates) == 0
+
+    def aligned(self, input_metric, output_metric, lag):
+        # Entrada do dia t contra saída do dia t + lag; fatias são views, sem cópia
+        x = self.series[input_metric]
+        y = self.series[output_metric]
+        n = len(x)
+        if lag >= 0:
+            return self.dates[:n - lag], x[:n - lag], y[lag:]
+        return self.dates[-lag:], x[-lag:], y[:n + lag]
+
+    @traced('quality.rolling_correlation', 'data')
+    def rolling_correlation(self, input_metric, output_metric, lag, window, min_periods=None):
+        dates, x, y = self.aligned(input_metric, output_metric, lag)
+        if min_periods is None:
+            min_periods = max(3, window // 2)
+        if len(x) == 0:
+            return dates, np.array([])
+
+        mask = ~(np.isnan(x) | np.isnan(y))
+        if not mask.any():
+            return dates, np.full(len(x), np.nan)
+        # Centralizar reduz o cancelamento numérico das somas acumuladas
+        xc = np.where(mask, x - x[mask].mean(), 0.0)
+        yc = np.where(mask, y - y[mask].mean(), 0.0)
+
+        def windowed(values):
+            csum = np.concatenate(([0.0], np.cumsum(values)))
+            lower = np.maximum(np.arange(1, len(values) + 1) - window, 0)
+            return csum[1:] - csum[lower]
+
+        n = windowed(mask.astype(float))
+        sx, sy = windowed(xc), windowed(yc)
+        sxx, syy, sxy = windowed(xc * xc), windowed(yc * yc), windowed(xc * yc)
+
+        cov = n * sxy - sx * sy
+        var_x = n * sxx - sx * sx
+        var_y = n * syy - sy * sy
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = cov / np.sqrt(var_x * var_y)
+        corr[(n < min_periods) | (var_x <= 1e-12) | (var_y <= 1e-12)] = np.nan
+        return dates, np.clip(corr, -1.0, 1.0)
+
+    @traced('quality.cross_correlation', 'data')
+    def cross_correlation(self, input_metric, output_metric, max_lag):
+        key = (input_metric, output_metric, max_lag)
+        if key in self._cross_cache:
+            return self._cross_cache[key]
+
+        x = self.series[input_metric]
+        y = self.series[output_metric]
+        n = len(x)
+        lags = np.arange(-max_lag, max_lag + 1)
+        if n == 0:
+            result = (lags, np.full(len(lags), np.nan))
+            self._cross_cache[key] = result
+            return result
+
+        # Matriz (lags x dias): linha k compara x[t] com y[t + lags[k]]
+        idx = np.arange(n)[None, :] + lags[:, None]
+        inside = (idx >= 0) & (idx < n)
+        y_shifted = np.where(inside, y[np.clip(idx, 0, n - 1)], np.nan)
+        x_rows = np.broadcast_to(x, y_shifted.shape)
+        mask = ~(np.isnan(x_rows) | np.isnan(y_shifted))
+
+        count = mask.sum(axis=1)
+        xm = np.where(mask, x_rows, 0.0)
+        ym = np.where(mask, y_shifted, 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_x = xm.sum(axis=1) / count
+            mean_y = ym.sum(axis=1) / count
+            dx = np.where(mask, x_rows - mean_x[:, None], 0.0)
+            dy = np.where(mask, y_shifted - mean_y[:, None], 0.0)
+            corr = (dx * dy).sum(axis=1) / np.sqrt((dx * dx).sum(axis=1) * (dy * dy).sum(axis=1))
+        corr[count < 3] = np.nan
+
+        result = (lags, corr)
+        self._cross_cache[key] = result
+        return result
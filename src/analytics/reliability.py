@@ -0,0 +1,144 @@
+import numpy as np
+
+HOUR = 3600.0
+INITIAL_TAGS = 256
+# Peso, em falhas, da MTBF da frota na estimativa de cada TAG: com pouco histórico a TAG fica perto da frota,
+# com muitas falhas prevalece a própria MTBF
+PRIOR_FAILURES = 2.0
+# A próxima manutenção é programada quando as horas de operação desde o último serviço chegam a esta fração da MTBF
+SERVICE_FRACTION = 0.8
+
+
+def segment_bounds(codes):
+    # Início e fim (exclusivo) de cada sequência de códigos iguais num array ordenado
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    return starts, np.r_[starts[1:], len(codes)]
+
+
+def segmented_cumsum(values, starts, ends):
+    # Soma acumulada reiniciada no começo de cada segmento
+    total = np.cumsum(values)
+    offsets = (total - values)[starts]
+    return total - np.repeat(offsets, ends - starts)
+
+
+class RunHoursModel:
+    # Horas de operação por TAG reconstruídas das ordens de manutenção: o tempo entre o fim de uma ordem e o início
+    # da seguinte é operação, e a Corretiva marca uma falha. O estado é um array por TAG (última ordem, horas acumuladas,
+    # falhas, horas na última falha), então um lote de ordens novas é aplicado com somas segmentadas sobre o lote,
+    # partindo do estado de cada TAG, sem reler o histórico
+    def __init__(self):
+        self.tags = []
+        self.index = {}
+        self.last_start = np.empty(0)
+        self.last_end = np.empty(0)
+        self.uptime = np.empty(0)
+        self.repair = np.empty(0)
+        self.orders = np.empty(0, dtype=np.int64)
+        self.failures = np.empty(0, dtype=np.int64)
+        self.failure_uptime = np.empty(0)
+        # Horas de operação entre falhas consecutivas da mesma TAG, da frota inteira
+        self.tbf = np.empty(0)
+
+    def __len__(self):
+        return len(self.tags)
+
+    def _grow(self, size):
+        capacity = len(self.last_start)
+        if size <= capacity:
+            return
+        new_capacity = max(size, INITIAL_TAGS, 2 * capacity)
+        fills = {'last_start': -np.inf, 'last_end': np.nan, 'uptime': 0.0, 'repair': 0.0, 'orders': 0,
+                 'failures': 0, 'failure_uptime': np.nan}
+        for name, fill in fills.items():
+            old = getattr(self, name)
+            setattr(self, name, np.concatenate([old, np.full(new_capacity - capacity, fill, dtype=old.dtype)]))
+
+    def codes_for(self, tags):
+        # setdefault só cria o código das TAGs novas; a lista de nomes é completada depois, na ordem dos códigos
+        index = self.index
+        codes = np.fromiter((index.setdefault(tag, len(index)) for tag in tags), dtype=np.int64, count=len(tags))
+        if len(index) > len(self.tags):
+            self.tags.extend(list(index)[len(self.tags):])
+        self._grow(len(self.tags))
+        return codes
+
+    def update(self, tags, starts, ends, failures, repair_hours):
+        # starts/ends em segundos (fim NaN = ordem em aberto); devolve False se alguma ordem for anterior à última já
+        # aplicada da mesma TAG: o lote não é incremental e o chamador recalcula do zero
+        starts = np.asarray(starts, dtype=np.float64)
+        ends = np.asarray(ends, dtype=np.float64)
+        failures = np.asarray(failures, dtype=bool)
+        repair_hours = np.nan_to_num(np.asarray(repair_hours, dtype=np.float64))
+        if not len(starts):
+            return True
+        codes = self.codes_for(tags)
+        order = np.lexsort((starts, codes))
+        codes, starts, ends, failures, repair_hours = (codes[order], starts[order], ends[order], failures[order],
+                                                       repair_hours[order])
+        first, last = segment_bounds(codes)
+        first_codes = codes[first]
+        if np.any(starts[first] < self.last_start[first_codes]):
+            return False
+
+        # Operação antes de cada ordem: desde o fim da anterior da mesma TAG (do lote ou do estado); sem fim, zero
+        previous_end = np.r_[np.nan, ends[:-1]]
+        previous_end[first] = self.last_end[first_codes]
+        gaps = np.where(np.isnan(previous_end), 0.0, np.maximum(starts - previous_end, 0.0)) / HOUR
+        cumulative = segmented_cumsum(gaps, first, last) + np.repeat(self.uptime[first_codes], last - first)
+
+        # Tempo entre falhas: horas acumuladas numa falha menos as da falha anterior da mesma TAG
+        failed = np.flatnonzero(failures)
+        if len(failed):
+            failed_codes = codes[failed]
+            failed_uptime = cumulative[failed]
+            failed_first, failed_last = segment_bounds(failed_codes)
+            previous = np.r_[np.nan, failed_uptime[:-1]]
+            previous[failed_first] = self.failure_uptime[failed_codes[failed_first]]
+            between = failed_uptime - previous
+            self.tbf = np.concatenate([self.tbf, between[~np.isnan(between)]])
+            self.failure_uptime[failed_codes[failed_last - 1]] = failed_uptime[failed_last - 1]
+
+        size = len(self.last_start)
+        self.uptime += np.bincount(codes, gaps, minlength=size)
+        self.repair += np.bincount(codes, repair_hours, minlength=size)
+        self.orders += np.bincount(codes, minlength=size)
+        self.failures += np.bincount(codes, failures, minlength=size).astype(np.int64)
+        self.last_start[first_codes] = starts[last - 1]
+        self.last_end[first_codes] = ends[last - 1]
+        return True
+
+    def predict(self, now):
+        # Arrays por TAG (na ordem de self.tags) com horas desde o último serviço, MTBF e data prevista (segundos)
+        count = len(self.tags)
+        last_end = self.last_end[:count]
+        failures = self.failures[:count]
+        in_service = np.isnan(last_end)
+        since = np.where(in_service, 0.0, np.maximum(now - np.nan_to_num(last_end), 0.0) / HOUR)
+        operating = self.uptime[:count] + since
+        fleet = operating.sum() / max(int(failures.sum()), 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mtbf = np.where(failures > 0, operating / failures, np.nan)
+            mttr = np.where(self.orders[:count] > 0, self.repair[:count] / self.orders[:count], np.nan)
+        estimate = (operating + PRIOR_FAILURES * fleet) / (failures + PRIOR_FAILURES)
+        limit = SERVICE_FRACTION * estimate
+        return {
+            'since': since,
+            'operating': operating,
+            'failures': failures,
+            'mtbf': mtbf,
+            'mttr': mttr,
+            'estimate': estimate,
+            'limit': limit,
+            'due': now + (limit - since) * HOUR,
+            'in_service': in_service,
+            'fleet_mtbf': fleet,
+        }
+
+    def distribution(self, bins=20):
+        # Distribuição da frota: percentis e histograma dos tempos entre falhas (horas)
+        if not len(self.tbf):
+            return None
+        p10, p50, p90 = np.percentile(self.tbf, (10, 50, 90))
+        counts, edges = np.histogram(self.tbf, bins=bins)
+        return {'amostras': len(self.tbf), 'p10': p10, 'p50': p50, 'p90': p90, 'counts': counts, 'edges': edges}
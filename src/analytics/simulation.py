@@ -0,0 +1,137 @@
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# Tentativas por fatia: a fatia (e não o processo) recebe a semente, então o resultado é o mesmo com qualquer
+# número de processos
+SHARD_TRIALS = 5000
+HORIZON_HOURS = 8760.0
+MIN_FAILURES = 3
+Z_95 = 1.959964
+
+
+def fit_weibull(hours, failed):
+    # Máxima verossimilhança de Weibull com censura à direita: intervalos encerrados por preventiva contam como
+    # sobrevivência até ali. Devolve (forma, escala em horas) ou None com menos de MIN_FAILURES falhas
+    hours = np.asarray(hours, dtype=np.float64)
+    failed = np.asarray(failed, dtype=bool)
+    keep = hours > 0
+    hours, failed = hours[keep], failed[keep]
+    count = int(failed.sum())
+    if count < MIN_FAILURES:
+        return None
+    # Escala normalizada pelo maior intervalo para x^k não estourar; a equação da forma não depende da escala
+    top = hours.max()
+    logs = np.log(hours / top)
+    mean_failed = logs[failed].mean()
+
+    def score(shape):
+        weights = np.exp(shape * logs)
+        return (weights * logs).sum() / weights.sum() - 1.0 / shape - mean_failed
+
+    # score é crescente na forma: bisseção em escala logarítmica
+    low, high = 0.05, 50.0
+    if score(high) < 0:
+        low = high
+    for _ in range(60):
+        middle = math.sqrt(low * high)
+        if score(middle) < 0:
+            low = middle
+        else:
+            high = middle
+    shape = math.sqrt(low * high)
+    scale = top * (np.exp(shape * logs).sum() / count) ** (1.0 / shape)
+    return shape, float(scale)
+
+
+def fit_lognormal(hours):
+    # (mu, sigma) do logaritmo das durações em horas, ou None sem ao menos duas amostras positivas
+    hours = np.asarray(hours, dtype=np.float64)
+    logs = np.log(hours[hours > 0])
+    if len(logs) < 2:
+        return None
+    return float(logs.mean()), float(logs.std(ddof=1))
+
+
+def simulate_shard(params, trials, seed):
+    # Processo de renovação por unidade: a vida sorteada da Weibull termina em falha (reparo) ou, se passar do
+    # intervalo preventivo, em preventiva; as duas deixam a unidade como nova. Todas as unidades de todas as
+    # tentativas avançam juntas, um ciclo por iteração, até o horizonte.
+    # Devolve arrays por tentativa: disponibilidade, custo, falhas e horas paradas
+    rng = np.random.default_rng(seed)
+    units = params['units']
+    shape, scale = params['failure']
+    repair_mu, repair_sigma = params['repair']
+    preventive_mu, preventive_sigma = params['preventive']
+    interval = params['interval']
+    horizon = params['horizon']
+    size = trials * units
+    clock = np.zeros(size)
+    up = np.zeros(size)
+    down = np.zeros(size)
+    failures = np.zeros(size, dtype=np.int64)
+    preventives = np.zeros(size, dtype=np.int64)
+    active = np.arange(size)
+    while active.size:
+        count = active.size
+        life = scale * rng.weibull(shape, count)
+        failed = life < interval
+        remaining = horizon - clock[active]
+        run = np.minimum(np.minimum(life, interval), remaining)
+        repair = rng.lognormal(repair_mu, repair_sigma, count)
+        preventive = rng.lognormal(preventive_mu, preventive_sigma, count)
+        stopped = np.where(failed, repair, preventive)
+        # Quem chega ao horizonte operando termina ali; a parada que passa do horizonte é cortada nele
+        event = run < remaining
+        stopped = np.where(event, np.minimum(stopped, remaining - run), 0.0)
+        up[active] += run
+        down[active] += stopped
+        failures[active] += event & failed
+        preventives[active] += event & ~failed
+        clock[active] += run + stopped
+        active = active[event & (clock[active] < horizon)]
+
+    up = up.reshape(trials, units).sum(axis=1)
+    down = down.reshape(trials, units).sum(axis=1)
+    failures = failures.reshape(trials, units).sum(axis=1)
+    preventives = preventives.reshape(trials, units).sum(axis=1)
+    costs = params['costs']
+    cost = failures * costs['corrective'] + preventives * costs['preventive'] + down * costs['downtime']
+    return up / np.maximum(up + down, 1e-9), cost, failures, down
+
+
+def shard_sizes(trials):
+    full, rest = divmod(trials, SHARD_TRIALS)
+    return [SHARD_TRIALS] * full + ([rest] if rest else [])
+
+
+def run_scenarios(scenarios, trials, seed=0, workers=None):
+    # Cada cenário usa as mesmas sementes por fatia (números aleatórios comuns): a diferença entre cenários não
+    # carrega o ruído das sementes. workers <= 1 roda no próprio processo
+    sizes = shard_sizes(trials)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(params, size, shard_seed) for params in scenarios for size, shard_seed in zip(sizes, seeds)]
+    workers = multiprocessing.cpu_count() if workers is None else workers
+    if workers <= 1 or len(jobs) == 1:
+        results = [simulate_shard(*job) for job in jobs]
+    else:
+        # spawn: o processo da GUI tem threads (gravação, agendador) que não podem ser herdadas por fork
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)),
+                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+            results = list(executor.map(simulate_shard, *zip(*jobs)))
+    outcomes = []
+    for i in range(len(scenarios)):
+        shards = results[i * len(sizes):(i + 1) * len(sizes)]
+        outcomes.append({name: np.concatenate([shard[column] for shard in shards])
+                         for column, name in enumerate(('availability', 'cost', 'failures', 'downtime'))})
+    return outcomes
+
+
+def summarize(values):
+    # Média com intervalo de confiança de 95% da média e faixa de 95% dos resultados das tentativas
+    values = np.asarray(values, dtype=np.float64)
+    mean = float(values.mean())
+    half = Z_95 * float(values.std(ddof=1)) / math.sqrt(len(values)) if len(values) > 1 else 0.0
+    low, high = np.percentile(values, (2.5, 97.5))
+    return {'mean': mean, 'ci': (mean - half, mean + half), 'range': (float(low), float(high))}
@@ -0,0 +1,162 @@
+import threading
+import numpy as np
+
+DEFAULT_CAPACITY = 3000
+INITIAL_SERIES = 64
+
+
+class SignalStore:
+    # Buffers circulares por série (TAG, sinal) em matrizes NumPy pré-alocadas: nenhuma amostra vira objeto
+    # Python e a memória é fixa por série. Cada amostra é gravada duas vezes (posição i e i + capacidade),
+    # então as últimas N amostras de qualquer série são sempre uma fatia contígua: window() devolve views
+    def __init__(self, capacity=DEFAULT_CAPACITY, max_series=4096):
+        self.capacity = capacity
+        self.max_series = max_series
+        self.index = {}
+        self.keys = []
+        self.times = np.empty((0, 2 * capacity), dtype=np.float64)
+        self.values = np.empty((0, 2 * capacity), dtype=np.float32)
+        self.heads = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.flushed = np.zeros(0, dtype=np.float64)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def _grow(self, rows):
+        size = len(self.keys)
+        new_size = max(rows, INITIAL_SERIES, 2 * self.times.shape[0])
+        for name in ('times', 'values'):
+            old = getattr(self, name)
+            grown = np.zeros((new_size, 2 * self.capacity), dtype=old.dtype)
+            grown[:size] = old[:size]
+            setattr(self, name, grown)
+        for name in ('heads', 'counts'):
+            setattr(self, name, np.concatenate([getattr(self, name), np.zeros(new_size - size, dtype=np.int64)]))
+        self.flushed = np.concatenate([self.flushed, np.full(new_size - size, -np.inf)])
+
+    def series(self, key):
+        row = self.index.get(key)
+        if row is None:
+            if len(self.keys) >= self.max_series:
+                raise ValueError(f"Limite de {self.max_series} séries atingido")
+            row = len(self.keys)
+            if row >= self.times.shape[0]:
+                self._grow(row + 1)
+            self.index[key] = row
+            self.keys.append(key)
+        return row
+
+    def append(self, key, times, values):
+        # Lote de uma série; tempos precisam ser crescentes e amostras mais antigas que a última são descartadas
+        times = np.asarray(times, dtype=np.float64).ravel()
+        values = np.asarray(values, dtype=np.float32).ravel()
+        with self._lock:
+            row = self.series(key)
+            if self.counts[row]:
+                last = self.times[row, self.heads[row] + self.capacity - 1]
+                keep = times > last
+                if not keep.all():
+                    self.dropped += int((~keep).sum())
+                    times, values = times[keep], values[keep]
+            n = len(times)
+            if n == 0:
+                return
+            if n > self.capacity:
+                self.dropped += n - self.capacity
+                times, values = times[-self.capacity:], values[-self.capacity:]
+                n = self.capacity
+            positions = (self.heads[row] + np.arange(n)) % self.capacity
+            self.times[row, positions] = times
+            self.times[row, positions + self.capacity] = times
+            self.values[row, positions] = values
+            self.values[row, positions + self.capacity] = values
+            self.heads[row] = (self.heads[row] + n) % self.capacity
+            self.counts[row] = min(self.counts[row] + n, self.capacity)
+
+    def append_tick(self, keys, moment, values):
+        # Uma amostra por série no mesmo instante (um ciclo de leitura do CLP): escrita vetorizada em todas
+        with self._lock:
+            rows = np.fromiter((self.series(key) for key in keys), dtype=np.int64, count=len(keys))
+            values = np.asarray(values, dtype=np.float32)
+            last = self.times[rows, self.heads[rows] + self.capacity - 1]
+            fresh = (self.counts[rows] == 0) | (moment > last)
+            self.dropped += int((~fresh).sum())
+            rows, values = rows[fresh], values[fresh]
+            heads = self.heads[rows]
+            self.times[rows, heads] = moment
+            self.times[rows, heads + self.capacity] = moment
+            self.values[rows, heads] = values
+            self.values[rows, heads + self.capacity] = values
+            self.heads[rows] = (heads + 1) % self.capacity
+            self.counts[rows] = np.minimum(self.counts[rows] + 1, self.capacity)
+
+    def _span(self, row):
+        end = self.heads[row] + self.capacity
+        return end - self.counts[row], end
+
+    def window(self, key, start=None, end=None):
+        # Views somente leitura (sem cópia) das amostras em [start, end). Continuam apontando para o buffer:
+        # quem for guardá-las além do próximo ciclo de escrita deve copiar
+        row = self.index.get(key)
+        if row is None:
+            empty = np.empty(0)
+            return empty, empty
+        first, last = self._span(row)
+        times = self.times[row, first:last]
+        if start is not None:
+            first += int(np.searchsorted(times, start, side='left'))
+        if end is not None:
+            last = self._span(row)[0] + int(np.searchsorted(times, end, side='left'))
+        times = self.times[row, first:last]
+        values = self.values[row, first:last]
+        times.flags.writeable = False
+        values.flags.writeable = False
+        return times, values
+
+    def latest(self, key, count):
+        row = self.index.get(key)
+        if row is None:
+            return self.window(key)
+        first, last = self._span(row)
+        first = max(first, last - count)
+        times, values = self.times[row, first:last], self.values[row, first:last]
+        times.flags.writeable = False
+        values.flags.writeable = False
+        return times, values
+
+    def downsample(self, bucket_seconds, until=None):
+        # Agrega em baldes de bucket_seconds as amostras ainda não descarregadas. Só baldes completos
+        # (terminados antes de 'until' ou da última amostra da série) saem; o restante espera o próximo ciclo.
+        # Devolve [(chave, início do balde, média, mínimo, máximo, último, amostras)]
+        rows_out = []
+        with self._lock:
+            for key, row in self.index.items():
+                if not self.counts[row]:
+                    continue
+                first, last = self._span(row)
+                times = self.times[row, first:last]
+                values = self.values[row, first:last]
+                horizon = times[-1] if until is None else until
+                cutoff = np.floor(horizon / bucket_seconds) * bucket_seconds
+                lo = int(np.searchsorted(times, self.flushed[row], side='left'))
+                hi = int(np.searchsorted(times, cutoff, side='left'))
+                if hi <= lo:
+                    continue
+                t, v = times[lo:hi], values[lo:hi].astype(np.float64)
+                buckets = np.floor(t / bucket_seconds)
+                starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+                ends = np.r_[starts[1:], len(t)]
+                counts = ends - starts
+                means = np.add.reduceat(v, starts) / counts
+                mins = np.minimum.reduceat(v, starts)
+                maxs = np.maximum.reduceat(v, starts)
+                lasts = v[ends - 1]
+                for i in range(len(starts)):
+                    rows_out.append((key, buckets[starts[i]] * bucket_seconds, means[i], mins[i], maxs[i],
+                                     lasts[i], int(counts[i])))
+                self.flushed[row] = cutoff
+        return rows_out
+
+    def memory_bytes(self):
+        return int(self.times.nbytes + self.values.nbytes + self.heads.nbytes + self.counts.nbytes
+                   + self.flushed.nbytes)
@@ -1,14 +1,81 @@
 import sqlite3
-from contextlib import contextmanager
+from contextlib import closing
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.tracing import tracer
+from database.writer import LockStats, SerializedWriter, retry_busy
+
+LOCAL_SOURCE = 'Local'
+MAX_SOURCE_WORKERS = 16
+READ_BUSY_TIMEOUT = 2.0
+SNAPSHOT_INTERVAL = 5.0
+VERSIONED_TABLES = ('ProducaoSoja', 'FareloSojaTostado', 'TabelaTeste', 'maquinas', 'paradas', 'alarmes',
+                    'quarentena')
+NO_FAILURE = 'Sem Falha'
+
+# Expressões usadas pelos triggers dos contadores de manutenção; {row} é NEW ou OLD
+IS_FAILURE = "(CASE WHEN {row}.Falha IS NOT NULL AND {row}.Falha NOT IN ('', '" + NO_FAILURE + "') THEN 1 ELSE 0 END)"
+IS_OPEN = "(CASE WHEN {row}.DataFinal IS NULL OR {row}.DataFinal = '' THEN 1 ELSE 0 END)"
+FAILURE_KIND = "COALESCE(NULLIF({row}.Falha, ''), '" + NO_FAILURE + "')"
+# DataInicial/DataFinal são gravadas como 'DD/MM/AAAA HH:MM:SS'; a expressão devolve 'AAAA-MM-DD HH:MM:SS'
+ISO_DATETIME = "(substr({column}, 7, 4) || '-' || substr({column}, 4, 2) || '-' || substr({column}, 1, 2) || substr({column}, 11))"
+
+class TracedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        with tracer.span('sql.execute', 'sql', sql=' '.join(sql.split())[:200]):
+            return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        with tracer.span('sql.executemany', 'sql', sql=' '.join(sql.split())[:200]):
+            return super().executemany(sql, seq_of_parameters)
+
+    def fetchall(self):
+        with tracer.span('sql.fetchall', 'sql'):
+            return super().fetchall()
+
+
+class TracedConnection(sqlite3.Connection):
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
 
 class DatabaseHandler:
     def __init__(self, db_path='mesalpha.db'):
         self.db_path = db_path
+        self.sources = {LOCAL_SOURCE: db_path}
+        self._source_tables = {}
+        self._executor = None
+        self._readers = threading.local()
+        # Caches de todas as threads, para close() fechar as conexões de leitura que elas deixaram abertas
+        self._reader_caches = []
+        self._reader_caches_lock = threading.Lock()
+        self.lock_stats = LockStats()
+        self.writer = SerializedWriter(db_path, self.lock_stats)
+        self.wal_enabled = False
+        self.snapshot_path = db_path + '.snapshot'
+        self._snapshot_time = 0.0
+        self._snapshot_lock = threading.Lock()
         self.initialize_db()
+        self.load_sources()
     
     def initialize_db(self):
-        with self.get_connection() as conn:
+        # Esquema e migrações rodam uma vez, antes do escritor serializado entrar em uso: executescript e
+        # journal_mode não podem rodar dentro da transação do group commit
+        with closing(sqlite3.connect(self.db_path)) as conn, conn:
+            # Vacuum incremental só pode ser ligado antes da primeira tabela: vale para bancos novos.
+            # Bancos existentes ficam como estão, porque a conversão exige um VACUUM completo (ver services/scheduler.py)
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            # WAL: leitores leem um snapshot consistente enquanto o escritor grava
+            journal_mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+            self.wal_enabled = str(journal_mode).lower() == 'wal'
             conn.executescript('''
                 CREATE TABLE IF NOT EXISTS users (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -55,14 +122,441 @@ class DatabaseHandler:
                     UmidadeFarelo DECIMAL(4, 2) NOT NULL,
                     ProteinaBrutaFarelo DECIMAL(4, 2) NOT NULL,
                     GorduraFarelo DECIMAL(4, 2) NOT NULL                );
+
+                -- Filtros de período usam Data >= ? AND Data < ? e MIN/MAX(Data): ambos resolvidos pelo índice
+                CREATE INDEX IF NOT EXISTS ix_producaosoja_data ON ProducaoSoja (Data);
+                CREATE INDEX IF NOT EXISTS ix_farelosojatostado_data ON FareloSojaTostado (Data);
+
+                CREATE TABLE IF NOT EXISTS TabelaTeste (
+                    DataInicial String(50),
+                    DataFinal String(50),
+                    TAG String(50),
+                    Tipo String(50),
+                    Falha String(50),
+                    Descrição String(128),
+                    Horímetro String(50),
+                    Operador String(50)
+                );
+                -- Drill-down de Pareto: falha -> TAG -> ordens sai do índice, sem varrer a tabela
+                CREATE INDEX IF NOT EXISTS ix_tabelateste_falha_tag ON TabelaTeste (Falha, TAG);
+                -- Sincronização: casa ordens da origem com as já existentes pela chave natural (services/sync.py)
+                CREATE INDEX IF NOT EXISTS ix_tabelateste_tag_inicio ON TabelaTeste (TAG, DataInicial);
+
+                CREATE TABLE IF NOT EXISTS plantas (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT UNIQUE NOT NULL,
+                    db_path TEXT NOT NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS regras_alarme (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    nome TEXT NOT NULL,
+                    tabela TEXT NOT NULL,
+                    metrica TEXT NOT NULL,
+                    tipo TEXT NOT NULL CHECK (tipo IN ('limite', 'taxa', 'estado')),
+                    limite_inferior REAL,
+                    limite_superior REAL,
+                    histerese REAL NOT NULL DEFAULT 0,
+                    duracao REAL NOT NULL DEFAULT 0,
+                    valor_estado TEXT,
+                    severidade TEXT NOT NULL DEFAULT 'media',
+                    chave TEXT,
+                    ativa INTEGER NOT NULL DEFAULT 1
+                );
+
+                CREATE TABLE IF NOT EXISTS alarmes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    regra_id INTEGER NOT NULL REFERENCES regras_alarme (id),
+                    chave TEXT NOT NULL,
+                    inicio TIMESTAMP NOT NULL,
+                    fim TIMESTAMP,
+                    valor TEXT,
+                    mensagem TEXT NOT NULL,
+                    severidade TEXT NOT NULL,
+                    reconhecido INTEGER NOT NULL DEFAULT 0
+                );
+
+                -- No máximo um alarme aberto por regra e chave: disparos repetidos são ignorados
+                CREATE UNIQUE INDEX IF NOT EXISTS ux_alarmes_abertos ON alarmes (regra_id, chave) WHERE fim IS NULL;
+                CREATE INDEX IF NOT EXISTS ix_alarmes_inicio ON alarmes (inicio);
+
+                CREATE TABLE IF NOT EXISTS alarmes_marcas (
+                    tabela TEXT PRIMARY KEY,
+                    ultimo_rowid INTEGER NOT NULL DEFAULT 0
+                );
+
+                -- Sinais de máquinas agregados por balde de tempo (SignalRecorder); os brutos ficam só em memória
+                CREATE TABLE IF NOT EXISTS sinais_agregados (
+                    tag TEXT NOT NULL,
+                    sinal TEXT NOT NULL,
+                    inicio TIMESTAMP NOT NULL,
+                    media REAL NOT NULL,
+                    minimo REAL NOT NULL,
+                    maximo REAL NOT NULL,
+                    ultimo REAL NOT NULL,
+                    amostras INTEGER NOT NULL,
+                    PRIMARY KEY (tag, sinal, inicio)
+                );
+
+                -- Sincronização com o banco central: último (watermark, chave) aplicado por tabela.
+                -- Sem tipo declarado, para comparar inteiros como inteiros e datas como texto
+                CREATE TABLE IF NOT EXISTS sync_estado (
+                    tabela TEXT PRIMARY KEY,
+                    watermark,
+                    chave,
+                    linhas INTEGER NOT NULL DEFAULT 0,
+                    sincronizado_em TIMESTAMP,
+                    erro TEXT
+                );
+
+                -- Chave da origem -> rowid local, para tabelas sem chave própria (TabelaTeste)
+                CREATE TABLE IF NOT EXISTS sync_mapa (
+                    tabela TEXT NOT NULL,
+                    chave_origem TEXT NOT NULL,
+                    rowid_local INTEGER NOT NULL,
+                    PRIMARY KEY (tabela, chave_origem)
+                );
+                CREATE INDEX IF NOT EXISTS ix_sync_mapa_rowid ON sync_mapa (tabela, rowid_local);
+
+                -- Manutenção preditiva: ciclo de serviço (fim da última ordem, em segundos) da tarefa de cada TAG
+                CREATE TABLE IF NOT EXISTS tarefas_preditivas (
+                    tag TEXT PRIMARY KEY,
+                    ultimo_servico REAL NOT NULL,
+                    tarefa_id INTEGER NOT NULL
+                );
+
+                -- Aquisição Modbus/TCP (ModbusGateway): um CLP por linha, ligado à máquina pelo nome em maquinas
+                CREATE TABLE IF NOT EXISTS dispositivos_modbus (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    maquina TEXT NOT NULL,
+                    host TEXT NOT NULL,
+                    porta INTEGER NOT NULL DEFAULT 502,
+                    unidade INTEGER NOT NULL DEFAULT 1,
+                    intervalo REAL NOT NULL DEFAULT 1.0,
+                    ativo INTEGER NOT NULL DEFAULT 1
+                );
+
+                -- Holding registers lidos de cada CLP; 'status' e 'motivo' viram estado da máquina e paradas,
+                -- os demais sinais vão para o SignalStore (valor = registro * escala)
+                CREATE TABLE IF NOT EXISTS registros_modbus (
+                    dispositivo_id INTEGER NOT NULL,
+                    sinal TEXT NOT NULL,
+                    endereco INTEGER NOT NULL,
+                    escala REAL NOT NULL DEFAULT 1.0,
+                    PRIMARY KEY (dispositivo_id, sinal),
+                    FOREIGN KEY (dispositivo_id) REFERENCES dispositivos_modbus (id) ON DELETE CASCADE
+                );
+
+                -- Rotinas agendadas (JobScheduler): expressão cron editável e próximo disparo persistido,
+                -- para que disparos perdidos com o programa fechado sejam recuperados na abertura
+                CREATE TABLE IF NOT EXISTS rotinas (
+                    nome TEXT PRIMARY KEY,
+                    cron TEXT NOT NULL,
+                    ativa INTEGER NOT NULL DEFAULT 1,
+                    proxima_execucao TIMESTAMP,
+                    ultima_execucao TIMESTAMP
+                );
+
+                CREATE TABLE IF NOT EXISTS rotinas_execucoes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    rotina TEXT NOT NULL,
+                    agendada_para TIMESTAMP,
+                    inicio TIMESTAMP NOT NULL,
+                    duracao REAL,
+                    status TEXT NOT NULL,
+                    resultado TEXT
+                );
+                CREATE INDEX IF NOT EXISTS ix_rotinas_execucoes_rotina ON rotinas_execucoes (rotina, inicio);
+
+                -- Validação na carga (services.ingest): linhas rejeitadas por esquema/faixa ficam só aqui (chave pode
+                -- ser NULL e linha guarda o registro original); outliers são gravados na tabela e marcados aqui,
+                -- para os dashboards excluírem ou destacarem enquanto não forem liberados
+                CREATE TABLE IF NOT EXISTS quarentena (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    tabela TEXT NOT NULL,
+                    chave INTEGER,
+                    coluna TEXT,
+                    valor TEXT,
+                    motivo TEXT NOT NULL,
+                    escore REAL,
+                    linha TEXT,
+                    origem TEXT,
+                    criado_em TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime')),
+                    liberado INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS ix_quarentena_tabela_chave ON quarentena (tabela, chave);
+
+                CREATE TABLE IF NOT EXISTS table_versions (
+                    name TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL DEFAULT 0
+                );
             ''')
+            self.create_version_triggers(conn)
+            self.create_failure_counters(conn)
+            self.create_search_index(conn)
+
+    def create_version_triggers(self, conn):
+        # Cada escrita incrementa a versão da tabela; ETags e caches comparam só esse número
+        script = []
+        for table in VERSIONED_TABLES:
+            script.append(f"INSERT OR IGNORE INTO table_versions (name, version) VALUES ('{table}', 0);")
+            for event in ('INSERT', 'UPDATE', 'DELETE'):
+                script.append(f'''
+                    CREATE TRIGGER IF NOT EXISTS trg_version_{table}_{event.lower()}
+                    AFTER {event} ON {table}
+                    BEGIN
+                        UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+                    END;
+                ''')
+        conn.executescript("\n".join(script))
+
+    def create_failure_counters(self, conn):
+        # Agregados da manutenção mantidos por triggers: cada escrita em TabelaTeste aplica só o seu delta,
+        # e KPIs/gráficos leem poucas linhas em vez de varrer o histórico
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'falhas_por_tag'").fetchone()
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS falhas_por_tag (
+                TAG TEXT PRIMARY KEY,
+                registros INTEGER NOT NULL DEFAULT 0,
+                falhas INTEGER NOT NULL DEFAULT 0,
+                abertas INTEGER NOT NULL DEFAULT 0
+            );
+
+            CREATE TABLE IF NOT EXISTS falhas_por_tipo (
+                Falha TEXT PRIMARY KEY,
+                quantidade INTEGER NOT NULL DEFAULT 0
+            );
+        ''')
+
+        def add(row):
+            return f'''
+                INSERT INTO falhas_por_tag (TAG, registros, falhas, abertas)
+                VALUES (COALESCE({row}.TAG, ''), 1, {IS_FAILURE.format(row=row)}, {IS_OPEN.format(row=row)})
+                ON CONFLICT(TAG) DO UPDATE SET registros = registros + 1,
+                    falhas = falhas + excluded.falhas, abertas = abertas + excluded.abertas;
+                INSERT INTO falhas_por_tipo (Falha, quantidade) VALUES ({FAILURE_KIND.format(row=row)}, 1)
+                ON CONFLICT(Falha) DO UPDATE SET quantidade = quantidade + 1;
+            '''
+
+        def remove(row):
+            return f'''
+                UPDATE falhas_por_tag SET registros = registros - 1,
+                    falhas = falhas - {IS_FAILURE.format(row=row)}, abertas = abertas - {IS_OPEN.format(row=row)}
+                WHERE TAG = COALESCE({row}.TAG, '');
+                DELETE FROM falhas_por_tag WHERE TAG = COALESCE({row}.TAG, '') AND registros <= 0;
+                UPDATE falhas_por_tipo SET quantidade = quantidade - 1 WHERE Falha = {FAILURE_KIND.format(row=row)};
+                DELETE FROM falhas_por_tipo WHERE Falha = {FAILURE_KIND.format(row=row)} AND quantidade <= 0;
+            '''
+
+        conn.executescript(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_falhas_insert AFTER INSERT ON TabelaTeste
+            BEGIN {add('NEW')} END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_falhas_delete AFTER DELETE ON TabelaTeste
+            BEGIN {remove('OLD')} END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_falhas_update AFTER UPDATE OF TAG, Falha, DataFinal ON TabelaTeste
+            BEGIN {remove('OLD')} {add('NEW')} END;
+        ''')
+        if not exists:
+            self.rebuild_failure_counters(conn)
+
+    def create_search_index(self, conn):
+        # Índice FTS5 de conteúdo externo: guarda só os termos e aponta para o rowid de TabelaTeste.
+        # remove_diacritics faz "eletrica" achar "Elétrica"; prefix acelera buscas por início de palavra.
+        # TAG também é indexada: o filtro por TAG vira interseção de listas do próprio índice
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'busca_manutencao'").fetchone()
+        conn.executescript('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS busca_manutencao USING fts5(
+                Descrição, Falha, TAG,
+                content = 'TabelaTeste', content_rowid = 'rowid',
+                tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+            );
+
+            CREATE TRIGGER IF NOT EXISTS trg_busca_insert AFTER INSERT ON TabelaTeste
+            BEGIN
+                INSERT INTO busca_manutencao (rowid, Descrição, Falha, TAG) VALUES (NEW.rowid, NEW.Descrição, NEW.Falha, NEW.TAG);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_busca_delete AFTER DELETE ON TabelaTeste
+            BEGIN
+                INSERT INTO busca_manutencao (busca_manutencao, rowid, Descrição, Falha, TAG)
+                VALUES ('delete', OLD.rowid, OLD.Descrição, OLD.Falha, OLD.TAG);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_busca_update AFTER UPDATE OF Descrição, Falha, TAG ON TabelaTeste
+            BEGIN
+                INSERT INTO busca_manutencao (busca_manutencao, rowid, Descrição, Falha, TAG)
+                VALUES ('delete', OLD.rowid, OLD.Descrição, OLD.Falha, OLD.TAG);
+                INSERT INTO busca_manutencao (rowid, Descrição, Falha, TAG) VALUES (NEW.rowid, NEW.Descrição, NEW.Falha, NEW.TAG);
+            END;
+        ''')
+        if not exists:
+            conn.execute("INSERT INTO busca_manutencao (busca_manutencao) VALUES ('rebuild')")
+
+    def rebuild_failure_counters(self, conn):
+        # Recalcula do zero; necessário só na criação ou após cargas feitas com os triggers desligados
+        # Comandos separados, sem executescript: também roda dentro de uma transação do escritor (rotinas agendadas)
+        conn.execute("DELETE FROM falhas_por_tag")
+        conn.execute("DELETE FROM falhas_por_tipo")
+        conn.execute(f'''
+            INSERT INTO falhas_por_tag (TAG, registros, falhas, abertas)
+            SELECT COALESCE(TAG, ''), COUNT(*), SUM({IS_FAILURE.format(row='TabelaTeste')}),
+                   SUM({IS_OPEN.format(row='TabelaTeste')})
+            FROM TabelaTeste GROUP BY COALESCE(TAG, '')
+        ''')
+        conn.execute(f'''
+            INSERT INTO falhas_por_tipo (Falha, quantidade)
+            SELECT {FAILURE_KIND.format(row='TabelaTeste')}, COUNT(*)
+            FROM TabelaTeste GROUP BY 1
+        ''')
+
+    def table_versions(self, tables=VERSIONED_TABLES, source=None):
+        placeholders = ", ".join("?" for _ in tables)
+        rows = self.read(f"SELECT name, version FROM table_versions WHERE name IN ({placeholders})",
+                         tuple(tables), source)
+        return dict(rows)
 
-    @contextmanager
-    def get_connection(self):
-        conn = sqlite3.connect(self.db_path)
+    def load_sources(self):
         try:
-            yield conn
-            conn.commit()
-        finally:
-            conn.close()
+            for name, db_path in self.read("SELECT name, db_path FROM plantas ORDER BY name"):
+                self.register_source(name, db_path)
+        except sqlite3.Error as e:
+            print(f"Erro ao carregar plantas cadastradas: {e}")
+
+    def register_source(self, name, db_path):
+        self.sources[name] = db_path
+        self._source_tables = {key: exists for key, exists in self._source_tables.items() if key[0] != name}
+
+    def has_table(self, table, source=None):
+        # Consulta sqlite_master uma vez por fonte: bancos de planta mais antigos podem não ter tabelas novas
+        key = (source or LOCAL_SOURCE, table)
+        if key not in self._source_tables:
+            rows = self.read("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,), source)
+            self._source_tables[key] = bool(rows)
+        return self._source_tables[key]
+
+    def unregister_source(self, name):
+        if name != LOCAL_SOURCE:
+            self.sources.pop(name, None)
+
+    def source_names(self):
+        return list(self.sources)
+
+    def query_source(self, source, query, params=()):
+        with tracer.span('db.query_source', 'sql', source=source):
+            return self.read(query, params, source)
+
+    def query_sources(self, query, params=(), sources=None):
+        # Uma consulta por planta em paralelo (o sqlite3 libera o GIL durante a execução),
+        # então a latência total fica próxima à da planta mais lenta
+        names = list(sources) if sources else self.source_names()
+        if len(names) == 1:
+            return {names[0]: self._safe_query(names[0], query, params)}
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=MAX_SOURCE_WORKERS, thread_name_prefix='plant-query')
+        futures = {name: self._executor.submit(self._safe_query, name, query, params) for name in names}
+        return {name: future.result() for name, future in futures.items()}
+
+    def _safe_query(self, source, query, params):
+        try:
+            return self.query_source(source, query, params)
+        except (sqlite3.Error, KeyError) as e:
+            print(f"Erro ao consultar a planta {source}: {e}")
+            return []
+
+    def _open_reader(self, source, factory):
+        if source is None or source == LOCAL_SOURCE:
+            db_path = self.db_path if self.wal_enabled else self.refresh_snapshot()
+            conn = sqlite3.connect(db_path, timeout=0.05, factory=factory, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(f"file:{self.sources[source]}?mode=ro", uri=True, timeout=0.05,
+                                   factory=factory, check_same_thread=False)
+        conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    def read_connection(self, source=None):
+        # Conexões de leitura ficam em cache por thread e por fonte
+        factory = TracedConnection if tracer.enabled else sqlite3.Connection
+        key = (source or LOCAL_SOURCE, factory)
+        if not hasattr(self._readers, 'connections'):
+            self._readers.connections = {}
+            with self._reader_caches_lock:
+                self._reader_caches.append(self._readers.connections)
+        cache = self._readers.connections
+        if not self.wal_enabled and key[0] == LOCAL_SOURCE and self._snapshot_is_stale():
+            stale = cache.pop(key, None)
+            if stale is not None:
+                stale.close()
+        conn = cache.get(key)
+        if conn is None:
+            conn = cache[key] = self._open_reader(source, factory)
+        return conn
+
+    def read(self, query, params=(), source=None):
+        conn = self.read_connection(source)
+        return retry_busy(lambda: conn.execute(query, params).fetchall(), self.lock_stats, 'read', READ_BUSY_TIMEOUT)
+
+    def stream(self, query, params=(), source=None, chunk_size=5000):
+        # Cursor lido em blocos: devolve os nomes das colunas e um gerador de listas de linhas,
+        # sem materializar o resultado inteiro
+        conn = self.read_connection(source)
+        cursor = retry_busy(lambda: conn.execute(query, params), self.lock_stats, 'read', READ_BUSY_TIMEOUT)
+        columns = [column[0] for column in cursor.description]
+
+        def chunks():
+            try:
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                cursor.close()
+        return columns, chunks()
+
+    def _snapshot_is_stale(self):
+        return time.monotonic() - self._snapshot_time > SNAPSHOT_INTERVAL
+
+    def refresh_snapshot(self):
+        # Sem WAL (ex.: compartilhamento de rede), leituras vão para uma cópia periódica via API de backup
+        with self._snapshot_lock:
+            if self._snapshot_is_stale():
+                source = sqlite3.connect(self.db_path, timeout=READ_BUSY_TIMEOUT)
+                target = sqlite3.connect(self.snapshot_path)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                    source.close()
+                self._snapshot_time = time.monotonic()
+        return self.snapshot_path
+
+    def write(self, sql, params=()):
+        return self.writer.submit(sql, params)
+
+    def write_many(self, sql, rows):
+        return self.writer.submit_many(sql, rows)
+
+    def write_call(self, func):
+        return self.writer.submit_call(func)
+
+    def lock_statistics(self):
+        return self.lock_stats.snapshot()
+
+    def close(self):
+        # Escritas na fila terminam antes; com a última conexão fechada o SQLite faz o checkpoint do WAL
+        self.writer.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        with self._reader_caches_lock:
+            caches = list(self._reader_caches)
+        for cache in caches:
+            for key in list(cache):
+                connection = cache.pop(key, None)
+                if connection is not None:
+                    connection.close()
 
@@ -0,0 +1,20 @@
+def merge_partials(results_by_source, key_size=1):
+    # Combina agregados parciais por chave: cada coluna após a chave deve ser aditiva (SUM, COUNT),
+    # nunca uma média, para que o consolidado seja exato
+    merged = {}
+    for rows in results_by_source.values():
+        for row in rows:
+            key = tuple(row[:key_size])
+            values = [value or 0 for value in row[key_size:]]
+            current = merged.get(key)
+            if current is None:
+                merged[key] = values
+            else:
+                merged[key] = [a + b for a, b in zip(current, values)]
+    return [key + tuple(values) for key, values in sorted(merged.items())]
+
+
+def ratio_rows(rows, key_size=1):
+    # (chave..., soma, contagem) -> (chave..., média)
+    return [tuple(row[:key_size]) + (row[key_size] / row[key_size + 1] if row[key_size + 1] else None,)
+            for row in rows]
@@ -0,0 +1,199 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from utils.tracing import tracer
+
+_STOP = object()
+
+
+def is_busy_error(error):
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+class LockStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self.counters = {
+            kind: {'operations': 0, 'contended': 0, 'busy_retries': 0, 'failures': 0,
+                   'wait_total_ms': 0.0, 'wait_max_ms': 0.0}
+            for kind in ('read', 'write')
+        }
+        self.commits = 0
+        self.committed_requests = 0
+        self.commit_total_ms = 0.0
+
+    def reset(self):
+        with self._lock:
+            self._clear()
+
+    def record(self, kind, waited, retries, failed=False):
+        with self._lock:
+            entry = self.counters[kind]
+            entry['operations'] += 1
+            entry['busy_retries'] += retries
+            if retries:
+                entry['contended'] += 1
+                ms = waited * 1000
+                entry['wait_total_ms'] += ms
+                entry['wait_max_ms'] = max(entry['wait_max_ms'], ms)
+            if failed:
+                entry['failures'] += 1
+
+    def record_commit(self, requests, duration):
+        with self._lock:
+            self.commits += 1
+            self.committed_requests += requests
+            self.commit_total_ms += duration * 1000
+
+    def snapshot(self):
+        with self._lock:
+            data = {kind: dict(entry) for kind, entry in self.counters.items()}
+            data['commits'] = self.commits
+            data['avg_batch'] = self.committed_requests / self.commits if self.commits else 0.0
+            data['avg_commit_ms'] = self.commit_total_ms / self.commits if self.commits else 0.0
+            return data
+
+
+def retry_busy(func, stats, kind, timeout=5.0):
+    # Tenta de novo com backoff exponencial enquanto o banco estiver ocupado e contabiliza a espera
+    start = time.perf_counter()
+    retries = 0
+    while True:
+        attempt_start = time.perf_counter()
+        try:
+            result = func()
+        except sqlite3.OperationalError as e:
+            if not is_busy_error(e) or time.perf_counter() - start >= timeout:
+                stats.record(kind, time.perf_counter() - start, retries, failed=True)
+                raise
+            retries += 1
+            time.sleep(min(0.001 * (2 ** retries), 0.05))
+            continue
+        stats.record(kind, attempt_start - start, retries)
+        return result
+
+
+class _WriteRequest:
+    __slots__ = ('sql', 'params', 'many', 'func', 'future')
+
+    def __init__(self, sql=None, params=(), many=False, func=None):
+        self.sql = sql
+        self.params = params
+        self.many = many
+        self.func = func
+        self.future = Future()
+
+
+class SerializedWriter:
+    # Única conexão de escrita, em thread própria; requisições que chegam juntas
+    # são gravadas em uma só transação (group commit)
+    def __init__(self, db_path, stats, max_batch=500, max_delay=0.005, busy_timeout=5.0):
+        self.db_path = db_path
+        self.stats = stats
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.busy_timeout = busy_timeout
+        self.queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+                    self._thread.start()
+
+    def _enqueue(self, request):
+        self._ensure_started()
+        self.queue.put(request)
+        return request.future
+
+    def submit(self, sql, params=()):
+        return self._enqueue(_WriteRequest(sql, params))
+
+    def submit_many(self, sql, rows):
+        return self._enqueue(_WriteRequest(sql, rows, many=True))
+
+    def submit_call(self, func):
+        return self._enqueue(_WriteRequest(func=func))
+
+    def flush(self, timeout=None):
+        return self.submit_call(lambda conn: None).result(timeout)
+
+    def close(self):
+        if self._thread is not None:
+            self.queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path, timeout=0.05, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            stop = False
+            while not stop:
+                request = self.queue.get()
+                if request is _STOP:
+                    break
+                batch = [request]
+                deadline = time.monotonic() + self.max_delay
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        request = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if request is _STOP:
+                        stop = True
+                        break
+                    batch.append(request)
+                self._commit_batch(conn, batch)
+        finally:
+            conn.close()
+
+    def _commit_batch(self, conn, batch):
+        start = time.perf_counter()
+        with tracer.span('db.group_commit', 'sql', requests=len(batch)):
+            try:
+                retry_busy(lambda: conn.execute("BEGIN IMMEDIATE"), self.stats, 'write', self.busy_timeout)
+            except sqlite3.Error as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                return
+
+            done = []
+            for request in batch:
+                # Savepoint por requisição: uma falha não desfaz o restante do lote
+                conn.execute("SAVEPOINT request")
+                try:
+                    if request.func is not None:
+                        result = request.func(conn)
+                    elif request.many:
+                        result = conn.executemany(request.sql, request.params).rowcount
+                    else:
+                        result = conn.execute(request.sql, request.params).rowcount
+                    conn.execute("RELEASE request")
+                    done.append((request, result))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO request")
+                    conn.execute("RELEASE request")
+                    request.future.set_exception(e)
+
+            try:
+                retry_busy(lambda: conn.execute("COMMIT"), self.stats, 'write', self.busy_timeout)
+            except sqlite3.Error as e:
+                conn.execute("ROLLBACK")
+                for request, _result in done:
+                    request.future.set_exception(e)
+                return
+
+        self.stats.record_commit(len(done), time.perf_counter() - start)
+        for request, result in done:
+            request.future.set_result(result)
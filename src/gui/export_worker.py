@@ -0,0 +1,74 @@
+import threading
+from PySide6.QtCore import Qt, QThread, Signal
+from PySide6.QtWidgets import QProgressDialog
+from services.export import export_dataset, ExportCancelled
+
+
+class ExportWorker(QThread):
+    # Exportação em thread própria; o progresso chega à GUI por sinais (fila de eventos do Qt)
+    progress = Signal(int, int)
+    completed = Signal(int)
+    failed = Signal(str)
+    cancelled = Signal()
+
+    def __init__(self, db_handler, dataset, file_path, file_format, parent=None):
+        super().__init__(parent)
+        self.db_handler = db_handler
+        self.dataset = dataset
+        self.file_path = file_path
+        self.file_format = file_format
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            written = export_dataset(self.db_handler, self.dataset, self.file_path, self.file_format,
+                                     progress=self.progress.emit, cancel_event=self.cancel_event)
+        except ExportCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.completed.emit(written)
+
+
+class ExportProgressDialog(QProgressDialog):
+    def __init__(self, worker, parent=None):
+        super().__init__(f"Exportando {worker.dataset['name']}...", "Cancelar", 0, 0, parent)
+        self.setWindowTitle("Exportar Dados")
+        self.setMinimumDuration(300)
+        self.setAutoClose(False)
+        self.setAutoReset(False)
+        self.setAttribute(Qt.WA_DeleteOnClose)
+        self.worker = worker
+        self.canceled.connect(worker.cancel)
+        worker.progress.connect(self.update_progress)
+        worker.completed.connect(self.on_completed)
+        worker.failed.connect(self.on_failed)
+        worker.cancelled.connect(self.close)
+
+    def update_progress(self, done, total):
+        # QProgressDialog usa int de 32 bits: a escala é em milésimos do total
+        if total:
+            self.setMaximum(1000)
+            self.setValue(int(done * 1000 / total))
+        self.setLabelText(f"Exportando {self.worker.dataset['name']}: {done:,} de {total:,} linhas".replace(',', '.'))
+
+    def on_completed(self, written):
+        self.setMaximum(1000)
+        self.setValue(1000)
+        rows = f"{written:,}".replace(',', '.')
+        self.show_result(f"Exportação concluída: {rows} linhas em {self.worker.file_path}")
+
+    def on_failed(self, message):
+        print(f"Erro ao exportar dados: {message}")
+        self.show_result(f"Erro ao exportar dados: {message}")
+
+    def show_result(self, message):
+        # O diálogo fica aberto com o resultado; o botão passa a fechar em vez de cancelar
+        self.setLabelText(message)
+        self.setCancelButtonText("Fechar")
+        self.canceled.disconnect(self.worker.cancel)
+        self.canceled.connect(self.close)
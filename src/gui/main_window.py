@@ -1,15 +1,19 @@
 from PySide6.QtWidgets import (QMainWindow, QWidget, QHBoxLayout, QVBoxLayout,
                               QPushButton, QLabel, QStackedWidget, QFrame,
-                              QSizePolicy)
-from PySide6.QtCore import Qt, QSize, QPropertyAnimation, QEasingCurve
-from PySide6.QtGui import QPixmap, QIcon, QFont
+                              QSizePolicy, QApplication)
+from PySide6.QtCore import Qt, QSize, QPropertyAnimation, QEasingCurve, QTimer
+from PySide6.QtGui import QPixmap, QIcon, QFont, QShortcut, QKeySequence
 from gui.pages.home_page import HomePage
 from gui.pages.tasks_page import TasksPage
 from gui.pages.about_page import AboutPage
 from gui.pages.dashboards_page import DashboardWindow
-from gui.themes import Themes, get_stylesheet
+from gui.themes import Themes, compiled_stylesheet
+from gui.perf_overlay import PerformanceOverlay
+from utils.memory import memory_budget
 import os
 
+MEMORY_CHECK_MS = 10000
+
 class MainWindow(QMainWindow):
     def __init__(self, db):
         super().__init__()
@@ -42,9 +46,18 @@ class MainWindow(QMainWindow):
         main_layout.addWidget(self.header)
         main_layout.addWidget(self.create_content_container())
         
+        self.perf_overlay = PerformanceOverlay(self, self.db)
+        QShortcut(QKeySequence(Qt.Key_F12), self, activated=self.perf_overlay.toggle)
+
         self.apply_theme()
         self.load_page(HomePage)
 
+        # Páginas ficam no stack para sempre; o orçamento de memória libera os dados das que estão ocultas
+        self.memory_timer = QTimer(self)
+        self.memory_timer.setInterval(MEMORY_CHECK_MS)
+        self.memory_timer.timeout.connect(memory_budget.enforce)
+        self.memory_timer.start()
+
     def create_header(self):
         header = QFrame()
         header.setFixedHeight(80)
@@ -194,7 +207,8 @@ class MainWindow(QMainWindow):
         self.sidebar_expanded = not self.sidebar_expanded
 
     def apply_theme(self):
-        self.setStyleSheet(get_stylesheet(getattr(Themes, self.current_theme)))
+        # Uma única folha de estilo pré-compilada por tema, aplicada na aplicação inteira
+        QApplication.instance().setStyleSheet(compiled_stylesheet(self.current_theme))
         self.update_logo() 
         
         for i in range(self.stack.count()):
@@ -209,7 +223,8 @@ class MainWindow(QMainWindow):
                     self.stack.setCurrentIndex(i)
                     current_page = self.stack.currentWidget()
                     if hasattr(current_page, 'update_theme'):
-                        current_page.update_theme(getattr(Themes, self.current_theme)) 
+                        current_page.update_theme(self.current_theme)
+                    memory_budget.enforce()
                     return
             
             new_page = page_class(self.db, getattr(Themes, self.current_theme))
@@ -218,9 +233,14 @@ class MainWindow(QMainWindow):
             
             if hasattr(new_page, 'update_theme'):
                 new_page.update_theme(self.current_theme)
+            memory_budget.enforce()
         except Exception as e:
             print(f"Erro ao carregar a página {page_class.__name__}: {str(e)}")
 
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.perf_overlay.reposition()
+
     def toggle_theme(self):
         self.current_theme = 'DARK' if self.current_theme == 'LIGHT' else 'LIGHT'
         self.apply_theme()
\ No newline at end of file
@@ -1,35 +1,87 @@
-from PySide6.QtWidgets import QWidget, QVBoxLayout, QLabel
-from PySide6.QtCore import Qt
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtGui import QFont
 from gui.themes import Themes
+from utils.memory import memory_budget, process_rss, format_bytes
+
+MEMORY_REFRESH_MS = 2000
 
 class AboutPage(QWidget):
     def __init__(self, db, theme=Themes.LIGHT):
         super().__init__()
         self.db = db
         self.theme = theme
+        self.setProperty("role", "page")
         self.init_ui()
-    
+
+        self.memory_timer = QTimer(self)
+        self.memory_timer.setInterval(MEMORY_REFRESH_MS)
+        self.memory_timer.timeout.connect(self.refresh_memory)
+
     def init_ui(self):
         layout = QVBoxLayout()
-        
+
         about_text = """
         <h1>SISTEMA MES | Alpha - Automação de Sistemas Elétricos</h1>
         <p>Versão 1.0.0</p>
         <p>Desenvolvido por Alpha Automação de Sistemas Elétricos</p>
         <p>© 2025 Todos os direitos reservados</p>
         """
-        
+
         label = QLabel(about_text)
         label.setAlignment(Qt.AlignCenter)
         layout.addWidget(label)
-        
+
+        memory_header = QHBoxLayout()
+        memory_title = QLabel("Memória")
+        memory_title.setFont(QFont('Segoe UI', 12, QFont.Bold))
+        memory_header.addStretch()
+        memory_header.addWidget(memory_title)
+        release_button = QPushButton("Liberar páginas ocultas")
+        release_button.clicked.connect(self.release_hidden_pages)
+        memory_header.addWidget(release_button)
+        memory_header.addStretch()
+        layout.addLayout(memory_header)
+
+        self.memory_label = QLabel()
+        self.memory_label.setFont(QFont('Consolas', 9))
+        self.memory_label.setTextFormat(Qt.PlainText)
+        self.memory_label.setAlignment(Qt.AlignHCenter | Qt.AlignTop)
+        layout.addWidget(self.memory_label)
+
         self.setLayout(layout)
         initial_theme_name = 'LIGHT' if self.theme == Themes.LIGHT else 'DARK'
         self.update_theme(initial_theme_name)
 
+    def refresh_memory(self):
+        usage = memory_budget.usage()
+        total = sum(row[1] for row in usage)
+        lines = [f"Processo (RSS): {format_bytes(process_rss())}",
+                 f"Páginas: {format_bytes(total)} de {format_bytes(memory_budget.budget_bytes)} "
+                 f"(liberações: {memory_budget.evictions})",
+                 "",
+                 f"{'página':<28}{'total':>11}  {'estado':<10}detalhes"]
+        for name, size, parts, visible, evicted in usage:
+            state = "liberada" if evicted else ("visível" if visible else "oculta")
+            details = ", ".join(f"{part} {format_bytes(part_size)}" for part, part_size in parts.items())
+            lines.append(f"{name[:27]:<28}{format_bytes(size):>11}  {state:<10}{details}")
+        if not usage:
+            lines.append("Nenhuma página com dados carregados.")
+        self.memory_label.setText("\n".join(lines))
+
+    def release_hidden_pages(self):
+        memory_budget.enforce(force=True)
+        self.refresh_memory()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        # Depois da troca de página, para já mostrar o que o orçamento liberou
+        QTimer.singleShot(0, self.refresh_memory)
+        self.memory_timer.start()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.memory_timer.stop()
+
     def update_theme(self, theme_name):
         self.theme = getattr(Themes, theme_name)
-        self.setStyleSheet(f"""
-            background-color: {self.theme['bg_primary']};
-            color: {self.theme['text_primary']};
-        """)
\ No newline at end of file
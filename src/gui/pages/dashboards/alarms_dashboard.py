@@ -0,0 +1,151 @@
+from PySide6 import QtWidgets, QtCore
+from PySide6.QtGui import QColor, QPainter
+from PySide6.QtPrintSupport import QPrinter
+from utils.tracing import traced
+from services.export import table_dataset
+from database.db_handler import LOCAL_SOURCE
+
+ALARMS_POLL_MS = 2000
+MAX_ROWS = 500
+COLUMNS = ("Início", "Fim", "Severidade", "Chave", "Valor", "Mensagem", "Reconhecido")
+
+
+class AlarmsDashboard(QtWidgets.QWidget):
+    def __init__(self, db_handler, theme):
+        super().__init__()
+        self.db_handler = db_handler
+        self.theme = theme
+        self.version = None
+        self.init_ui()
+        self.refresh_alarms(force=True)
+
+        # Os alarmes são gravados pelo AlarmMonitor em segundo plano; aqui só se confere a versão da tabela
+        self.poll_timer = QtCore.QTimer(self)
+        self.poll_timer.setInterval(ALARMS_POLL_MS)
+        self.poll_timer.timeout.connect(self.refresh_alarms)
+        self.poll_timer.start()
+
+    def init_ui(self):
+        self.layout = QtWidgets.QVBoxLayout(self)
+        self.layout.setSpacing(20)
+
+        summary_layout = QtWidgets.QHBoxLayout()
+        summary_layout.setSpacing(10)
+        self.active_label = QtWidgets.QLabel()
+        self.active_label.setAlignment(QtCore.Qt.AlignCenter)
+        self.active_label.setProperty("role", "kpiCard")
+        self.active_label.setFixedSize(230, 80)
+        summary_layout.addWidget(self.active_label)
+
+        self.unacknowledged_label = QtWidgets.QLabel()
+        self.unacknowledged_label.setAlignment(QtCore.Qt.AlignCenter)
+        self.unacknowledged_label.setProperty("role", "kpiCard")
+        self.unacknowledged_label.setFixedSize(230, 80)
+        summary_layout.addWidget(self.unacknowledged_label)
+        summary_layout.addStretch()
+        self.layout.addLayout(summary_layout)
+
+        filter_layout = QtWidgets.QHBoxLayout()
+        filter_layout.setSpacing(10)
+        self.only_active_check = QtWidgets.QCheckBox("Somente ativos")
+        self.only_active_check.toggled.connect(lambda: self.refresh_alarms(force=True))
+        filter_layout.addWidget(self.only_active_check)
+
+        self.ack_button = QtWidgets.QPushButton("Reconhecer selecionados")
+        self.ack_button.clicked.connect(self.acknowledge_selected)
+        filter_layout.addWidget(self.ack_button)
+        filter_layout.addStretch()
+        self.layout.addLayout(filter_layout)
+
+        self.table = QtWidgets.QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(5, QtWidgets.QHeaderView.Stretch)
+        self.table.setMinimumHeight(400)
+        self.layout.addWidget(self.table)
+
+    def current_version(self):
+        try:
+            return self.db_handler.table_versions(('alarmes',), LOCAL_SOURCE).get('alarmes')
+        except Exception as e:
+            print(f"Erro ao ler versão da tabela de alarmes: {e}")
+            return None
+
+    @traced('alarms.refresh_table', 'data')
+    def refresh_alarms(self, force=False):
+        if not force and not self.isVisible():
+            return
+        version = self.current_version()
+        if not force and version == self.version:
+            return
+        self.version = version
+
+        where = "WHERE a.fim IS NULL" if self.only_active_check.isChecked() else ""
+        try:
+            rows = self.db_handler.read(f"""
+                SELECT a.id, a.inicio, a.fim, a.severidade, a.chave, a.valor, a.mensagem, a.reconhecido
+                FROM alarmes a
+                {where}
+                ORDER BY a.fim IS NOT NULL, a.inicio DESC
+                LIMIT {MAX_ROWS}
+            """)
+            active, unacknowledged = self.db_handler.read(
+                "SELECT COUNT(*), SUM(reconhecido = 0) FROM alarmes WHERE fim IS NULL")[0]
+        except Exception as e:
+            print(f"Erro ao buscar alarmes: {e}")
+            rows, active, unacknowledged = [], 0, 0
+
+        self.active_label.setText(f"Alarmes Ativos\n{active}")
+        self.unacknowledged_label.setText(f"Ativos sem Reconhecimento\n{unacknowledged or 0}")
+        self.populate_table(rows)
+
+    def populate_table(self, rows):
+        self.table.setUpdatesEnabled(False)
+        self.table.setRowCount(len(rows))
+        highlight = QColor(self.theme['red'])
+        for r, (alarm_id, inicio, fim, severidade, chave, valor, mensagem, reconhecido) in enumerate(rows):
+            values = (inicio, fim or "", severidade, chave, valor, mensagem, "Sim" if reconhecido else "Não")
+            for c, value in enumerate(values):
+                item = QtWidgets.QTableWidgetItem(str(value))
+                if c == 0:
+                    item.setData(QtCore.Qt.UserRole, alarm_id)
+                # Ativos e ainda não reconhecidos ficam destacados
+                if fim is None and not reconhecido:
+                    item.setForeground(highlight)
+                self.table.setItem(r, c, item)
+        self.table.resizeColumnsToContents()
+        self.table.setUpdatesEnabled(True)
+
+    def acknowledge_selected(self):
+        ids = {self.table.item(index.row(), 0).data(QtCore.Qt.UserRole)
+               for index in self.table.selectionModel().selectedRows()}
+        if not ids:
+            return
+        placeholders = ", ".join("?" for _ in ids)
+        try:
+            self.db_handler.write(f"UPDATE alarmes SET reconhecido = 1 WHERE id IN ({placeholders})",
+                                  tuple(ids)).result()
+        except Exception as e:
+            print(f"Erro ao reconhecer alarmes: {e}")
+        self.refresh_alarms(force=True)
+
+    def apply_theme(self):
+        self.refresh_alarms(force=True)
+
+    def update_theme(self, theme):
+        self.theme = theme
+        self.apply_theme()
+
+    def export_datasets(self):
+        return [table_dataset(self.db_handler, 'alarmes', plant=LOCAL_SOURCE, order_by='inicio')]
+
+    def export_to_pdf(self, file_path):
+        printer = QPrinter(QPrinter.HighResolution)
+        printer.setOutputFormat(QPrinter.PdfFormat)
+        printer.setOutputFileName(file_path)
+
+        painter = QPainter(printer)
+        self.render(painter)
+        painter.end()
@@ -0,0 +1,136 @@
+from collections import OrderedDict
+from PySide6 import QtWidgets, QtCore, QtGui
+from matplotlib.backend_bases import ResizeEvent
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from utils.tracing import span
+
+
+class FrameCache:
+    def __init__(self, max_frames=24):
+        self.max_frames = max_frames
+        self.frames = OrderedDict()
+
+    def get(self, key):
+        frame = self.frames.get(key)
+        if frame is not None:
+            self.frames.move_to_end(key)
+        return frame
+
+    def store(self, key, canvas, data=None):
+        figure = canvas.figure
+        params = figure.subplotpars
+        width, height = figure.bbox.size
+        self.frames[key] = {
+            'region': canvas.copy_from_bbox(figure.bbox),
+            'bytes': int(width) * int(height) * 4,
+            'subplotpars': {
+                'left': params.left, 'right': params.right,
+                'bottom': params.bottom, 'top': params.top,
+                'wspace': params.wspace, 'hspace': params.hspace,
+            },
+            'data': data,
+        }
+        self.frames.move_to_end(key)
+        while len(self.frames) > self.max_frames:
+            self.frames.popitem(last=False)
+
+    def clear(self):
+        self.frames.clear()
+
+    def memory_bytes(self):
+        return sum(frame['bytes'] for frame in self.frames.values())
+
+
+class ChartCanvas(FigureCanvas):
+    # Agrupa rajadas de resize (arrastar a janela, animação da sidebar) em um único redesenho
+    def __init__(self, figure, settle_ms=150):
+        super().__init__(figure)
+        self.on_resize_settled = None
+        self._pending_size = None
+        self._last_frame = None
+        self._hover_cid = None
+        self._resize_timer = QtCore.QTimer(self)
+        self._resize_timer.setSingleShot(True)
+        self._resize_timer.setInterval(settle_ms)
+        self._resize_timer.timeout.connect(self._apply_pending_size)
+
+    def frame_key(self, *parts):
+        width, height = self.figure.bbox.size
+        return parts + (int(width), int(height), self.device_pixel_ratio)
+
+    def resizeEvent(self, event):
+        if self.figure is None:
+            return
+        if self._pending_size is None and hasattr(self, 'renderer'):
+            self._last_frame = self.snapshot()
+        self._pending_size = event.size()
+        QtWidgets.QWidget.resizeEvent(self, event)
+        self._resize_timer.start()
+
+    def _apply_pending_size(self):
+        size = self._pending_size
+        self._pending_size = None
+        self._last_frame = None
+        if size is None:
+            return
+        dpi = self.figure.dpi
+        self.figure.set_size_inches(size.width() * self.device_pixel_ratio / dpi,
+                                    size.height() * self.device_pixel_ratio / dpi,
+                                    forward=False)
+        ResizeEvent("resize_event", self)._process()
+        if self.on_resize_settled:
+            self.on_resize_settled()
+        else:
+            self.draw_idle()
+
+    def set_hover(self, callback):
+        # Cada redesenho cria um novo hover; o anterior precisa sair da lista de callbacks do canvas,
+        # senão as closures (e os eixos antigos que elas referenciam) se acumulam a cada atualização
+        if self._hover_cid is not None:
+            self.mpl_disconnect(self._hover_cid)
+            self._hover_cid = None
+        if callback is not None:
+            self._hover_cid = self.mpl_connect("motion_notify_event", callback)
+
+    def memory_bytes(self):
+        # Buffer RGBA do renderer Agg mais o quadro guardado durante o resize
+        renderer = getattr(self, 'renderer', None)
+        size = int(renderer.width) * int(renderer.height) * 4 if renderer is not None else 0
+        if self._last_frame is not None:
+            size += self._last_frame.sizeInBytes()
+        return size
+
+    def release(self):
+        # Descarta figura e buffer do renderer; o próximo draw() recria tudo no tamanho atual
+        self.set_hover(None)
+        self.figure.clear()
+        self._last_frame = None
+        if hasattr(self, 'renderer'):
+            del self.renderer
+            self._lastKey = None
+
+    def snapshot(self):
+        renderer = self.renderer
+        image = QtGui.QImage(bytes(self.buffer_rgba()), int(renderer.width), int(renderer.height),
+                             QtGui.QImage.Format_RGBA8888).copy()
+        image.setDevicePixelRatio(self.device_pixel_ratio)
+        return image
+
+    def draw(self):
+        with span('mpl.draw', 'chart'):
+            super().draw()
+
+    def restore_frame(self, frame):
+        self.figure.subplots_adjust(**frame['subplotpars'])
+        self.get_renderer().restore_region(frame['region'])
+        self.update()
+
+    def paintEvent(self, event):
+        # Enquanto o tamanho não assenta, reaproveita o último quadro escalado em vez de renderizar
+        if self._pending_size is not None and self._last_frame is not None:
+            painter = QtGui.QPainter(self)
+            painter.drawImage(self.rect(), self._last_frame)
+            painter.end()
+            return
+        with span('qt.paint', 'paint'):
+            super().paintEvent(event)
@@ -2,20 +2,73 @@ from PySide6 import QtWidgets, QtCore
 from PySide6.QtCore import QPropertyAnimation, QEasingCurve
 from PySide6.QtWidgets import QGraphicsDropShadowEffect
 from PySide6.QtGui import QColor
-from gui.themes import Themes
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from gui.themes import Themes, theme_name, themed_chart
 from matplotlib.figure import Figure
 import matplotlib.dates as mdates
-from datetime import datetime
+from datetime import datetime, timedelta
 from PySide6.QtPrintSupport import QPrinter
 from PySide6.QtGui import QPainter
+from .chart_canvas import ChartCanvas, FrameCache
+from utils.tracing import span, traced
+from services.aggregates import AggregateService
+from services.export import table_dataset
+from utils.memory import memory_budget
+
+GRANULARITY_LABELS = {'month': "Mês", 'week': "Semana", 'day': "Dia"}
+GRANULARITY_TITLES = {'month': "Mensal", 'week': "Semanal", 'day': "Diária"}
+# Granularidade -> (formato do período devolvido pelo serviço, formato do eixo)
+PERIOD_FORMATS = {
+    'month': ("%Y-%m", '%Y-%m'),
+    'week': ("%Y-%m-%d", '%d/%m/%y'),
+    'day': ("%Y-%m-%d", '%d/%m/%y'),
+}
+
+# Modo comparação: posição no ano (mês, semana ou dia do ano) no eixo x, um traço por ano
+MONTH_LABELS = ("Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez")
+MONTH_STARTS = (1, 32, 60, 91, 121, 152, 182, 213, 244, 274, 305, 335)
+ALIGNMENT_LABELS = {'month': "Mês", 'week': "Semana do ano", 'day': "Dia do ano"}
+COMPARISON_STYLES = ('-', '--', ':', '-.')
+MAX_COMPARED_YEARS = 5
+
+# Linhas marcadas como outlier na carga (tabela quarentena): somadas normalmente, fora das séries ou somadas com os
+# períodos afetados destacados
+OUTLIER_LABELS = {'incluir': "Incluir", 'excluir': "Excluir", 'destacar': "Destacar"}
+# Tabelas cujas versões validam os quadros em cache de cada gráfico
+CHART_TABLES = {'soja': ('ProducaoSoja', 'quarentena'), 'farelo': ('FareloSojaTostado', 'quarentena')}
+
+PRESETS = ("Todo o período", "Últimos 7 dias", "Últimos 30 dias", "Últimos 90 dias",
+           "Este mês", "Este ano", "Turno atual", "Personalizado")
+# Início de cada turno (hora); o último atravessa a meia-noite
+SHIFT_STARTS = (6, 14, 22)
+
+
+def shift_bounds(now):
+    # Início e fim (exclusivo) do turno que contém 'now'
+    start_hour = max((hour for hour in SHIFT_STARTS if hour <= now.hour), default=SHIFT_STARTS[-1])
+    start = now.replace(hour=start_hour, minute=0, second=0, microsecond=0)
+    if now.hour < start_hour:
+        start -= timedelta(days=1)
+    next_hours = [hour for hour in SHIFT_STARTS if hour > start_hour]
+    end = start.replace(hour=next_hours[0]) if next_hours else \
+        (start + timedelta(days=1)).replace(hour=SHIFT_STARTS[0])
+    return start, end
+
 
 class GrainDashboard(QtWidgets.QWidget):
     def __init__(self, db_handler, theme):
         super().__init__()
         self.db_handler = db_handler
+        self.service = AggregateService(db_handler)
         self.theme = theme
         self.animations = []
+        self.frame_cache = FrameCache()
+        self.chart_data = {}
+        # Séries de comparação por (gráfico, anos, granularidade, planta), validadas pela versão das tabelas;
+        # mostrar/ocultar um ano pela legenda só muda a visibilidade da linha, sem consulta nem redesenho completo
+        self.comparison_cache = {}
+        self.hidden_years = {'soja': set(), 'farelo': set()}
+        self.legend_lines = {}
+        self.released = False
         self.init_ui()
         self.apply_theme()
 
@@ -30,15 +83,27 @@ class GrainDashboard(QtWidgets.QWidget):
         self.charts_layout = QtWidgets.QVBoxLayout(self.charts_container)
         self.charts_layout.setSpacing(10)
         self.charts_layout.setContentsMargins(0, 0, 0, 0)
+        self.shadow = QGraphicsDropShadowEffect(self)
+        self.shadow.setBlurRadius(15)
+        self.shadow.setXOffset(5)
+        self.shadow.setYOffset(5)
+        self.shadow.setColor(QColor(100, 100, 100))
+        self.charts_container.setGraphicsEffect(self.shadow)
 
         self.fig_soja = Figure(facecolor=self.theme['bg_card'])
-        self.canvas_soja = FigureCanvas(self.fig_soja)
+        self.canvas_soja = ChartCanvas(self.fig_soja)
+        self.canvas_soja.on_resize_settled = lambda: self.refresh_chart('soja', self.fig_soja, self.canvas_soja)
+        self.canvas_soja.setProperty("role", "chart")
         self.canvas_soja.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
+        self.canvas_soja.mpl_connect('pick_event', self.on_legend_pick)
         self.update_soja_chart()
 
         self.fig_farelo = Figure(facecolor=self.theme['bg_card'])
-        self.canvas_farelo = FigureCanvas(self.fig_farelo)
+        self.canvas_farelo = ChartCanvas(self.fig_farelo)
+        self.canvas_farelo.on_resize_settled = lambda: self.refresh_chart('farelo', self.fig_farelo, self.canvas_farelo)
+        self.canvas_farelo.setProperty("role", "chart")
         self.canvas_farelo.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
+        self.canvas_farelo.mpl_connect('pick_event', self.on_legend_pick)
         self.update_farelo_chart()
 
         self.charts_layout.addWidget(self.canvas_soja)
@@ -51,120 +116,345 @@ class GrainDashboard(QtWidgets.QWidget):
         filter_layout = QtWidgets.QHBoxLayout()
         filter_layout.setSpacing(10)
 
-        self.year_label = QtWidgets.QLabel("Filtrar por Ano:")
-        filter_layout.addWidget(self.year_label)
-        self.year_combo = QtWidgets.QComboBox()
-        self.year_combo.addItems(["Todos"] + [str(year) for year in range(2020, 2026)])
-        self.year_combo.currentTextChanged.connect(self.update_charts)
-        filter_layout.addWidget(self.year_combo)
-
-        self.month_label = QtWidgets.QLabel("Filtrar por Mês:")
-        filter_layout.addWidget(self.month_label)
-        self.month_combo = QtWidgets.QComboBox()
-        self.month_combo.addItems(["Todos"] + [f"{i:02d}" for i in range(1, 13)])
-        self.month_combo.currentTextChanged.connect(self.update_charts)
-        filter_layout.addWidget(self.month_combo)
+        # Limites vêm dos próprios dados (MIN/MAX pelo índice de Data), não de uma lista fixa de anos
+        self.load_date_bounds()
+
+        self.preset_label = QtWidgets.QLabel("Período:")
+        filter_layout.addWidget(self.preset_label)
+        self.preset_combo = QtWidgets.QComboBox()
+        self.preset_combo.addItems(PRESETS)
+        filter_layout.addWidget(self.preset_combo)
+
+        self.start_label = QtWidgets.QLabel("De:")
+        filter_layout.addWidget(self.start_label)
+        self.start_edit = QtWidgets.QDateEdit(self.first_day)
+        self.start_label.setBuddy(self.start_edit)
+        filter_layout.addWidget(self.start_edit)
+
+        self.end_label = QtWidgets.QLabel("Até:")
+        filter_layout.addWidget(self.end_label)
+        self.end_edit = QtWidgets.QDateEdit(self.last_day)
+        filter_layout.addWidget(self.end_edit)
+
+        for date_edit in (self.start_edit, self.end_edit):
+            date_edit.setCalendarPopup(True)
+            date_edit.setDisplayFormat("dd/MM/yyyy")
+            date_edit.setDateRange(self.first_day, self.last_day)
+            date_edit.dateChanged.connect(self.on_dates_edited)
+
+        self.granularity_label = QtWidgets.QLabel("Agrupar por:")
+        filter_layout.addWidget(self.granularity_label)
+        self.granularity_combo = QtWidgets.QComboBox()
+        for granularity, label in GRANULARITY_LABELS.items():
+            self.granularity_combo.addItem(label, granularity)
+        self.granularity_combo.currentIndexChanged.connect(self.update_charts)
+        filter_layout.addWidget(self.granularity_combo)
+
+        self.preset_combo.currentTextChanged.connect(self.apply_preset)
+
+        self.plant_label = QtWidgets.QLabel("Planta:")
+        filter_layout.addWidget(self.plant_label)
+        self.plant_combo = QtWidgets.QComboBox()
+        self.plant_combo.addItem("Consolidado", None)
+        for name in self.db_handler.source_names():
+            self.plant_combo.addItem(name, name)
+        self.plant_combo.currentIndexChanged.connect(self.update_charts)
+        filter_layout.addWidget(self.plant_combo)
+        has_plants = len(self.db_handler.source_names()) > 1
+        self.plant_label.setVisible(has_plants)
+        self.plant_combo.setVisible(has_plants)
+
+        self.outlier_label = QtWidgets.QLabel("Outliers:")
+        filter_layout.addWidget(self.outlier_label)
+        self.outlier_combo = QtWidgets.QComboBox()
+        for mode, label in OUTLIER_LABELS.items():
+            self.outlier_combo.addItem(label, mode)
+        self.outlier_combo.setToolTip("Linhas marcadas como outlier na importação e ainda não liberadas da quarentena")
+        self.outlier_combo.currentIndexChanged.connect(self.update_charts)
+        filter_layout.addWidget(self.outlier_combo)
+
+        self.compare_check = QtWidgets.QCheckBox("Comparar anos")
+        self.compare_check.setToolTip("Sobrepõe os últimos anos até o ano da data final, alinhados pela granularidade")
+        self.compare_check.toggled.connect(self.update_charts)
+        filter_layout.addWidget(self.compare_check)
+        self.years_spin = QtWidgets.QSpinBox()
+        self.years_spin.setRange(2, MAX_COMPARED_YEARS)
+        self.years_spin.setSuffix(" anos")
+        self.years_spin.valueChanged.connect(lambda _value: self.compare_check.isChecked() and self.update_charts())
+        filter_layout.addWidget(self.years_spin)
 
         filter_layout.addStretch()
         self.layout.addLayout(filter_layout)
 
-    def get_connection(self):
-        if hasattr(self.db_handler, "get_connection"):
-            conn = self.db_handler.get_connection()
-            if conn:
-                return conn
-            else:
-                raise Exception("Falha ao obter conexão com o banco de dados.")
-        else:
-            raise AttributeError("O db_handler não possui o método 'get_connection'.")
+    def fetch_date_bounds(self):
+        try:
+            return self.service.date_bounds()
+        except Exception as e:
+            print(f"Erro ao buscar período disponível: {e}")
+            return None, None
+
+    def load_date_bounds(self):
+        # Relido a cada preset: dados carregados ou sincronizados depois da abertura entram em "Todo o período"
+        first_day, last_day = self.fetch_date_bounds()
+        self.first_day = QtCore.QDate.fromString(first_day, "yyyy-MM-dd") if first_day else QtCore.QDate.currentDate()
+        self.last_day = QtCore.QDate.fromString(last_day, "yyyy-MM-dd") if last_day else QtCore.QDate.currentDate()
+
+    @traced('grain.fetch_soja_producao', 'data')
+    def fetch_soja_producao(self, filters):
+        start, end, granularity, plant = filters
+        try:
+            return self.service.production_series(start, end, plant, granularity, self.series_outliers())
+        except Exception as e:
+            print(f"Erro ao buscar produção de soja: {e}")
+            return []
 
-    def fetch_soja_mensal(self, year_filter=None, month_filter=None):
+    @traced('grain.fetch_farelo_umidade', 'data')
+    def fetch_farelo_umidade(self, filters):
+        start, end, granularity, plant = filters
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                query = """
-                    SELECT strftime('%Y-%m', Data) as Mes, SUM(ProducaoDiaria) as Total_Mensal
-                    FROM ProducaoSoja
-                    WHERE 1=1
-                """
-                params = []
-                if year_filter and year_filter != "Todos":
-                    query += " AND strftime('%Y', Data) = ?"
-                    params.append(year_filter)
-                if month_filter and month_filter != "Todos":
-                    query += " AND strftime('%m', Data) = ?"
-                    params.append(month_filter)
-                query += " GROUP BY Mes ORDER BY Mes"
-                cursor.execute(query, params)
-                rows = cursor.fetchall()
-                return rows
+            return self.service.farelo_moisture_series(start, end, plant, granularity, self.series_outliers())
         except Exception as e:
-            print(f"Erro ao buscar produção mensal de soja: {e}")
+            print(f"Erro ao buscar umidade média do farelo: {e}")
             return []
 
-    def fetch_farelo_umidade_mensal(self, year_filter=None, month_filter=None):
+    def fetch_flagged(self, table, filters):
+        # {período: linhas em quarentena}, só no modo Destacar
+        if self.outlier_mode() != 'destacar':
+            return {}
+        start, end, granularity, plant = filters
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                query = """
-                    SELECT strftime('%Y-%m', Data) as Mes, AVG(UmidadeFarelo) as Umidade_Media
-                    FROM FareloSojaTostado
-                    WHERE 1=1
-                """
-                params = []
-                if year_filter and year_filter != "Todos":
-                    query += " AND strftime('%Y', Data) = ?"
-                    params.append(year_filter)
-                if month_filter and month_filter != "Todos":
-                    query += " AND strftime('%m', Data) = ?"
-                    params.append(month_filter)
-                query += " GROUP BY Mes ORDER BY Mes"
-                cursor.execute(query, params)
-                rows = cursor.fetchall()
-                return rows
+            return dict(self.service.flagged_periods(table, start, end, plant, granularity))
         except Exception as e:
-            print(f"Erro ao buscar umidade média do farelo por mês: {e}")
+            print(f"Erro ao buscar períodos com outliers: {e}")
+            return {}
+
+    def outlier_mode(self):
+        return self.outlier_combo.currentData()
+
+    def series_outliers(self):
+        # Destacar soma as linhas em quarentena como Incluir; só muda o desenho
+        return 'excluir' if self.outlier_mode() == 'excluir' else 'incluir'
+
+    def apply_preset(self, preset):
+        # Os presets só posicionam as datas. Data guarda só o dia, então o turno vira os dias que ele cobre
+        # (o turno da noite, dois)
+        if preset == "Personalizado":
+            return
+        self.load_date_bounds()
+        today = QtCore.QDate.currentDate()
+        ranges = {
+            "Todo o período": (self.first_day, self.last_day),
+            "Últimos 7 dias": (today.addDays(-6), today),
+            "Últimos 30 dias": (today.addDays(-29), today),
+            "Últimos 90 dias": (today.addDays(-89), today),
+            "Este mês": (QtCore.QDate(today.year(), today.month(), 1), today),
+            "Este ano": (QtCore.QDate(today.year(), 1, 1), today),
+        }
+        if preset == "Turno atual":
+            start, end = shift_bounds(datetime.now())
+            last_moment = end - timedelta(seconds=1)
+            first = QtCore.QDate(start.year, start.month, start.day)
+            last = QtCore.QDate(last_moment.year, last_moment.month, last_moment.day)
+        else:
+            first, last = ranges[preset]
+        self.set_dates(first, last)
+        self.update_charts()
+
+    def set_dates(self, first, last):
+        # Datas fora dos dados ficam livres no calendário só enquanto o preset pedir
+        for date_edit in (self.start_edit, self.end_edit):
+            date_edit.blockSignals(True)
+            date_edit.setDateRange(min(first, self.first_day), max(last, self.last_day))
+        self.start_edit.setDate(first)
+        self.end_edit.setDate(last)
+        for date_edit in (self.start_edit, self.end_edit):
+            date_edit.blockSignals(False)
+
+    def on_dates_edited(self):
+        if self.end_edit.date() < self.start_edit.date():
+            sender = self.sender()
+            other = self.end_edit if sender is self.start_edit else self.start_edit
+            other.blockSignals(True)
+            other.setDate(sender.date())
+            other.blockSignals(False)
+        self.preset_combo.blockSignals(True)
+        self.preset_combo.setCurrentText("Personalizado")
+        self.preset_combo.blockSignals(False)
+        self.update_charts()
+
+    def current_filters(self):
+        # (início, fim exclusivo, granularidade, planta): o fim é o dia seguinte ao último dia escolhido,
+        # assim registros com hora no último dia continuam dentro do intervalo
+        start = self.start_edit.date().toString("yyyy-MM-dd")
+        end = self.end_edit.date().addDays(1).toString("yyyy-MM-dd")
+        return start, end, self.granularity_combo.currentData(), self.plant_combo.currentData()
+
+    def comparison_years(self):
+        last = self.end_edit.date().year()
+        return tuple(range(last - self.years_spin.value() + 1, last + 1))
+
+    def comparison_state(self, name):
+        # Entra na chave do cache de quadros: o mesmo filtro desenha outro gráfico no modo comparação
+        if not self.compare_check.isChecked():
+            return ()
+        return ('comparar', self.comparison_years(), tuple(sorted(self.hidden_years[name])))
+
+    def fetch_comparison(self, name, filters, version):
+        # version é a mesma que entra na chave do quadro: série e raster em cache são validados juntos
+        _start, _end, granularity, plant = filters
+        method = {
+            'soja': self.service.production_comparison,
+            'farelo': self.service.farelo_moisture_comparison,
+        }[name]
+        years = self.comparison_years()
+        outliers = self.series_outliers()
+        key = (name, years, granularity, plant, outliers)
+        cached = self.comparison_cache.get(key)
+        if cached is not None and version is not None and cached[0] == version:
+            return cached[1]
+        try:
+            with span('grain.fetch_comparison', 'data', chart=name):
+                rows = method(years, plant, granularity, outliers)
+        except Exception as e:
+            print(f"Erro ao buscar comparação entre anos: {e}")
             return []
+        self.comparison_cache[key] = (version, rows)
+        return rows
+
+    @themed_chart
+    def draw_comparison(self, name, fig, canvas, filters, title, ylabel, value_text):
+        granularity = filters[2]
+        fig.clear()
+        ax = fig.add_subplot(111)
+        ax.set_title(f"{title} por {ALIGNMENT_LABELS[granularity]}: comparação entre anos", fontsize=14, pad=20)
+        ax.set_xlabel(ALIGNMENT_LABELS[granularity], fontsize=10, labelpad=15)
+        ax.set_ylabel(ylabel, fontsize=10, labelpad=15)
+
+        version = self.data_version(name, filters[3])
+        rows = self.fetch_comparison(name, filters, version)
+        self.chart_data[name] = (filters, rows, version)
+        years = self.comparison_years()
+        by_year = {year: ([], []) for year in years}
+        for year, position, value in rows:
+            if year in by_year and value is not None:
+                by_year[year][0].append(position)
+                by_year[year][1].append(value)
+
+        # Ano mais recente em destaque; anteriores mais claros e com traço diferente
+        lines = {}
+        for age, year in enumerate(reversed(years)):
+            positions, values = by_year[year]
+            if not positions:
+                continue
+            line, = ax.plot(positions, values, marker='o', markersize=4, linewidth=2,
+                            linestyle=COMPARISON_STYLES[age % len(COMPARISON_STYLES)], color=self.theme['red'],
+                            alpha=1 - 0.6 * age / max(len(years) - 1, 1), label=str(year))
+            line.set_visible(year not in self.hidden_years[name])
+            lines[year] = line
+
+        if granularity == 'month':
+            ax.set_xticks(range(1, 13), MONTH_LABELS)
+            ax.set_xlim(0.5, 12.5)
+        elif granularity == 'day':
+            ax.set_xticks(MONTH_STARTS, MONTH_LABELS)
+            ax.set_xlim(0, 367)
+        else:
+            ax.set_xlim(-0.5, 53.5)
+
+        self.legend_lines[name] = {}
+        if lines:
+            legend = ax.legend(fontsize=8, loc='upper right', title="Clique para ocultar", title_fontsize=7)
+            for legend_line, (year, line) in zip(legend.get_lines(), lines.items()):
+                legend_line.set_picker(5)
+                legend_line.set_alpha(1.0 if line.get_visible() else 0.2)
+                self.legend_lines[name][legend_line] = (year, line)
+
+        annotation = ax.annotate("", xy=(0, 0), xytext=(10, 10), textcoords="offset pixels",
+                                 bbox=dict(boxstyle="round,pad=0.5", fc=self.theme['bg_card'], alpha=0.9,
+                                           ec=self.theme['border']),
+                                 color=self.theme['text_primary'], visible=False, zorder=10)
+
+        def hover(event):
+            if event.inaxes == ax:
+                for year, line in lines.items():
+                    if not line.get_visible():
+                        continue
+                    cont, ind = line.contains(event)
+                    if cont:
+                        idx = ind["ind"][0]
+                        position, value = by_year[year][0][idx], by_year[year][1][idx]
+                        label = MONTH_LABELS[position - 1] if granularity == 'month' else position
+                        annotation.xy = (position, value)
+                        annotation.set_text(f"Ano: {year}\n{ALIGNMENT_LABELS[granularity]}: {label}\n"
+                                            f"{value_text(value)}")
+                        annotation.set_visible(True)
+                        canvas.draw_idle()
+                        return
+            if annotation.get_visible():
+                annotation.set_visible(False)
+                canvas.draw_idle()
+
+        canvas.set_hover(hover)
+        self.adjust_figure_size(fig, canvas)
+        key = self.chart_key(name, canvas, filters, version)
+        self.render_chart(key, self.frame_cache.get(key), fig, canvas, rows)
+
+    def on_legend_pick(self, event):
+        # Mostrar/ocultar um ano: só visibilidade de artistas já desenhados, sem consulta
+        for name, entries in self.legend_lines.items():
+            entry = entries.get(event.artist)
+            if entry is None:
+                continue
+            year, line = entry
+            hidden = self.hidden_years[name]
+            hidden.symmetric_difference_update({year})
+            line.set_visible(year not in hidden)
+            event.artist.set_alpha(1.0 if line.get_visible() else 0.2)
+            event.artist.figure.canvas.draw_idle()
+            return
 
     def update_charts(self):
-        year_filter = self.year_combo.currentText()
-        month_filter = self.month_combo.currentText()
-        self.update_soja_chart(year_filter, month_filter)
-        self.update_farelo_chart(year_filter, month_filter)
+        filters = self.current_filters()
+        self.update_soja_chart(filters)
+        self.update_farelo_chart(filters)
         self.animate_charts_entrance()
 
-    def update_soja_chart(self, year_filter=None, month_filter=None):
+    @traced('grain.update_soja_chart', 'chart')
+    @themed_chart
+    def update_soja_chart(self, filters=None):
+        filters = filters or self.current_filters()
+        if self.compare_check.isChecked():
+            self.draw_comparison('soja', self.fig_soja, self.canvas_soja, filters, "Produção de Soja",
+                                 "Produção (ton)", lambda value: f"Produção: {value:.2f} ton")
+            return
+        granularity = filters[2]
         self.fig_soja.clear()
         ax = self.fig_soja.add_subplot(111)
-        ax.set_title("Produção Mensal de Soja", fontsize=14, pad=20, color=self.theme['text_primary'])
-        ax.set_xlabel("Mês", fontsize=10, color=self.theme['text_secondary'], labelpad=15)  
-        ax.set_ylabel("Produção (ton)", fontsize=10, color=self.theme['text_secondary'], labelpad=15)  
+        ax.set_title(f"Produção {GRANULARITY_TITLES[granularity]} de Soja", fontsize=14, pad=20)
+        ax.set_xlabel(GRANULARITY_LABELS[granularity], fontsize=10, labelpad=15)
+        ax.set_ylabel("Produção (ton)", fontsize=10, labelpad=15)
 
-        dados = self.fetch_soja_mensal(year_filter, month_filter)
-        meses = [datetime.strptime(d[0], "%Y-%m") for d in dados]
+        version = self.data_version('soja', filters[3])
+        self.adjust_figure_size(self.fig_soja, self.canvas_soja)
+        key = self.chart_key('soja', self.canvas_soja, filters, version)
+        frame = self.frame_cache.get(key)
+        dados, flagged = frame['data'] if frame else (self.fetch_soja_producao(filters),
+                                                      self.fetch_flagged('ProducaoSoja', filters))
+        self.chart_data['soja'] = (filters, (dados, flagged), version)
+        meses = self.parse_periods(dados, granularity)
         producao = [d[1] for d in dados]
-
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m'))
-        ax.xaxis.set_major_locator(mdates.MonthLocator())
+        period_format = self.set_date_axis(ax, granularity)
         self.fig_soja.autofmt_xdate()
 
         line, = ax.plot(meses, producao, marker='o', linestyle='-', color='red',
                         linewidth=2, markersize=6)
+        self.draw_flagged(ax, meses, producao, dados, flagged)
 
-        ax.grid(True, linestyle='--', alpha=0.7, color=self.theme['border'])
-        ax.set_facecolor(self.theme['bg_secondary'])
-        ax.tick_params(axis='both', colors=self.theme['text_secondary'], labelsize=8)
-
-        for spine in ax.spines.values():
-            spine.set_linewidth(0.5)
-            spine.set_color(self.theme['border'])
         ax.set_xlim(ax.get_xlim())
         ax.set_ylim(ax.get_ylim())
         y_min, y_max = ax.get_ylim()
         y_padding = (y_max - y_min) * 0.1
         ax.set_ylim(y_min - y_padding, y_max + y_padding)
-        ax.spines['top'].set_visible(False)
-        ax.spines['right'].set_visible(False)
         ax.spines['left'].set_position(('outward', 10))
         ax.spines['bottom'].set_position(('outward', 10))
 
@@ -187,7 +477,9 @@ class GrainDashboard(QtWidgets.QWidget):
                     if 0 <= idx < len(meses):
                         x, y = meses[idx], producao[idx]
                         self.annotation_soja.xy = (x, y)
-                        self.annotation_soja.set_text(f"Mês: {meses[idx]:%Y-%m}\nProdução: {producao[idx]:.2f} ton")
+                        self.annotation_soja.set_text(
+                            f"{GRANULARITY_LABELS[granularity]}: {meses[idx].strftime(period_format)}\n"
+                            f"Produção: {producao[idx]:.2f} ton" + self.flagged_text(dados[idx][0], flagged))
                         
                         xlim = ax.get_xlim()
                         ylim = ax.get_ylim()
@@ -224,45 +516,47 @@ class GrainDashboard(QtWidgets.QWidget):
                         self.annotation_soja.set_visible(False)
                         self.fig_soja.canvas.draw_idle()
         
-        self.fig_soja.canvas.mpl_connect("motion_notify_event", hover)
-
-        self.fig_soja.tight_layout()
-        self.adjust_figure_size(self.fig_soja, self.canvas_soja)
-        self.canvas_soja.draw()
-
-    def update_farelo_chart(self, year_filter=None, month_filter=None):
+        self.canvas_soja.set_hover(hover)
+
+        self.render_chart(key, frame, self.fig_soja, self.canvas_soja, (dados, flagged))
+
+    @traced('grain.update_farelo_chart', 'chart')
+    @themed_chart
+    def update_farelo_chart(self, filters=None):
+        filters = filters or self.current_filters()
+        if self.compare_check.isChecked():
+            self.draw_comparison('farelo', self.fig_farelo, self.canvas_farelo, filters, "Umidade Média do Farelo",
+                                 "Umidade (%)", lambda value: f"Umidade: {value:.2f}%")
+            return
+        granularity = filters[2]
         self.fig_farelo.clear()
         ax = self.fig_farelo.add_subplot(111)
-        ax.set_title("Umidade Média do Farelo por Mês", fontsize=14, pad=20, color=self.theme['text_primary'])  # Increased padding
-        ax.set_xlabel("Mês", fontsize=10, color=self.theme['text_secondary'], labelpad=15)  # Increased label padding
-        ax.set_ylabel("Umidade (%)", fontsize=10, color=self.theme['text_secondary'], labelpad=15)  # Increased label padding
+        ax.set_title(f"Umidade Média do Farelo por {GRANULARITY_LABELS[granularity]}", fontsize=14, pad=20)
+        ax.set_xlabel(GRANULARITY_LABELS[granularity], fontsize=10, labelpad=15)
+        ax.set_ylabel("Umidade (%)", fontsize=10, labelpad=15)
 
-        dados = self.fetch_farelo_umidade_mensal(year_filter, month_filter)
-        meses = [datetime.strptime(d[0], "%Y-%m") for d in dados]
+        version = self.data_version('farelo', filters[3])
+        self.adjust_figure_size(self.fig_farelo, self.canvas_farelo)
+        key = self.chart_key('farelo', self.canvas_farelo, filters, version)
+        frame = self.frame_cache.get(key)
+        dados, flagged = frame['data'] if frame else (self.fetch_farelo_umidade(filters),
+                                                      self.fetch_flagged('FareloSojaTostado', filters))
+        self.chart_data['farelo'] = (filters, (dados, flagged), version)
+        meses = self.parse_periods(dados, granularity)
         umidade = [d[1] for d in dados]
-
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m'))
-        ax.xaxis.set_major_locator(mdates.MonthLocator())
+        period_format = self.set_date_axis(ax, granularity)
         self.fig_farelo.autofmt_xdate()
 
         # Plotar a linha principal em vermelho
         line, = ax.plot(meses, umidade, marker='o', linestyle='-', color='red',
                         linewidth=2, markersize=6)
+        self.draw_flagged(ax, meses, umidade, dados, flagged)
 
-        ax.grid(True, linestyle='--', alpha=0.7, color=self.theme['border'])
-        ax.set_facecolor(self.theme['bg_secondary'])
-        ax.tick_params(axis='both', colors=self.theme['text_secondary'], labelsize=8)
-
-        for spine in ax.spines.values():
-            spine.set_linewidth(0.5)
-            spine.set_color(self.theme['border'])
         ax.set_xlim(ax.get_xlim())
         ax.set_ylim(ax.get_ylim())
         y_min, y_max = ax.get_ylim()
         y_padding = (y_max - y_min) * 0.1  # 10% padding
         ax.set_ylim(y_min - y_padding, y_max + y_padding)
-        ax.spines['top'].set_visible(False)
-        ax.spines['right'].set_visible(False)
         ax.spines['left'].set_position(('outward', 10))  # Increased spacing
         ax.spines['bottom'].set_position(('outward', 10))
 
@@ -284,7 +578,9 @@ class GrainDashboard(QtWidgets.QWidget):
                     if 0 <= idx < len(meses):
                         x, y = meses[idx], umidade[idx]
                         self.annotation_farelo.xy = (x, y)
-                        self.annotation_farelo.set_text(f"Mês: {meses[idx]:%Y-%m}\nUmidade: {umidade[idx]:.2f}%")
+                        self.annotation_farelo.set_text(
+                            f"{GRANULARITY_LABELS[granularity]}: {meses[idx].strftime(period_format)}\n"
+                            f"Umidade: {umidade[idx]:.2f}%" + self.flagged_text(dados[idx][0], flagged))
                         
                         xlim = ax.get_xlim()
                         ylim = ax.get_ylim()
@@ -320,68 +616,86 @@ class GrainDashboard(QtWidgets.QWidget):
                         self.annotation_farelo.set_visible(False)
                         self.fig_farelo.canvas.draw_idle()
         
-        self.fig_farelo.canvas.mpl_connect("motion_notify_event", hover)
+        self.canvas_farelo.set_hover(hover)
 
-        self.fig_farelo.tight_layout()
-        self.adjust_figure_size(self.fig_farelo, self.canvas_farelo)
-        self.canvas_farelo.draw()
+        self.render_chart(key, frame, self.fig_farelo, self.canvas_farelo, (dados, flagged))
+
+    def draw_flagged(self, ax, periods, values, dados, flagged):
+        # Modo Destacar: anel nos pontos cujo período tem linhas em quarentena (o valor ainda as inclui)
+        marked = [i for i, d in enumerate(dados) if d[0] in flagged]
+        if not marked:
+            return
+        total = sum(flagged[dados[i][0]] for i in marked)
+        ax.scatter([periods[i] for i in marked], [values[i] for i in marked], s=180, facecolors='none',
+                   edgecolors=self.theme['warning'], linewidths=2, zorder=5,
+                   label=f"Com outliers em quarentena ({total} linhas)")
+        ax.legend(fontsize=8, loc='upper right')
+
+    def flagged_text(self, period, flagged):
+        return f"\nOutliers em quarentena: {flagged[period]}" if period in flagged else ""
 
     def adjust_figure_size(self, fig, canvas):
         width = canvas.width() / 100
         height = canvas.height() / 100
         fig.set_size_inches(max(width, 5), max(height, 2))
 
-    def resizeEvent(self, event):
-        super().resizeEvent(event)
-        self.adjust_figure_size(self.fig_soja, self.canvas_soja)
-        self.adjust_figure_size(self.fig_farelo, self.canvas_farelo)
-        self.canvas_soja.draw()
-        self.canvas_farelo.draw()
+    def parse_periods(self, dados, granularity):
+        period_format = PERIOD_FORMATS[granularity][0]
+        return [datetime.strptime(d[0], period_format) for d in dados]
 
-    def apply_theme(self):
-        shadow = QGraphicsDropShadowEffect(self)
-        shadow.setBlurRadius(15)
-        shadow.setXOffset(5)
-        shadow.setYOffset(5)
-        shadow.setColor(QColor(100, 100, 100))
-        self.charts_container.setGraphicsEffect(shadow)
-        self.canvas_soja.setStyleSheet(f"border: 1px solid {self.theme['border']}; border-radius: 10px;")
-        self.canvas_farelo.setStyleSheet(f"border: 1px solid {self.theme['border']}; border-radius: 10px;")
-
-        self.year_label.setStyleSheet(f"color: {self.theme['text_primary']};")
-        self.month_label.setStyleSheet(f"color: {self.theme['text_primary']};")
-        combo_style = f"""
-            QComboBox {{
-                background-color: {self.theme['bg_card']};
-                color: {self.theme['text_primary']};
-                border: 1px solid {self.theme['border']};
-                border-radius: 5px;
-                padding: 5px;
-            }}
-            QComboBox::drop-down {{
-                border-left: 1px solid {self.theme['border']};
-            }}
-            QComboBox:hover {{
-                background-color: {self.theme['hover']};
-            }}
-            QComboBox QAbstractItemView {{
-                background-color: {self.theme['bg_card']};
-                color: {self.theme['text_primary']};
-                selection-background-color: {self.theme['hover']};
-            }}
-        """
-        self.year_combo.setStyleSheet(combo_style)
-        self.month_combo.setStyleSheet(combo_style)
+    def set_date_axis(self, ax, granularity):
+        # Mês mantém um tique por mês; semana/dia deixam o matplotlib escolher o espaçamento
+        axis_format = PERIOD_FORMATS[granularity][1]
+        if granularity == 'month':
+            ax.xaxis.set_major_locator(mdates.MonthLocator())
+        else:
+            ax.xaxis.set_major_locator(mdates.AutoDateLocator(maxticks=12))
+        ax.xaxis.set_major_formatter(mdates.DateFormatter(axis_format))
+        return axis_format
+
+    def data_version(self, name, plant):
+        # Versões das tabelas do gráfico (triggers de table_versions); None quando não há como validar o cache
+        try:
+            versions = self.service.data_versions(CHART_TABLES[name], plant)
+        except Exception as e:
+            print(f"Erro ao ler versões dos dados: {e}")
+            return None
+        return tuple(sorted(versions.items())) if versions is not None else None
+
+    def chart_key(self, name, canvas, filters, version):
+        # Sem versão dos dados o quadro não entra no cache: não haveria como saber quando ficou desatualizado
+        if version is None:
+            return None
+        return canvas.frame_key(name, *filters, theme_name(self.theme), self.outlier_mode(), version,
+                                *self.comparison_state(name))
+
+    def render_chart(self, key, frame, fig, canvas, dados):
+        # Estado já visto (gráfico, filtros, dados, tema e tamanho): copia o raster em cache em vez de renderizar
+        if frame:
+            canvas.restore_frame(frame)
+            return
+        with span('mpl.tight_layout', 'layout'):
+            fig.tight_layout()
+        canvas.draw()
+        if key is not None:
+            self.frame_cache.store(key, canvas, dados)
+
+    @themed_chart
+    def refresh_chart(self, name, fig, canvas):
+        if name not in self.chart_data:
+            return
+        filters, dados, version = self.chart_data[name]
+        if self.data_version(name, filters[3]) != version:
+            # Dados mudaram desde o último desenho: os artistas atuais estão desatualizados, redesenha com consulta
+            {'soja': self.update_soja_chart, 'farelo': self.update_farelo_chart}[name](filters)
+            return
+        self.adjust_figure_size(fig, canvas)
+        key = self.chart_key(name, canvas, filters, version)
+        self.render_chart(key, self.frame_cache.get(key), fig, canvas, dados)
 
+    def apply_theme(self):
         self.fig_soja.set_facecolor(self.theme['bg_card'])
         self.fig_farelo.set_facecolor(self.theme['bg_card'])
-        for ax in self.fig_soja.get_axes():
-            ax.set_facecolor(self.theme['bg_secondary'])
-        for ax in self.fig_farelo.get_axes():
-            ax.set_facecolor(self.theme['bg_secondary'])
-
-        self.canvas_soja.draw()
-        self.canvas_farelo.draw()
 
     def animate_charts_entrance(self):
         for animation in self.animations:
@@ -389,7 +703,6 @@ class GrainDashboard(QtWidgets.QWidget):
         self.animations.clear()
 
         for widget in [self.canvas_soja, self.canvas_farelo]:
-            widget.setStyleSheet(f"opacity: 0; border: 1px solid {self.theme['border']}; border-radius: 10px;")
             animation = QPropertyAnimation(widget, b"windowOpacity", self)
             animation.setDuration(1000)
             animation.setStartValue(0.0)
@@ -400,8 +713,41 @@ class GrainDashboard(QtWidgets.QWidget):
 
     def update_theme(self, theme):
         self.theme = theme
-        self.update_charts()
         self.apply_theme()
+        if not self.released:
+            self.update_charts()
+
+    def memory_footprint(self):
+        return {
+            'gráficos': self.canvas_soja.memory_bytes() + self.canvas_farelo.memory_bytes(),
+            'cache de quadros': self.frame_cache.memory_bytes(),
+        }
+
+    def release_memory(self):
+        self.frame_cache.clear()
+        self.chart_data.clear()
+        self.comparison_cache.clear()
+        self.legend_lines.clear()
+        self.canvas_soja.release()
+        self.canvas_farelo.release()
+        self.released = True
+
+    def restore_memory(self):
+        self.released = False
+        self.apply_theme()
+        self.update_charts()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        memory_budget.touch(self)
+
+    def export_datasets(self):
+        # Linhas brutas com os mesmos filtros dos gráficos
+        start, end, _granularity, plant = self.current_filters()
+        return [
+            table_dataset(self.db_handler, table, plant=plant, start=start, end=end)
+            for table in ('ProducaoSoja', 'FareloSojaTostado')
+        ]
 
     def export_to_pdf(self, file_path):
         printer = QPrinter(QPrinter.HighResolution)
@@ -0,0 +1,301 @@
+from PySide6 import QtWidgets, QtCore, QtGui
+from PySide6.QtPrintSupport import QPrinter
+from utils.tracing import span, traced
+from utils.memory import memory_budget
+from services.export import table_dataset
+from database.db_handler import LOCAL_SOURCE
+
+BOARD_POLL_MS = 1000
+TILE_WIDTH = 168
+TILE_HEIGHT = 76
+TILE_GAP = 8
+MIN_ZOOM = 0.4
+MAX_ZOOM = 2.5
+# Abaixo deste zoom o bloco mostra só a cor e o nome: texto pequeno demais custa desenho e não se lê
+DETAIL_ZOOM = 0.75
+STATUS_COLORS = {
+    'Operando': 'success',
+    'Parada': 'red',
+    'Manutenção': 'warning',
+}
+
+
+class MachineBoard(QtWidgets.QAbstractScrollArea):
+    # Quadro de máquinas desenhado em um único viewport: cada bloco é um QPixmap em cache, e o paintEvent
+    # só copia os pixmaps dos blocos dentro da área exposta. Mudança de status invalida apenas o bloco afetado
+    def __init__(self, theme, parent=None):
+        super().__init__(parent)
+        self.theme = theme
+        self.machines = []
+        self.positions = {}
+        self.pixmaps = {}
+        self.zoom = 1.0
+        self.columns = 1
+        self.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+        self.viewport().setAttribute(QtCore.Qt.WA_OpaquePaintEvent)
+        self.viewport().setMouseTracking(True)
+
+    def tile_size(self):
+        return int(TILE_WIDTH * self.zoom), int(TILE_HEIGHT * self.zoom)
+
+    def set_machines(self, machines):
+        # machines: [(id, nome, status, última manutenção)]; devolve quantos blocos mudaram
+        previous = {machine[0]: machine for machine in self.machines}
+        same_layout = [machine[0] for machine in machines] == [machine[0] for machine in self.machines]
+        self.machines = list(machines)
+        if not same_layout:
+            self.pixmaps.clear()
+            self.relayout()
+            self.viewport().update()
+            return len(machines)
+        dirty = [machine for machine in machines if previous.get(machine[0]) != machine]
+        offset = self.verticalScrollBar().value()
+        for machine in dirty:
+            self.pixmaps.pop(machine[0], None)
+            self.viewport().update(self.positions[machine[0]].translated(0, -offset))
+        return len(dirty)
+
+    def relayout(self):
+        width, height = self.tile_size()
+        self.columns = max(1, (self.viewport().width() - TILE_GAP) // (width + TILE_GAP))
+        self.positions = {
+            machine[0]: QtCore.QRect(TILE_GAP + (i % self.columns) * (width + TILE_GAP),
+                                     TILE_GAP + (i // self.columns) * (height + TILE_GAP), width, height)
+            for i, machine in enumerate(self.machines)
+        }
+        rows = (len(self.machines) + self.columns - 1) // self.columns
+        content_height = TILE_GAP + rows * (height + TILE_GAP)
+        scrollbar = self.verticalScrollBar()
+        scrollbar.setRange(0, max(0, content_height - self.viewport().height()))
+        scrollbar.setPageStep(self.viewport().height())
+        scrollbar.setSingleStep(height // 2 + TILE_GAP)
+
+    def set_theme(self, theme):
+        self.theme = theme
+        self.pixmaps.clear()
+        self.viewport().update()
+
+    def set_zoom(self, zoom, anchor=None):
+        zoom = min(MAX_ZOOM, max(MIN_ZOOM, zoom))
+        if zoom == self.zoom:
+            return
+        # Mantém sob o cursor o mesmo ponto do conteúdo
+        anchor_y = anchor.y() if anchor is not None else self.viewport().height() / 2
+        content_y = (self.verticalScrollBar().value() + anchor_y) / self.zoom
+        self.zoom = zoom
+        self.pixmaps.clear()
+        self.relayout()
+        self.verticalScrollBar().setValue(int(content_y * zoom - anchor_y))
+        self.viewport().update()
+
+    def render_tile(self, machine):
+        _id, name, status, last_maintenance = machine
+        width, height = self.tile_size()
+        ratio = self.devicePixelRatioF()
+        pixmap = QtGui.QPixmap(int(width * ratio), int(height * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(QtCore.Qt.transparent)
+
+        painter = QtGui.QPainter(pixmap)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        color = QtGui.QColor(self.theme.get(STATUS_COLORS.get(status), self.theme['accent']))
+        painter.setPen(QtGui.QPen(QtGui.QColor(self.theme['border']), 1))
+        painter.setBrush(QtGui.QColor(self.theme['bg_primary']))
+        painter.drawRoundedRect(QtCore.QRectF(0.5, 0.5, width - 1, height - 1), 6, 6)
+        painter.setPen(QtCore.Qt.NoPen)
+        painter.setBrush(color)
+        painter.drawRoundedRect(QtCore.QRectF(0.5, 0.5, max(6, 8 * self.zoom), height - 1), 6, 6)
+
+        painter.setPen(QtGui.QColor(self.theme['text_primary']))
+        margin = int(14 * self.zoom)
+        text_width = width - margin - 6
+        font = QtGui.QFont('Segoe UI', max(6, int(10 * self.zoom)), QtGui.QFont.Bold)
+        painter.setFont(font)
+        metrics = QtGui.QFontMetrics(font)
+        if self.zoom < DETAIL_ZOOM:
+            painter.drawText(QtCore.QRect(margin, 0, text_width, height), QtCore.Qt.AlignVCenter,
+                             metrics.elidedText(name, QtCore.Qt.ElideRight, text_width))
+        else:
+            line = height // 3
+            painter.drawText(QtCore.QRect(margin, 4, text_width, line), QtCore.Qt.AlignVCenter,
+                             metrics.elidedText(name, QtCore.Qt.ElideRight, text_width))
+            font.setBold(False)
+            font.setPointSize(max(6, int(9 * self.zoom)))
+            painter.setFont(font)
+            painter.setPen(color)
+            painter.drawText(QtCore.QRect(margin, 4 + line, text_width, line), QtCore.Qt.AlignVCenter, status)
+            painter.setPen(QtGui.QColor(self.theme['text_secondary']))
+            painter.drawText(QtCore.QRect(margin, 4 + 2 * line, text_width, line - 4), QtCore.Qt.AlignVCenter,
+                             f"Manut.: {(last_maintenance or '-')[:10]}")
+        painter.end()
+        return pixmap
+
+    def tile_at(self, point):
+        width, height = self.tile_size()
+        x, y = point.x() - TILE_GAP, point.y() + self.verticalScrollBar().value() - TILE_GAP
+        column, row = x // (width + TILE_GAP), y // (height + TILE_GAP)
+        if x < 0 or y < 0 or column >= self.columns or x % (width + TILE_GAP) >= width \
+                or y % (height + TILE_GAP) >= height:
+            return None
+        index = int(row * self.columns + column)
+        return self.machines[index] if index < len(self.machines) else None
+
+    def paintEvent(self, event):
+        with span('machines.paint', 'paint'):
+            painter = QtGui.QPainter(self.viewport())
+            exposed = event.rect()
+            painter.fillRect(exposed, QtGui.QColor(self.theme['bg_card']))
+            if not self.machines:
+                painter.end()
+                return
+            # Só as linhas de blocos que cruzam a área exposta: o custo independe do total de máquinas
+            width, height = self.tile_size()
+            offset = self.verticalScrollBar().value()
+            first_row = max(0, (exposed.top() + offset - TILE_GAP) // (height + TILE_GAP))
+            last_row = (exposed.bottom() + offset - TILE_GAP) // (height + TILE_GAP)
+            start = first_row * self.columns
+            end = min(len(self.machines), (last_row + 1) * self.columns)
+            for machine in self.machines[start:end]:
+                rect = self.positions[machine[0]].translated(0, -offset)
+                if not rect.intersects(exposed):
+                    continue
+                pixmap = self.pixmaps.get(machine[0])
+                if pixmap is None:
+                    pixmap = self.pixmaps[machine[0]] = self.render_tile(machine)
+                painter.drawPixmap(rect.topLeft(), pixmap)
+            painter.end()
+
+    def scrollContentsBy(self, dx, dy):
+        # Desloca os pixels já desenhados e repinta só a faixa que entrou na tela
+        self.viewport().scroll(dx, dy)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.relayout()
+
+    def wheelEvent(self, event):
+        if event.modifiers() & QtCore.Qt.ControlModifier:
+            steps = event.angleDelta().y() / 120
+            self.set_zoom(self.zoom * (1.15 ** steps), event.position())
+            event.accept()
+            return
+        super().wheelEvent(event)
+
+    def viewportEvent(self, event):
+        if event.type() == QtCore.QEvent.ToolTip:
+            machine = self.tile_at(event.pos())
+            if machine is None:
+                QtWidgets.QToolTip.hideText()
+            else:
+                _id, name, status, last_maintenance = machine
+                QtWidgets.QToolTip.showText(event.globalPos(),
+                                            f"{name}\nStatus: {status}\nÚltima manutenção: {last_maintenance or '-'}",
+                                            self.viewport())
+            return True
+        return super().viewportEvent(event)
+
+    def memory_bytes(self):
+        return sum(pixmap.width() * pixmap.height() * pixmap.depth() // 8 for pixmap in self.pixmaps.values())
+
+    def release(self):
+        self.pixmaps.clear()
+
+
+class MachinesDashboard(QtWidgets.QWidget):
+    def __init__(self, db_handler, theme):
+        super().__init__()
+        self.db_handler = db_handler
+        self.theme = theme
+        self.version = None
+        self.init_ui()
+        self.refresh_machines(force=True)
+
+        self.poll_timer = QtCore.QTimer(self)
+        self.poll_timer.setInterval(BOARD_POLL_MS)
+        self.poll_timer.timeout.connect(self.refresh_machines)
+        self.poll_timer.start()
+
+    def init_ui(self):
+        self.layout = QtWidgets.QVBoxLayout(self)
+        self.layout.setSpacing(20)
+
+        summary_layout = QtWidgets.QHBoxLayout()
+        summary_layout.setSpacing(10)
+        self.summary_labels = {}
+        for status in ("Total", *STATUS_COLORS):
+            label = QtWidgets.QLabel()
+            label.setAlignment(QtCore.Qt.AlignCenter)
+            label.setProperty("role", "kpiCard")
+            label.setFixedSize(180, 80)
+            summary_layout.addWidget(label)
+            self.summary_labels[status] = label
+        summary_layout.addStretch()
+        hint = QtWidgets.QLabel("Ctrl + roda do mouse: zoom")
+        summary_layout.addWidget(hint)
+        self.layout.addLayout(summary_layout)
+
+        self.board = MachineBoard(self.theme)
+        self.board.setMinimumHeight(500)
+        self.layout.addWidget(self.board)
+
+    def current_version(self):
+        try:
+            return self.db_handler.table_versions(('maquinas',), LOCAL_SOURCE).get('maquinas')
+        except Exception as e:
+            print(f"Erro ao ler versão da tabela de máquinas: {e}")
+            return None
+
+    @traced('machines.refresh', 'data')
+    def refresh_machines(self, force=False):
+        if not force and not self.isVisible():
+            return
+        version = self.current_version()
+        if not force and version == self.version:
+            return
+        self.version = version
+        try:
+            rows = self.db_handler.read("SELECT id, name, status, last_maintenance FROM maquinas ORDER BY name, id")
+        except Exception as e:
+            print(f"Erro ao buscar máquinas: {e}")
+            rows = []
+        self.board.set_machines(rows)
+        self.update_summary(rows)
+
+    def update_summary(self, rows):
+        counts = {}
+        for row in rows:
+            counts[row[2]] = counts.get(row[2], 0) + 1
+        self.summary_labels["Total"].setText(f"Máquinas\n{len(rows)}")
+        for status in STATUS_COLORS:
+            self.summary_labels[status].setText(f"{status}\n{counts.get(status, 0)}")
+
+    def update_theme(self, theme):
+        self.theme = theme
+        self.board.set_theme(theme)
+
+    def memory_footprint(self):
+        return {'blocos': self.board.memory_bytes()}
+
+    def release_memory(self):
+        self.board.release()
+
+    def restore_memory(self):
+        # Os blocos são redesenhados sob demanda no próximo paintEvent
+        self.board.viewport().update()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        memory_budget.touch(self)
+        self.refresh_machines()
+
+    def export_datasets(self):
+        return [table_dataset(self.db_handler, 'maquinas', plant=LOCAL_SOURCE, order_by='id')]
+
+    def export_to_pdf(self, file_path):
+        printer = QPrinter(QPrinter.HighResolution)
+        printer.setOutputFormat(QPrinter.PdfFormat)
+        printer.setOutputFileName(file_path)
+
+        painter = QtGui.QPainter(printer)
+        self.render(painter)
+        painter.end()
@@ -1,69 +1,180 @@
+import html
 from PySide6 import QtWidgets, QtCore
 from PySide6.QtWidgets import QGraphicsDropShadowEffect
 from PySide6.QtGui import QColor
 from PySide6.QtPrintSupport import QPrinter
-from gui.themes import Themes
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from gui.themes import Themes, theme_name, themed_chart
 from matplotlib.figure import Figure
+from matplotlib.colors import to_rgba
+import numpy as np
 import pandas as pd
+import matplotlib.dates as mdates
+from .chart_canvas import ChartCanvas, FrameCache
+from .maintenance_timeline import MaintenanceTimeline
+from .strategy_panel import StrategyPanel
+from utils.tracing import span, traced
+from services.aggregates import AggregateService
+from services.export import table_dataset
+from services.search import MaintenanceSearch
+from database.db_handler import LOCAL_SOURCE, ISO_DATETIME
+from analytics.intervals import IntervalIndex
+from utils.memory import memory_budget, dataframe_bytes
+
+COUNTERS_POLL_MS = 2000
+SEARCH_DEBOUNCE_MS = 200
+PIE_SLICES = 6
+PARETO_BARS = 20
+PARETO_THRESHOLD = 80
+ORDER_COLUMNS = ("Início", "Fim", "Tipo", "Falha", "Horímetro", "Operador", "Descrição")
 
 class MaintenanceDashboard(QtWidgets.QWidget):
     def __init__(self, db_handler, theme):
         super().__init__()
         self.db_handler = db_handler
+        self.service = AggregateService(db_handler)
+        self.search = MaintenanceSearch(db_handler)
         self.theme = theme
+        self.frame_cache = FrameCache()
+        self.released = False
+        # Drill-down do Pareto: [] = tipos de falha, [falha] = TAGs da falha, [falha, TAG] = ordens.
+        # Cada nível consultado fica em cache até a versão de TabelaTeste mudar
+        self.pareto_path = []
+        self.pareto_cache = {}
+        self.pareto_names = []
+        # Linha do tempo: versão e último rowid já indexados, e o rowid de cada intervalo (index.rows aponta aqui)
+        self.timeline_version = None
+        self.timeline_rowid = 0
+        self.timeline_rowids = np.empty(0, dtype=np.int64)
+        self.data_version = self.current_version()
+        self.df_version = self.data_version
         self.df = self.fetch_data()
         self.init_ui()
         self.apply_theme()
 
+        # KPIs e gráficos de falhas vêm dos contadores incrementais: basta conferir a versão
+        # de TabelaTeste e reler poucas linhas quando ela muda
+        self.counters_timer = QtCore.QTimer(self)
+        self.counters_timer.setInterval(COUNTERS_POLL_MS)
+        self.counters_timer.timeout.connect(self.refresh_counters)
+        self.counters_timer.start()
+
+    def current_version(self):
+        try:
+            return self.db_handler.table_versions(('TabelaTeste',), LOCAL_SOURCE).get('TabelaTeste')
+        except Exception as e:
+            print(f"Erro ao ler versão da TabelaTeste: {e}")
+            return None
+
+    def refresh_counters(self):
+        if not self.isVisible():
+            return
+        version = self.current_version()
+        if version is None or version == self.data_version:
+            return
+        self.data_version = version
+        self.pareto_cache.clear()
+        self.update_kpi_labels()
+        self.update_bar_chart()
+        self.update_pie_chart()
+        self.update_pareto()
+        self.update_timeline()
+        if self.search_edit.text().strip():
+            self.run_search()
+
+    @traced('maintenance.fetch_timeline', 'data')
+    def fetch_timeline(self, after_rowid=0):
+        # Intervalos [DataInicial, DataFinal] por TAG das linhas depois de after_rowid; ordens em aberto vão até agora
+        # e ficam marcadas. Devolve (último rowid lido, linhas lidas, rowids, TAGs, inícios, fins, em aberto)
+        try:
+            rows = self.db_handler.read(f"""
+                SELECT rowid, TAG, {ISO_DATETIME.format(column='DataInicial')},
+                       CASE WHEN DataFinal IS NULL OR DataFinal = '' THEN NULL
+                            ELSE {ISO_DATETIME.format(column='DataFinal')} END
+                FROM TabelaTeste
+                WHERE rowid > ?
+                ORDER BY rowid
+            """, (after_rowid,))
+        except Exception as e:
+            print(f"Erro ao buscar linha do tempo da TabelaTeste: {e}")
+            rows = []
+        df = pd.DataFrame(rows, columns=['rowid', 'TAG', 'Inicio', 'Fim'])
+        last_rowid = int(df['rowid'].iloc[-1]) if len(df) else after_rowid
+        starts = pd.to_datetime(df['Inicio'], format='%Y-%m-%d %H:%M:%S', errors='coerce')
+        ends = pd.to_datetime(df['Fim'], format='%Y-%m-%d %H:%M:%S', errors='coerce')
+        open_ = ends.isna()
+        ends = ends.fillna(pd.Timestamp.now())
+        valid = (starts.notna() & df['TAG'].notna()).to_numpy()
+        return (last_rowid, len(df), df['rowid'].to_numpy(np.int64)[valid], df['TAG'].astype(str).to_numpy()[valid],
+                mdates.date2num(starts.to_numpy()[valid]), mdates.date2num(ends.to_numpy()[valid]),
+                open_.to_numpy()[valid])
+
+    def update_timeline(self):
+        # Como PredictiveMaintenance.refresh: se a versão subiu exatamente o número de linhas novas depois da marca,
+        # só houve inserções e elas entram no índice existente; alteração ou exclusão relê a tabela inteira
+        version = self.current_version()
+        index = self.timeline.index
+        if index is not None and len(index) and None not in (version, self.timeline_version):
+            last_rowid, read, rowids, tags, starts, ends, open_ = self.fetch_timeline(self.timeline_rowid)
+            if version - self.timeline_version == read:
+                self.timeline_version, self.timeline_rowid = version, last_rowid
+                if len(rowids):
+                    index.extend(tags, starts, ends, open_)
+                    self.timeline_rowids = np.concatenate([self.timeline_rowids, rowids])
+                    self.timeline.refresh_data()
+                return
+        last_rowid, _read, rowids, tags, starts, ends, open_ = self.fetch_timeline()
+        self.timeline_version, self.timeline_rowid, self.timeline_rowids = version, last_rowid, rowids
+        self.timeline.set_data(IntervalIndex(tags, starts, ends, open_))
+
+    def describe_timeline_row(self, row):
+        # Texto do tooltip lido do banco sob demanda: o índice guarda só o rowid de cada intervalo
+        try:
+            rows = self.db_handler.read("SELECT DataInicial, DataFinal, Tipo, Falha FROM TabelaTeste WHERE rowid = ?",
+                                        (int(self.timeline_rowids[row]),))
+        except Exception as e:
+            print(f"Erro ao buscar manutenção da linha do tempo: {e}")
+            rows = []
+        if not rows:
+            return ""
+        start, end, tipo, falha = rows[0]
+        return f"{start[:16]} a {end[:16] if end else 'em aberto'}\n{tipo or '-'} · {falha or 'Sem Falha'}"
+
+    @traced('maintenance.fetch_data', 'data')
     def fetch_data(self):
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                query = """
-                    SELECT DataInicial, DataFinal, TAG, Tipo, Falha, Descrição, Horímetro, Operador
-                    FROM TabelaTeste
-                    ORDER BY TAG, DataInicial
-                """
-                cursor.execute(query)
-                rows = cursor.fetchall()
-                df = pd.DataFrame(rows, columns=['DataInicial', 'DataFinal', 'TAG', 'Tipo', 'Falha', 'Descrição', 'Horímetro', 'Operador'])
-                df['DataInicial'] = pd.to_datetime(df['DataInicial'], errors='coerce')
-                df['DataFinal'] = pd.to_datetime(df['DataFinal'], errors='coerce')
-                df['Descrição'] = df['Descrição'].fillna('').replace('-', '')
-                df['Falha'] = df['Falha'].fillna('Sem Falha').replace('', 'Sem Falha')
-                
-                def convert_horimetro_to_hours(horimetro):
-                    if pd.isna(horimetro) or not isinstance(horimetro, str):
-                        return 0.0
-                    try:
-                        h, m, s = map(int, horimetro.split(':'))
-                        return h + m / 60 + s / 3600
-                    except (ValueError, AttributeError):
-                        return 0.0
-
-                df['DuracaoHoras'] = df['Horímetro'].apply(convert_horimetro_to_hours)
-                df['Horímetro'] = df['Horímetro'].fillna('00:00:00')
-                df = df.rename(columns={
-                    'DataInicial': 'Início da Manutenção', 'DataFinal': 'Fim da Manutenção', 'TAG': 'TAG',
-                    'Tipo': 'Tipo', 'Falha': 'Falha', 'Descrição': 'Descrição', 'Horímetro': 'Horímetro',
-                    'Operador': 'Operador', 'DuracaoHoras': 'Duração da Manutenção'
-                })
-                return df
+            query = """
+                SELECT DataInicial, DataFinal, TAG, Tipo, Falha, Descrição, Horímetro, Operador
+                FROM TabelaTeste
+                ORDER BY TAG, DataInicial
+            """
+            rows = self.db_handler.read(query)
+            df = pd.DataFrame(rows, columns=['DataInicial', 'DataFinal', 'TAG', 'Tipo', 'Falha', 'Descrição', 'Horímetro', 'Operador'])
+            df['DataInicial'] = pd.to_datetime(df['DataInicial'], errors='coerce')
+            df['DataFinal'] = pd.to_datetime(df['DataFinal'], errors='coerce')
+            df['Descrição'] = df['Descrição'].fillna('').replace('-', '')
+            df['Falha'] = df['Falha'].fillna('Sem Falha').replace('', 'Sem Falha')
+            
+            def convert_horimetro_to_hours(horimetro):
+                if pd.isna(horimetro) or not isinstance(horimetro, str):
+                    return 0.0
+                try:
+                    h, m, s = map(int, horimetro.split(':'))
+                    return h + m / 60 + s / 3600
+                except (ValueError, AttributeError):
+                    return 0.0
+
+            df['DuracaoHoras'] = df['Horímetro'].apply(convert_horimetro_to_hours)
+            df['Horímetro'] = df['Horímetro'].fillna('00:00:00')
+            df = df.rename(columns={
+                'DataInicial': 'Início da Manutenção', 'DataFinal': 'Fim da Manutenção', 'TAG': 'TAG',
+                'Tipo': 'Tipo', 'Falha': 'Falha', 'Descrição': 'Descrição', 'Horímetro': 'Horímetro',
+                'Operador': 'Operador', 'DuracaoHoras': 'Duração da Manutenção'
+            })
+            return df
         except Exception as e:
             print(f"Erro ao buscar dados da TabelaTeste: {e}")
             return pd.DataFrame()
 
-    def get_connection(self):
-        if hasattr(self.db_handler, "get_connection"):
-            conn = self.db_handler.get_connection()
-            if conn:
-                return conn
-            else:
-                raise Exception("Falha ao obter conexão com o banco de dados.")
-        else:
-            raise AttributeError("O db_handler não possui o método 'get_connection'.")
-
     def format_duration(self, hours):
         if pd.isna(hours) or hours < 0:
             return "00:00"
@@ -78,84 +189,326 @@ class MaintenanceDashboard(QtWidgets.QWidget):
             return hours + minutes / 60
         return 0
 
-    def calculate_kpis(self, df):
-        if df.empty:
+    def calculate_kpis(self):
+        try:
+            return self.service.maintenance_kpis()
+        except Exception as e:
+            print(f"Erro ao calcular KPIs de manutenção: {e}")
             return {"total_equipamentos": 0, "equipamentos_em_manutencao": 0, "quantidade_falhas": 0}
-        total_equipamentos = df['TAG'].nunique()
-        equipamentos_em_manutencao = df[df['Fim da Manutenção'].isna()]['TAG'].nunique()
-        quantidade_falhas = df[df['Falha'] != 'Sem Falha'].shape[0]
-        return {
-            "total_equipamentos": total_equipamentos,
-            "equipamentos_em_manutencao": equipamentos_em_manutencao,
-            "quantidade_falhas": quantidade_falhas
-        }
+
+    def update_kpi_labels(self):
+        kpis = self.calculate_kpis()
+        self.total_equip_label.setText(f"Total de Equipamentos\n{kpis['total_equipamentos']}")
+        self.maint_equip_label.setText(f"Equipamentos em Manutenção\n{kpis['equipamentos_em_manutencao']}")
+        self.faults_label.setText(f"Quantidade de Falhas\n{kpis['quantidade_falhas']}")
 
     def init_ui(self):
         self.layout = QtWidgets.QVBoxLayout(self)
         self.layout.setSpacing(20)
 
-        kpis = self.calculate_kpis(self.df)
         kpi_layout = QtWidgets.QHBoxLayout()
         kpi_layout.setSpacing(10)
 
-        self.total_equip_label = QtWidgets.QLabel(f"Total de Equipamentos\n{kpis['total_equipamentos']}")
+        self.total_equip_label = QtWidgets.QLabel()
         self.total_equip_label.setAlignment(QtCore.Qt.AlignCenter)
+        self.total_equip_label.setProperty("role", "kpiCard")
         self.total_equip_label.setFixedSize(230, 80)
         kpi_layout.addWidget(self.total_equip_label)
 
-        self.maint_equip_label = QtWidgets.QLabel(f"Equipamentos em Manutenção\n{kpis['equipamentos_em_manutencao']}")
+        self.maint_equip_label = QtWidgets.QLabel()
         self.maint_equip_label.setAlignment(QtCore.Qt.AlignCenter)
+        self.maint_equip_label.setProperty("role", "kpiCard")
         self.maint_equip_label.setFixedSize(230, 80)
         kpi_layout.addWidget(self.maint_equip_label)
 
-        self.faults_label = QtWidgets.QLabel(f"Quantidade de Falhas\n{kpis['quantidade_falhas']}")
+        self.faults_label = QtWidgets.QLabel()
         self.faults_label.setAlignment(QtCore.Qt.AlignCenter)
+        self.faults_label.setProperty("role", "kpiCard")
         self.faults_label.setFixedSize(230, 80)
         kpi_layout.addWidget(self.faults_label)
 
         kpi_layout.addStretch()
         self.layout.addLayout(kpi_layout)
+        self.update_kpi_labels()
 
         self.charts_container = QtWidgets.QWidget()
         self.charts_container.setObjectName("chartsContainer")
         self.charts_layout = QtWidgets.QVBoxLayout(self.charts_container)
         self.charts_layout.setSpacing(10)
         self.charts_layout.setContentsMargins(0, 0, 0, 0)
+        self.shadow = QGraphicsDropShadowEffect(self)
+        self.shadow.setBlurRadius(15)
+        self.shadow.setXOffset(5)
+        self.shadow.setYOffset(5)
+        self.shadow.setColor(QColor(100, 100, 100))
+        self.charts_container.setGraphicsEffect(self.shadow)
 
         self.fig_line = Figure(figsize=(12, 3), facecolor=self.theme['bg_card'])
-        self.canvas_line = FigureCanvas(self.fig_line)
+        self.canvas_line = ChartCanvas(self.fig_line)
+        self.canvas_line.on_resize_settled = lambda: self.refresh_chart('line', self.fig_line, self.canvas_line)
+        self.canvas_line.setProperty("role", "chart")
         self.canvas_line.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Fixed)
         self.canvas_line.setMinimumHeight(150)
         self.update_line_chart()
         self.charts_layout.addWidget(self.canvas_line)
 
+        self.timeline = MaintenanceTimeline(self.theme, self.describe_timeline_row)
+        self.timeline.setProperty("role", "chart")
+        self.timeline.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Fixed)
+        self.timeline.setMinimumHeight(300)
+        self.timeline.setToolTip("Roda: zoom · arrastar: mover · Shift + roda: rolar TAGs · duplo clique: restaurar")
+        self.update_timeline()
+        self.charts_layout.addWidget(self.timeline)
+
         charts_row = QtWidgets.QHBoxLayout()
         charts_row.setSpacing(10)
 
         self.fig_bar = Figure(figsize=(5, 3), facecolor=self.theme['bg_card'])
-        self.canvas_bar = FigureCanvas(self.fig_bar)
+        self.canvas_bar = ChartCanvas(self.fig_bar)
+        self.canvas_bar.on_resize_settled = lambda: self.refresh_chart('bar', self.fig_bar, self.canvas_bar)
+        self.canvas_bar.setProperty("role", "chart")
         self.canvas_bar.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Fixed)
         self.canvas_bar.setMinimumHeight(150)
         self.update_bar_chart()
         charts_row.addWidget(self.canvas_bar)
 
         self.fig_pie = Figure(figsize=(5, 3), facecolor=self.theme['bg_card'])
-        self.canvas_pie = FigureCanvas(self.fig_pie)
+        self.canvas_pie = ChartCanvas(self.fig_pie)
+        self.canvas_pie.on_resize_settled = lambda: self.refresh_chart('pie', self.fig_pie, self.canvas_pie)
+        self.canvas_pie.setProperty("role", "chart")
         self.canvas_pie.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Fixed)
         self.canvas_pie.setMinimumHeight(150)
         self.update_pie_chart()
         charts_row.addWidget(self.canvas_pie)
 
         self.charts_layout.addLayout(charts_row)
+        self.create_pareto_panel()
         self.layout.addWidget(self.charts_container)
+        self.create_search_panel()
+        self.strategy_panel = StrategyPanel(self.db_handler, self.theme)
+        self.layout.addWidget(self.strategy_panel)
         self.layout.addStretch()
 
+    def create_pareto_panel(self):
+        pareto_layout = QtWidgets.QHBoxLayout()
+        pareto_layout.setSpacing(10)
+        self.pareto_back_button = QtWidgets.QPushButton("Voltar")
+        self.pareto_back_button.clicked.connect(self.pareto_back)
+        pareto_layout.addWidget(self.pareto_back_button)
+        self.pareto_label = QtWidgets.QLabel()
+        pareto_layout.addWidget(self.pareto_label)
+        pareto_layout.addStretch()
+        self.charts_layout.addLayout(pareto_layout)
+
+        self.fig_pareto = Figure(figsize=(12, 3), facecolor=self.theme['bg_card'])
+        self.canvas_pareto = ChartCanvas(self.fig_pareto)
+        self.canvas_pareto.on_resize_settled = lambda: self.refresh_chart(
+            ('pareto',) + tuple(self.pareto_path), self.fig_pareto, self.canvas_pareto)
+        self.canvas_pareto.setProperty("role", "chart")
+        self.canvas_pareto.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Fixed)
+        self.canvas_pareto.setMinimumHeight(250)
+        self.canvas_pareto.mpl_connect("button_press_event", self.on_pareto_click)
+        self.charts_layout.addWidget(self.canvas_pareto)
+
+        self.orders_table = QtWidgets.QTableWidget(0, len(ORDER_COLUMNS))
+        self.orders_table.setHorizontalHeaderLabels(ORDER_COLUMNS)
+        self.orders_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.orders_table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.orders_table.verticalHeader().setVisible(False)
+        self.orders_table.horizontalHeader().setSectionResizeMode(6, QtWidgets.QHeaderView.Stretch)
+        self.orders_table.setMinimumHeight(200)
+        self.charts_layout.addWidget(self.orders_table)
+        self.update_pareto()
+
+    def pareto_level(self, path):
+        # Resultado de um nível do drill-down: consulta limitada, servida do cache enquanto a versão não muda
+        key = tuple(path)
+        if key not in self.pareto_cache:
+            try:
+                if len(path) == 0:
+                    rows = self.service.failure_pareto()
+                elif len(path) == 1:
+                    rows = self.service.failure_pareto_tags(path[0])
+                else:
+                    rows = self.service.failure_orders(path[1], path[0])
+            except Exception as e:
+                print(f"Erro ao calcular Pareto de falhas: {e}")
+                rows = []
+            self.pareto_cache[key] = rows
+        return self.pareto_cache[key]
+
+    def update_pareto(self):
+        self.pareto_back_button.setEnabled(bool(self.pareto_path))
+        self.pareto_label.setText(" › ".join(["Todas as falhas"] + self.pareto_path))
+        orders = len(self.pareto_path) == 2
+        self.orders_table.setVisible(orders)
+        if orders:
+            self.populate_orders(self.pareto_level(self.pareto_path))
+        self.update_pareto_chart()
+
+    def pareto_back(self):
+        if self.pareto_path:
+            self.pareto_path.pop()
+            self.update_pareto()
+
+    def on_pareto_click(self, event):
+        # Clique numa barra desce um nível: tipo de falha -> TAGs da falha -> ordens da TAG
+        if event.inaxes is None or event.xdata is None or event.button != 1:
+            return
+        position = int(round(event.xdata))
+        if not 0 <= position < len(self.pareto_names):
+            return
+        self.pareto_path = self.pareto_path[:1] + [self.pareto_names[position]]
+        self.update_pareto()
+
+    @traced('maintenance.update_pareto_chart', 'chart')
+    @themed_chart
+    def update_pareto_chart(self):
+        self.fig_pareto.clear()
+        self.canvas_pareto.set_hover(None)
+        ax = self.fig_pareto.add_subplot(111)
+        falha = self.pareto_path[0] if self.pareto_path else None
+        ax.set_title(f"Pareto de TAGs: {falha}" if falha else "Pareto de Falhas", fontsize=14, pad=10)
+        ax.set_ylabel("Quantidade", fontsize=10)
+
+        rows = self.pareto_level(self.pareto_path[:1])[:PARETO_BARS]
+        self.pareto_names = [row[0] for row in rows]
+        if rows:
+            names, counts, _cumulative, percents = zip(*rows)
+            positions = range(len(rows))
+            selected = self.pareto_path[1] if len(self.pareto_path) == 2 else None
+            colors = [self.theme['warning'] if name == selected else self.theme['red'] for name in names]
+            bars = ax.bar(positions, counts, color=colors, edgecolor='black', linewidth=0.5)
+            crowded = len(rows) > 8
+            ax.set_xticks(positions, names, rotation=30 if crowded else 0, ha='right' if crowded else 'center',
+                          fontsize=8)
+
+            # Percentual acumulado no eixo secundário, com a linha de corte dos 80%
+            ax_cumulative = ax.twinx()
+            ax_cumulative.plot(positions, percents, color=self.theme['text_primary'], marker='o', markersize=3,
+                               linewidth=1)
+            ax_cumulative.axhline(PARETO_THRESHOLD, color=self.theme['text_secondary'], linestyle='--', linewidth=0.8)
+            ax_cumulative.set_ylim(0, 105)
+            ax_cumulative.grid(False)
+            ax_cumulative.set_ylabel("% acumulado", fontsize=10)
+
+            self.annotation_pareto = ax_cumulative.annotate("", xy=(0, 0), xytext=(10, 10), textcoords="offset points",
+                                                            bbox=dict(boxstyle="round,pad=0.5", fc=self.theme['bg_card'], alpha=0.9, ec=self.theme['border']),
+                                                            color=self.theme['text_primary'], visible=False, zorder=10)
+
+            def hover(event):
+                if event.inaxes in (ax, ax_cumulative) and event.xdata is not None:
+                    position = int(round(event.xdata))
+                    if 0 <= position < len(rows) and bars[position].contains(event)[0]:
+                        self.annotation_pareto.set_text(f"{names[position]}\nQuantidade: {counts[position]}\n"
+                                                        f"Acumulado: {percents[position]:.1f}%")
+                        self.annotation_pareto.xy = (position, percents[position])
+                        self.annotation_pareto.set_visible(True)
+                        self.fig_pareto.canvas.draw_idle()
+                        return
+                if self.annotation_pareto.get_visible():
+                    self.annotation_pareto.set_visible(False)
+                    self.fig_pareto.canvas.draw_idle()
+
+            self.canvas_pareto.set_hover(hover)
+        else:
+            ax.text(0.5, 0.5, "Nenhuma falha registrada", ha='center', va='center', fontsize=12)
+
+        self.refresh_chart(('pareto',) + tuple(self.pareto_path), self.fig_pareto, self.canvas_pareto)
+
+    def populate_orders(self, rows):
+        self.orders_table.setUpdatesEnabled(False)
+        self.orders_table.setRowCount(len(rows))
+        for r, row in enumerate(rows):
+            for c, value in enumerate(row):
+                self.orders_table.setItem(r, c, QtWidgets.QTableWidgetItem("" if value is None else str(value)))
+        self.orders_table.resizeColumnsToContents()
+        self.orders_table.setUpdatesEnabled(True)
+
+    def create_search_panel(self):
+        search_layout = QtWidgets.QHBoxLayout()
+        search_layout.setSpacing(10)
+
+        self.search_edit = QtWidgets.QLineEdit()
+        self.search_edit.setPlaceholderText("Buscar nas ordens de manutenção (ex.: rolam vazam)")
+        self.search_edit.setClearButtonEnabled(True)
+        search_layout.addWidget(self.search_edit, 1)
+
+        # Facetas: opções com a contagem de ocorrências da busca atual
+        self.tag_combo = QtWidgets.QComboBox()
+        self.tag_combo.addItem("Todas as TAGs", None)
+        self.tag_combo.currentIndexChanged.connect(lambda _index: self.run_search())
+        search_layout.addWidget(self.tag_combo)
+
+        self.month_combo = QtWidgets.QComboBox()
+        self.month_combo.addItem("Todos os meses", None)
+        self.month_combo.currentIndexChanged.connect(lambda _index: self.run_search())
+        search_layout.addWidget(self.month_combo)
+
+        self.results_label = QtWidgets.QLabel()
+        search_layout.addWidget(self.results_label)
+        self.layout.addLayout(search_layout)
+
+        self.results_view = QtWidgets.QTextBrowser()
+        self.results_view.setMinimumHeight(180)
+        self.results_view.setVisible(False)
+        self.layout.addWidget(self.results_view)
+
+        # Busca só depois de uma pausa na digitação, não a cada tecla
+        self.search_timer = QtCore.QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.run_search)
+        self.search_edit.textChanged.connect(self.search_timer.start)
+
+    @traced('maintenance.search', 'data')
+    def run_search(self):
+        text = self.search_edit.text().strip()
+        tag = self.tag_combo.currentData()
+        month = self.month_combo.currentData()
+        try:
+            results = self.search.search(text, tag, month)
+            facets = self.search.facets(text, tag, month)
+        except Exception as e:
+            print(f"Erro ao buscar ordens de manutenção: {e}")
+            results, facets = [], {'total': 0, 'parcial': False, 'tags': [], 'months': []}
+
+        self.fill_facet(self.tag_combo, "Todas as TAGs", facets['tags'], tag, lambda value: value)
+        self.fill_facet(self.month_combo, "Todos os meses", facets['months'], month,
+                        lambda value: f"{value[5:7]}/{value[:4]}")
+        self.results_view.setVisible(bool(text))
+        if not text:
+            self.results_label.clear()
+            self.results_view.clear()
+            return
+        total = facets['total']
+        self.results_label.setText(f"{total} ocorrência{'s' if total != 1 else ''}" +
+                                   (" (facetas das mais recentes)" if facets['parcial'] else ""))
+        self.results_view.setHtml("".join(
+            f"<p><b>{html.escape(tag_name)}</b> · {html.escape(started)} · {failure}<br>{snippet}</p>"
+            for _rowid, tag_name, started, failure, snippet in results) or "<p>Nenhuma ordem encontrada.</p>")
+
+    def fill_facet(self, combo, everything, counts, selected, label):
+        # Repopula sem disparar nova busca; a opção escolhida continua listada mesmo sem ocorrências
+        combo.blockSignals(True)
+        combo.clear()
+        combo.addItem(everything, None)
+        if selected is not None and selected not in dict(counts):
+            counts = [(selected, 0)] + list(counts)
+        for value, count in counts:
+            combo.addItem(f"{label(value)} ({count})", value)
+        combo.setCurrentIndex(max(combo.findData(selected), 0))
+        combo.blockSignals(False)
+
+    @traced('maintenance.update_line_chart', 'chart')
+    @themed_chart
     def update_line_chart(self):
         self.fig_line.clear()
+        self.canvas_line.set_hover(None)
         ax = self.fig_line.add_subplot(111)
-        ax.set_title("Duração da Manutenção por Equipamento", fontsize=14, pad=10, color=self.theme['text_primary'])
-        ax.set_xlabel("TAG", fontsize=10, color=self.theme['text_secondary'])
-        ax.set_ylabel("Duração (h)", fontsize=10, color=self.theme['text_secondary'])
+        ax.set_title("Duração da Manutenção por Equipamento", fontsize=14, pad=10)
+        ax.set_xlabel("TAG", fontsize=10)
+        ax.set_ylabel("Duração (h)", fontsize=10)
 
         if not self.df.empty:
             df = self.df.copy()
@@ -198,28 +551,38 @@ class MaintenanceDashboard(QtWidgets.QWidget):
                         self.annotation_line.set_visible(False)
                         self.fig_line.canvas.draw_idle()
 
-            self.fig_line.canvas.mpl_connect("motion_notify_event", hover)
-
-        ax.grid(True, linestyle='--', alpha=0.7, color=self.theme['border'])
-        ax.set_facecolor(self.theme['bg_secondary'])
-        ax.tick_params(axis='both', colors=self.theme['text_secondary'], labelsize=8)
-        for spine in ax.spines.values():
-            spine.set_linewidth(0.5)
-            spine.set_color(self.theme['border'])
-        ax.spines['top'].set_visible(False)
-        ax.spines['right'].set_visible(False)
-        self.fig_line.tight_layout()
-        self.canvas_line.draw()
-
+            self.canvas_line.set_hover(hover)
+
+        self.refresh_chart('line', self.fig_line, self.canvas_line)
+
+    @themed_chart
+    def refresh_chart(self, name, fig, canvas):
+        # Conteúdo só depende dos dados, do tema e do tamanho; estados já vistos voltam do cache de quadros
+        if self.released:
+            return
+        version = self.df_version if name == 'line' else self.data_version
+        key = canvas.frame_key(name, version, theme_name(self.theme))
+        frame = self.frame_cache.get(key)
+        if frame:
+            canvas.restore_frame(frame)
+            return
+        with span('mpl.tight_layout', 'layout'):
+            fig.tight_layout()
+        canvas.draw()
+        self.frame_cache.store(key, canvas)
+
+    @traced('maintenance.update_bar_chart', 'chart')
+    @themed_chart
     def update_bar_chart(self):
         self.fig_bar.clear()
+        self.canvas_bar.set_hover(None)
         ax = self.fig_bar.add_subplot(111)
-        ax.set_title("Falhas por Equipamento", fontsize=14, pad=10, color=self.theme['text_primary'])
-        ax.set_xlabel("TAG", fontsize=10, color=self.theme['text_secondary'])
-        ax.set_ylabel("Quantidade", fontsize=10, color=self.theme['text_secondary'])
+        ax.set_title("Falhas por Equipamento", fontsize=14, pad=10)
+        ax.set_xlabel("TAG", fontsize=10)
+        ax.set_ylabel("Quantidade", fontsize=10)
 
-        if not self.df.empty:
-            falhas_por_equipamento = self.df[self.df['Falha'] != 'Sem Falha'].groupby('TAG').size()
+        falhas_por_equipamento = pd.Series(dict(self.service.failures_by_tag()), dtype=int)
+        if not falhas_por_equipamento.empty:
             bars = ax.bar(falhas_por_equipamento.index, falhas_por_equipamento, color='#FF0000', edgecolor='black', linewidth=0.5)
 
             self.annotation_bar = ax.annotate("", xy=(0, 0), xytext=(10, 10), textcoords="offset points",
@@ -242,29 +605,28 @@ class MaintenanceDashboard(QtWidgets.QWidget):
                         self.annotation_bar.set_visible(False)
                         self.fig_bar.canvas.draw_idle()
 
-            self.fig_bar.canvas.mpl_connect("motion_notify_event", hover)
+            self.canvas_bar.set_hover(hover)
 
-        ax.grid(True, linestyle='--', alpha=0.7, color=self.theme['border'])
-        ax.set_facecolor(self.theme['bg_secondary'])
-        ax.tick_params(axis='both', colors=self.theme['text_secondary'], labelsize=8)
-        for spine in ax.spines.values():
-            spine.set_linewidth(0.5)
-            spine.set_color(self.theme['border'])
-        ax.spines['top'].set_visible(False)
-        ax.spines['right'].set_visible(False)
-        self.fig_bar.tight_layout()
-        self.canvas_bar.draw()
+        self.refresh_chart('bar', self.fig_bar, self.canvas_bar)
 
+    @traced('maintenance.update_pie_chart', 'chart')
+    @themed_chart
     def update_pie_chart(self):
         self.fig_pie.clear()
+        self.canvas_pie.set_hover(None)
         ax = self.fig_pie.add_subplot(111)
-        ax.set_title("Distribuição de Falhas", fontsize=14, pad=10, color=self.theme['text_primary'])
-
-        if not self.df.empty:
-            falha_counts = self.df['Falha'].value_counts()
+        ax.set_title("Distribuição de Falhas", fontsize=14, pad=10)
+
+        falha_counts = pd.Series(dict(self.service.failure_distribution()), dtype=int)
+        if len(falha_counts) > PIE_SLICES:
+            # Além das maiores fatias, o resto vira "Outras"; o detalhe completo fica no Pareto
+            falha_counts = pd.concat([falha_counts.iloc[:PIE_SLICES - 1],
+                                      pd.Series({'Outras': falha_counts.iloc[PIE_SLICES - 1:].sum()})])
+        if not falha_counts.empty:
+            red, green, blue, _alpha = to_rgba(self.theme['red'])
+            colors = [(red, green, blue, 1 - 0.7 * i / max(len(falha_counts) - 1, 1)) for i in range(len(falha_counts))]
             wedges, texts, autotexts = ax.pie(falha_counts, labels=falha_counts.index, autopct='%1.1f%%',
-                                              colors=['#FF0000', '#FF3333', '#CC0000'],
-                                              textprops={'fontsize': 8, 'color': self.theme['text_primary']})
+                                              colors=colors, textprops={'fontsize': 8})
 
             self.annotation_pie = ax.annotate("", xy=(0, 0), xytext=(20, 20), textcoords="offset points",
                                               bbox=dict(boxstyle="round,pad=0.5", fc=self.theme['bg_card'], alpha=0.9, ec=self.theme['border']),
@@ -286,53 +648,75 @@ class MaintenanceDashboard(QtWidgets.QWidget):
                         self.annotation_pie.set_visible(False)
                         self.fig_pie.canvas.draw_idle()
 
-            self.fig_pie.canvas.mpl_connect("motion_notify_event", hover)
+            self.canvas_pie.set_hover(hover)
 
-        ax.set_facecolor(self.theme['bg_secondary'])
-        self.fig_pie.tight_layout()
-        self.canvas_pie.draw()
+        self.refresh_chart('pie', self.fig_pie, self.canvas_pie)
 
     def apply_theme(self):
-        shadow = QGraphicsDropShadowEffect(self)
-        shadow.setBlurRadius(15)
-        shadow.setXOffset(5)
-        shadow.setYOffset(5)
-        shadow.setColor(QColor(100, 100, 100))
-        self.charts_container.setGraphicsEffect(shadow)
-
-        for label in [self.total_equip_label, self.maint_equip_label, self.faults_label]:
-            label.setStyleSheet(f"""
-                background-color: {self.theme['bg_card']};
-                color: {self.theme['text_primary']};
-                border: 1px solid {self.theme['border']};
-                border-radius: 8px;
-                padding: 10px;
-                font-size: 14px;
-            """)
-        self.canvas_line.setStyleSheet(f"border: 1px solid {self.theme['border']}; border-radius: 10px;")
-        self.canvas_bar.setStyleSheet(f"border: 1px solid {self.theme['border']}; border-radius: 10px;")
-        self.canvas_pie.setStyleSheet(f"border: 1px solid {self.theme['border']}; border-radius: 10px;")
-
         self.fig_line.set_facecolor(self.theme['bg_card'])
         self.fig_bar.set_facecolor(self.theme['bg_card'])
         self.fig_pie.set_facecolor(self.theme['bg_card'])
-        for ax in self.fig_line.get_axes():
-            ax.set_facecolor(self.theme['bg_secondary'])
-        for ax in self.fig_bar.get_axes():
-            ax.set_facecolor(self.theme['bg_secondary'])
-        for ax in self.fig_pie.get_axes():
-            ax.set_facecolor(self.theme['bg_secondary'])
-
-        self.canvas_line.draw()
-        self.canvas_bar.draw()
-        self.canvas_pie.draw()
+        self.fig_pareto.set_facecolor(self.theme['bg_card'])
+        self.results_view.document().setDefaultStyleSheet(f"b {{ color: {self.theme['accent']}; }}")
 
     def update_theme(self, theme):
         self.theme = theme
+        self.apply_theme()
+        if self.search_edit.text().strip():
+            self.run_search()
+        # Liberada, a linha do tempo não tem índice e só guarda o tema: restore_memory a reconstrói com ele
+        self.timeline.set_theme(theme)
+        if self.released:
+            return
         self.update_line_chart()
         self.update_bar_chart()
         self.update_pie_chart()
+        self.update_pareto_chart()
+        self.strategy_panel.update_theme(theme)
+
+    def memory_footprint(self):
+        return {
+            'DataFrame': dataframe_bytes(self.df),
+            'gráficos': sum(canvas.memory_bytes()
+                            for canvas in (self.canvas_line, self.canvas_bar, self.canvas_pie, self.canvas_pareto)),
+            'linha do tempo': self.timeline.memory_bytes() + self.timeline_rowids.nbytes,
+            'simulação': self.strategy_panel.memory_bytes(),
+            'cache de quadros': self.frame_cache.memory_bytes(),
+        }
+
+    def release_memory(self):
+        # O DataFrame completo de TabelaTeste é o maior item; volta do banco quando a página reaparece
+        self.df = None
+        self.frame_cache.clear()
+        self.pareto_cache.clear()
+        for canvas in (self.canvas_line, self.canvas_bar, self.canvas_pie, self.canvas_pareto, self.timeline):
+            canvas.release()
+        self.strategy_panel.release()
+        self.timeline_version = None
+        self.timeline_rowids = np.empty(0, dtype=np.int64)
+        self.released = True
+
+    def restore_memory(self):
+        self.released = False
+        self.data_version = self.current_version()
+        self.df_version = self.data_version
+        self.df = self.fetch_data()
         self.apply_theme()
+        self.update_kpi_labels()
+        self.update_line_chart()
+        self.update_bar_chart()
+        self.update_pie_chart()
+        self.update_pareto()
+        self.update_timeline()
+        # O tema pode ter mudado enquanto a página estava liberada; update_theme já redesenha o resultado
+        self.strategy_panel.update_theme(self.theme)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        memory_budget.touch(self)
+
+    def export_datasets(self):
+        return [table_dataset(self.db_handler, 'TabelaTeste', plant=LOCAL_SOURCE, order_by='rowid')]
 
     def export_to_pdf(self, file_path):
         printer = QPrinter(QPrinter.HighResolution)
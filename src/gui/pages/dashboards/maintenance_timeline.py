@@ -0,0 +1,243 @@
+import matplotlib
+import matplotlib.dates as mdates
+import numpy as np
+from matplotlib.colors import to_rgba
+from matplotlib.figure import Figure
+from matplotlib.ticker import FuncFormatter, MultipleLocator
+from gui.themes import chart_rc, theme_name
+from utils.tracing import span, traced
+from .chart_canvas import ChartCanvas
+
+VISIBLE_LANES = 12
+BAR_HEIGHT = 0.7
+ZOOM_STEP = 0.8
+MIN_SPAN_DAYS = 1 / 24
+# Blocos menores que isso (em pixels) continuam visíveis; vizinhos mais próximos que isso se fundem
+MIN_BLOCK_PX = 2.0
+HOVER_TOLERANCE_PX = 4.0
+
+
+class MaintenanceTimeline(ChartCanvas):
+    # Gantt de manutenções por TAG: uma PolyCollection (broken_barh) por raia, cujos retângulos são
+    # recalculados a cada pan/zoom só para a janela visível, com intervalos vizinhos fundidos quando
+    # ficam a menos de um pixel de distância. O volume desenhado depende da largura em pixels, não dos anos de histórico
+    def __init__(self, theme, describe=None):
+        super().__init__(Figure(figsize=(12, 3), facecolor=theme['bg_card']))
+        self.theme = theme
+        self.index = None
+        # describe(row) monta o texto da linha original row do índice só quando o mouse para sobre ela
+        self.describe = describe
+        self._described = (None, None)
+        self.collections = []
+        self.ax = None
+        self.annotation = None
+        self._drag = None
+        self._stale = False
+        self.on_resize_settled = self.on_resized
+        self.mpl_connect('scroll_event', self.on_scroll)
+        self.mpl_connect('button_press_event', self.on_press)
+        self.mpl_connect('button_release_event', self.on_release)
+        self.mpl_connect('motion_notify_event', self.on_motion)
+
+    def draw(self):
+        # Ticks de data são recriados a cada pan/zoom e leem rcParams no desenho. Os blocos são
+        # recalculados uma vez por quadro, mesmo que x e y tenham mudado (pan) ou vários eventos de roda cheguem juntos
+        if self._stale:
+            self.update_blocks()
+        with matplotlib.rc_context(chart_rc(theme_name(self.theme))):
+            super().draw()
+
+    def set_data(self, index):
+        self.index = index
+        self._described = (None, None)
+        self.build()
+
+    def refresh_data(self):
+        # O índice ganhou intervalos (IntervalIndex.extend): mantém pan/zoom; TAG nova exige refazer as raias
+        if self.ax is None or len(self.collections) != len(self.index.lanes):
+            self.build()
+            return
+        self.update_blocks()
+        self.draw_idle()
+
+    def set_theme(self, theme):
+        self.theme = theme
+        self.figure.set_facecolor(theme['bg_card'])
+        if self.index is not None:
+            self.build()
+
+    @traced('maintenance.timeline_build', 'chart')
+    def build(self):
+        with matplotlib.rc_context(chart_rc(theme_name(self.theme))):
+            self.figure.clear()
+            self.collections = []
+            ax = self.ax = self.figure.add_subplot(111)
+            ax.set_title("Linha do Tempo de Manutenções", fontsize=14, pad=10)
+            bounds = self.index.bounds() if self.index is not None else None
+            if bounds is None:
+                ax.text(0.5, 0.5, "Nenhum dado disponível", ha='center', va='center', fontsize=12)
+                ax.set_axis_off()
+                self.draw_idle()
+                return
+
+            lanes = len(self.index.lanes)
+            for lane in range(lanes):
+                collection = ax.broken_barh([], (lane - BAR_HEIGHT / 2, BAR_HEIGHT), edgecolor='none')
+                self.collections.append(collection)
+            # Um tick por raia, gerado só para as raias na vista; o rótulo é o nome da TAG
+            names = [str(tag) for tag in self.index.lanes]
+            ax.yaxis.set_major_locator(MultipleLocator(1))
+            ax.yaxis.set_major_formatter(FuncFormatter(
+                lambda value, _pos: names[int(value)] if 0 <= value < lanes and value == int(value) else ""))
+            ax.tick_params(axis='y', labelsize=8)
+            ax.set_ylim(min(lanes, VISIBLE_LANES) - 0.5, -0.5)
+            locator = mdates.AutoDateLocator()
+            ax.xaxis.set_major_locator(locator)
+            ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+            start, end = bounds
+            margin = max((end - start) * 0.02, MIN_SPAN_DAYS)
+            ax.set_xlim(start - margin, end + margin)
+            ax.grid(axis='x', alpha=0.3)
+            ax.set_axisbelow(True)
+
+            self.annotation = ax.annotate("", xy=(0, 0), xytext=(10, 10), textcoords="offset points",
+                                          bbox=dict(boxstyle="round,pad=0.5", fc=self.theme['bg_card'], alpha=0.9,
+                                                    ec=self.theme['border']),
+                                          color=self.theme['text_primary'], visible=False, zorder=10)
+            ax.callbacks.connect('xlim_changed', self.mark_stale)
+            ax.callbacks.connect('ylim_changed', self.mark_stale)
+            self.figure.tight_layout()
+            self.update_blocks()
+        self.draw_idle()
+
+    def on_resized(self):
+        # A largura em pixels mudou: o nível de detalhe (fusão de vizinhos) precisa ser refeito
+        if self.ax is not None:
+            self.figure.tight_layout()
+            self.update_blocks()
+        self.draw_idle()
+
+    def mark_stale(self, _ax):
+        self._stale = True
+
+    def pixel_width(self):
+        # Largura de um pixel em unidades de dados (dias) no zoom atual
+        x0, x1 = self.ax.get_xlim()
+        return (x1 - x0) / max(self.ax.bbox.width, 1.0)
+
+    def update_blocks(self):
+        self._stale = False
+        if self.index is None or not self.collections:
+            return
+        with span('maintenance.timeline_cull', 'chart'):
+            x0, x1 = self.ax.get_xlim()
+            bottom, top = self.ax.get_ylim()
+            first = max(int(np.floor(min(bottom, top))), 0)
+            last = min(int(np.ceil(max(bottom, top))), len(self.collections) - 1)
+            pixel = self.pixel_width()
+            closed, open_ = to_rgba(self.theme['red']), to_rgba(self.theme['warning'])
+            # Raias fora da vista nem entram no desenho
+            for lane, collection in enumerate(self.collections):
+                visible = first <= lane <= last
+                collection.set_visible(visible)
+                if not visible:
+                    continue
+                starts, ends, _counts, flags = self.index.blocks(lane, x0, x1, MIN_BLOCK_PX * pixel)
+                ends = np.maximum(ends, starts + MIN_BLOCK_PX * pixel)
+                y0, y1 = lane - BAR_HEIGHT / 2, lane + BAR_HEIGHT / 2
+                verts = np.empty((len(starts), 4, 2))
+                verts[:, 0] = np.column_stack([starts, np.full(len(starts), y0)])
+                verts[:, 1] = np.column_stack([starts, np.full(len(starts), y1)])
+                verts[:, 2] = np.column_stack([ends, np.full(len(starts), y1)])
+                verts[:, 3] = np.column_stack([ends, np.full(len(starts), y0)])
+                collection.set_verts(verts)
+                collection.set_facecolor(np.where(flags[:, None], open_, closed))
+
+    def on_scroll(self, event):
+        # Roda = zoom no tempo em torno do cursor; Shift + roda = rolar as raias
+        if self.ax is None or event.inaxes != self.ax or self.index is None:
+            return
+        step = 1 if event.button == 'up' else -1
+        if event.key == 'shift':
+            bottom, top = self.ax.get_ylim()
+            shift = -step * 3
+            lanes = len(self.index.lanes)
+            shift = min(max(shift, -0.5 - top), lanes - 0.5 - bottom) if bottom - top < lanes else 0
+            self.ax.set_ylim(bottom + shift, top + shift)
+        else:
+            x0, x1 = self.ax.get_xlim()
+            start, end = self.index.bounds()
+            scale = ZOOM_STEP if step > 0 else 1 / ZOOM_STEP
+            span_days = min(max((x1 - x0) * scale, MIN_SPAN_DAYS), (end - start) * 1.5 + MIN_SPAN_DAYS)
+            ratio = (event.xdata - x0) / (x1 - x0)
+            self.ax.set_xlim(event.xdata - ratio * span_days, event.xdata + (1 - ratio) * span_days)
+        self.draw_idle()
+
+    def on_press(self, event):
+        if self.ax is None or event.inaxes != self.ax or event.button != 1:
+            return
+        if event.dblclick:
+            self.build()
+            return
+        self._drag = (event.x, event.y, self.ax.get_xlim(), self.ax.get_ylim())
+        self.annotation.set_visible(False)
+
+    def on_release(self, event):
+        self._drag = None
+
+    def on_motion(self, event):
+        if self._drag is not None:
+            self.pan(event)
+        else:
+            self.hover(event)
+
+    def pan(self, event):
+        x, y, (x0, x1), (bottom, top) = self._drag
+        dx = (event.x - x) * (x1 - x0) / max(self.ax.bbox.width, 1.0)
+        dy = (event.y - y) * (bottom - top) / max(self.ax.bbox.height, 1.0)
+        lanes = len(self.index.lanes)
+        # Arrastar para cima mostra raias de baixo; sem passar do topo nem do fim da lista
+        dy = min(max(dy, -0.5 - top), lanes - 0.5 - bottom) if bottom - top < lanes else 0
+        self.ax.set_xlim(x0 - dx, x1 - dx)
+        self.ax.set_ylim(bottom + dy, top + dy)
+        self.draw_idle()
+
+    def hover(self, event):
+        if self.ax is None or self.annotation is None:
+            return
+        text = None
+        if event.inaxes == self.ax and self.index is not None:
+            lane = int(round(event.ydata))
+            if 0 <= lane < len(self.index.lanes) and abs(event.ydata - lane) <= BAR_HEIGHT / 2:
+                hits = self.index.at(lane, event.xdata, HOVER_TOLERANCE_PX * self.pixel_width())
+                if len(hits) == 1:
+                    text = f"TAG: {self.index.lanes[lane]}\n{self.row_text(self.index.rows[hits[0]])}"
+                elif len(hits) > 1:
+                    first = mdates.num2date(self.index.starts[hits].min()).strftime("%d/%m/%Y")
+                    last = mdates.num2date(self.index.ends[hits].max()).strftime("%d/%m/%Y")
+                    text = f"TAG: {self.index.lanes[lane]}\n{len(hits)} manutenções\n{first} a {last}"
+        if text is not None:
+            self.annotation.set_text(text)
+            self.annotation.xy = (event.xdata, event.ydata)
+            self.annotation.set_visible(True)
+            self.draw_idle()
+        elif self.annotation.get_visible():
+            self.annotation.set_visible(False)
+            self.draw_idle()
+
+    def row_text(self, row):
+        # O mouse costuma ficar sobre o mesmo bloco por vários eventos: guarda só o último texto
+        if self._described[0] != row:
+            self._described = (row, self.describe(row) if self.describe is not None else "")
+        return self._described[1]
+
+    def memory_bytes(self):
+        return super().memory_bytes() + (self.index.memory_bytes() if self.index is not None else 0)
+
+    def release(self):
+        super().release()
+        self.index = None
+        self._described = (None, None)
+        self.collections = []
+        self.ax = None
+        self.annotation = None
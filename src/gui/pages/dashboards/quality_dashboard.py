@@ -0,0 +1,200 @@
+from PySide6 import QtWidgets
+from PySide6.QtWidgets import QGraphicsDropShadowEffect
+from PySide6.QtGui import QColor, QPainter
+from PySide6.QtPrintSupport import QPrinter
+from matplotlib.figure import Figure
+import matplotlib.dates as mdates
+import numpy as np
+from gui.themes import themed_chart
+from analytics.quality_correlation import QualityCorrelation, INPUT_METRICS, OUTPUT_METRICS
+from .chart_canvas import ChartCanvas
+from utils.tracing import span, traced
+from services.export import table_dataset
+from database.db_handler import LOCAL_SOURCE
+from utils.memory import memory_budget, array_bytes
+
+class QualityDashboard(QtWidgets.QWidget):
+    def __init__(self, db_handler, theme):
+        super().__init__()
+        self.db_handler = db_handler
+        self.theme = theme
+        self.correlation = QualityCorrelation(db_handler)
+        self.correlation.load()
+        self.released = False
+        self.init_ui()
+        self.apply_theme()
+
+    def init_ui(self):
+        self.layout = QtWidgets.QVBoxLayout(self)
+        self.layout.setSpacing(25)
+
+        self.create_filter_controls()
+
+        self.charts_container = QtWidgets.QWidget()
+        self.charts_container.setObjectName("chartsContainer")
+        self.charts_layout = QtWidgets.QVBoxLayout(self.charts_container)
+        self.charts_layout.setSpacing(10)
+        self.charts_layout.setContentsMargins(0, 0, 0, 0)
+        self.shadow = QGraphicsDropShadowEffect(self)
+        self.shadow.setBlurRadius(15)
+        self.shadow.setXOffset(5)
+        self.shadow.setYOffset(5)
+        self.shadow.setColor(QColor(100, 100, 100))
+        self.charts_container.setGraphicsEffect(self.shadow)
+
+        self.fig_rolling = Figure(figsize=(12, 3), facecolor=self.theme['bg_card'])
+        self.canvas_rolling = ChartCanvas(self.fig_rolling)
+        self.canvas_rolling.setProperty("role", "chart")
+        self.canvas_rolling.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Fixed)
+        self.canvas_rolling.setMinimumHeight(250)
+        self.charts_layout.addWidget(self.canvas_rolling)
+
+        self.fig_cross = Figure(figsize=(12, 3), facecolor=self.theme['bg_card'])
+        self.canvas_cross = ChartCanvas(self.fig_cross)
+        self.canvas_cross.setProperty("role", "chart")
+        self.canvas_cross.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Fixed)
+        self.canvas_cross.setMinimumHeight(250)
+        self.charts_layout.addWidget(self.canvas_cross)
+
+        self.layout.addWidget(self.charts_container)
+        self.update_charts()
+
+    def create_filter_controls(self):
+        filter_layout = QtWidgets.QHBoxLayout()
+        filter_layout.setSpacing(10)
+
+        self.input_label = QtWidgets.QLabel("Entrada (Soja):")
+        filter_layout.addWidget(self.input_label)
+        self.input_combo = QtWidgets.QComboBox()
+        for column, label in INPUT_METRICS.items():
+            self.input_combo.addItem(label, column)
+        self.input_combo.currentIndexChanged.connect(self.update_charts)
+        filter_layout.addWidget(self.input_combo)
+
+        self.output_label = QtWidgets.QLabel("Saída (Farelo):")
+        filter_layout.addWidget(self.output_label)
+        self.output_combo = QtWidgets.QComboBox()
+        for column, label in OUTPUT_METRICS.items():
+            self.output_combo.addItem(label, column)
+        self.output_combo.currentIndexChanged.connect(self.update_charts)
+        filter_layout.addWidget(self.output_combo)
+
+        self.lag_label = QtWidgets.QLabel("Defasagem (dias):")
+        filter_layout.addWidget(self.lag_label)
+        self.lag_spin = QtWidgets.QSpinBox()
+        self.lag_spin.setRange(0, 30)
+        self.lag_spin.valueChanged.connect(self.update_charts)
+        filter_layout.addWidget(self.lag_spin)
+
+        self.window_label = QtWidgets.QLabel("Janela (dias):")
+        filter_layout.addWidget(self.window_label)
+        self.window_spin = QtWidgets.QSpinBox()
+        self.window_spin.setRange(5, 180)
+        self.window_spin.setValue(30)
+        self.window_spin.valueChanged.connect(self.update_charts)
+        filter_layout.addWidget(self.window_spin)
+
+        self.reload_button = QtWidgets.QPushButton("Recarregar")
+        self.reload_button.clicked.connect(self.reload_data)
+        filter_layout.addWidget(self.reload_button)
+
+        filter_layout.addStretch()
+        self.layout.addLayout(filter_layout)
+
+    def reload_data(self):
+        self.correlation.load()
+        self.update_charts()
+
+    def update_charts(self):
+        input_metric = self.input_combo.currentData()
+        output_metric = self.output_combo.currentData()
+        lag = self.lag_spin.value()
+        window = self.window_spin.value()
+        self.update_rolling_chart(input_metric, output_metric, lag, window)
+        self.update_cross_chart(input_metric, output_metric, lag)
+
+    @traced('quality.update_rolling_chart', 'chart')
+    @themed_chart
+    def update_rolling_chart(self, input_metric, output_metric, lag, window):
+        self.fig_rolling.clear()
+        ax = self.fig_rolling.add_subplot(111)
+        ax.set_title(f"Correlação Móvel ({window} dias): {INPUT_METRICS[input_metric]} x {OUTPUT_METRICS[output_metric]}",
+                     fontsize=12, pad=10)
+        ax.set_xlabel("Data", fontsize=10)
+        ax.set_ylabel("Correlação", fontsize=10)
+
+        if not self.correlation.is_empty():
+            dates, corr = self.correlation.rolling_correlation(input_metric, output_metric, lag, window)
+            ax.plot(dates, corr, color='red', linewidth=2)
+            ax.axhline(0, color=self.theme['text_secondary'], linewidth=0.8)
+            ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m'))
+        ax.set_ylim(-1.05, 1.05)
+
+        with span('mpl.tight_layout', 'layout'):
+            self.fig_rolling.tight_layout()
+        self.canvas_rolling.draw()
+
+    @traced('quality.update_cross_chart', 'chart')
+    @themed_chart
+    def update_cross_chart(self, input_metric, output_metric, lag):
+        self.fig_cross.clear()
+        ax = self.fig_cross.add_subplot(111)
+        ax.set_title("Correlação Cruzada por Defasagem", fontsize=12, pad=10)
+        ax.set_xlabel("Defasagem (dias)", fontsize=10)
+        ax.set_ylabel("Correlação", fontsize=10)
+
+        if not self.correlation.is_empty():
+            lags, corr = self.correlation.cross_correlation(input_metric, output_metric, self.lag_spin.maximum())
+            colors = ['#FF0000' if value == lag else self.theme['accent'] for value in lags]
+            ax.bar(lags, np.nan_to_num(corr), color=colors, edgecolor='black', linewidth=0.5)
+            ax.axhline(0, color=self.theme['text_secondary'], linewidth=0.8)
+        ax.set_ylim(-1.05, 1.05)
+
+        with span('mpl.tight_layout', 'layout'):
+            self.fig_cross.tight_layout()
+        self.canvas_cross.draw()
+
+    def apply_theme(self):
+        self.fig_rolling.set_facecolor(self.theme['bg_card'])
+        self.fig_cross.set_facecolor(self.theme['bg_card'])
+
+    def update_theme(self, theme):
+        self.theme = theme
+        self.apply_theme()
+        if not self.released:
+            self.update_charts()
+
+    def memory_footprint(self):
+        return {
+            'séries': array_bytes(self.correlation.dates, *self.correlation.series.values()),
+            'gráficos': self.canvas_rolling.memory_bytes() + self.canvas_cross.memory_bytes(),
+        }
+
+    def release_memory(self):
+        self.correlation.clear()
+        self.canvas_rolling.release()
+        self.canvas_cross.release()
+        self.released = True
+
+    def restore_memory(self):
+        self.released = False
+        self.correlation.load()
+        self.apply_theme()
+        self.update_charts()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        memory_budget.touch(self)
+
+    def export_datasets(self):
+        return [table_dataset(self.db_handler, table, plant=LOCAL_SOURCE)
+                for table in ('ProducaoSoja', 'FareloSojaTostado')]
+
+    def export_to_pdf(self, file_path):
+        printer = QPrinter(QPrinter.HighResolution)
+        printer.setOutputFormat(QPrinter.PdfFormat)
+        printer.setOutputFileName(file_path)
+
+        painter = QPainter(printer)
+        self.render(painter)
+        painter.end()
@@ -0,0 +1,209 @@
+import numpy as np
+from PySide6 import QtWidgets, QtCore
+from matplotlib.figure import Figure
+from gui.themes import themed_chart
+from services.strategy_simulation import (ALL_CLASSES, DEFAULT_COSTS, DEFAULT_TRIALS, class_names, compare_interval,
+                                          fetch_history, fit_class)
+from .chart_canvas import ChartCanvas
+
+
+class SimulationWorker(QtCore.QThread):
+    # Ajuste e simulação fora da thread da GUI; as tentativas em si rodam no pool de processos
+    completed = QtCore.Signal(object)
+    failed = QtCore.Signal(str)
+
+    def __init__(self, db_handler, name, change, trials, seed, costs, parent=None):
+        super().__init__(parent)
+        self.db_handler = db_handler
+        self.name = name
+        self.change = change
+        self.trials = trials
+        self.seed = seed
+        self.costs = costs
+
+    def run(self):
+        try:
+            history = fetch_history(self.db_handler)
+            if history is None:
+                raise ValueError("Sem ordens de manutenção")
+            params = fit_class(history, self.name)
+            params['costs'] = self.costs
+            result = compare_interval(params, self.change, self.trials, self.seed)
+            result['params'] = params
+            result['change'] = self.change
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.completed.emit(result)
+
+
+class StrategyPanel(QtWidgets.QWidget):
+    # E se o intervalo preventivo de uma classe de TAGs mudar? Falhas (Weibull) e durações (lognormal) ajustadas do
+    # histórico alimentam um Monte Carlo com o cenário atual e o alterado sobre as mesmas sementes;
+    # disponibilidade e custo anual aparecem com intervalo de confiança de 95%
+    def __init__(self, db_handler, theme):
+        super().__init__()
+        self.db_handler = db_handler
+        self.theme = theme
+        self.result = None
+        self.worker = None
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(10)
+
+        controls = QtWidgets.QHBoxLayout()
+        controls.setSpacing(10)
+        controls.addWidget(QtWidgets.QLabel("Classe de TAG:"))
+        self.class_combo = QtWidgets.QComboBox()
+        try:
+            self.class_combo.addItems(class_names(self.db_handler))
+        except Exception as e:
+            print(f"Erro ao listar classes de TAG: {e}")
+            self.class_combo.addItem(ALL_CLASSES)
+        controls.addWidget(self.class_combo)
+
+        controls.addWidget(QtWidgets.QLabel("Intervalo preventivo:"))
+        self.change_spin = QtWidgets.QSpinBox()
+        self.change_spin.setRange(-90, 300)
+        self.change_spin.setSingleStep(5)
+        self.change_spin.setValue(-20)
+        self.change_spin.setSuffix(" %")
+        controls.addWidget(self.change_spin)
+
+        controls.addWidget(QtWidgets.QLabel("Tentativas:"))
+        self.trials_spin = QtWidgets.QSpinBox()
+        self.trials_spin.setRange(1000, 1_000_000)
+        self.trials_spin.setSingleStep(10_000)
+        self.trials_spin.setValue(DEFAULT_TRIALS)
+        controls.addWidget(self.trials_spin)
+
+        controls.addWidget(QtWidgets.QLabel("Semente:"))
+        self.seed_spin = QtWidgets.QSpinBox()
+        self.seed_spin.setRange(0, 2_000_000_000)
+        controls.addWidget(self.seed_spin)
+
+        controls.addStretch()
+        layout.addLayout(controls)
+
+        costs = QtWidgets.QHBoxLayout()
+        costs.setSpacing(10)
+        self.cost_spins = {}
+        for key, label in (('downtime', "R$/h parada:"), ('corrective', "Corretiva R$:"),
+                           ('preventive', "Preventiva R$:")):
+            costs.addWidget(QtWidgets.QLabel(label))
+            spin = QtWidgets.QDoubleSpinBox()
+            spin.setRange(0, 10_000_000)
+            spin.setDecimals(0)
+            spin.setSingleStep(100)
+            spin.setValue(DEFAULT_COSTS[key])
+            costs.addWidget(spin)
+            self.cost_spins[key] = spin
+
+        self.run_button = QtWidgets.QPushButton("Simular")
+        self.run_button.clicked.connect(self.run_simulation)
+        costs.addWidget(self.run_button)
+        costs.addStretch()
+        layout.addLayout(costs)
+
+        self.summary_label = QtWidgets.QLabel("Escolha a classe e a variação do intervalo preventivo e clique em Simular.")
+        self.summary_label.setWordWrap(True)
+        layout.addWidget(self.summary_label)
+
+        self.figure = Figure(figsize=(12, 3), facecolor=self.theme['bg_card'])
+        self.canvas = ChartCanvas(self.figure)
+        self.canvas.on_resize_settled = self.draw_result
+        self.canvas.setProperty("role", "chart")
+        self.canvas.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Fixed)
+        self.canvas.setMinimumHeight(250)
+        layout.addWidget(self.canvas)
+        self.draw_result()
+
+    def run_simulation(self):
+        if self.worker is not None:
+            return
+        costs = {key: spin.value() for key, spin in self.cost_spins.items()}
+        worker = SimulationWorker(self.db_handler, self.class_combo.currentText(), self.change_spin.value() / 100,
+                                  self.trials_spin.value(), self.seed_spin.value(), costs, self)
+        worker.completed.connect(self.on_completed)
+        worker.failed.connect(self.on_failed)
+        worker.finished.connect(self.on_finished)
+        self.worker = worker
+        self.run_button.setEnabled(False)
+        self.summary_label.setText(f"Simulando {self.trials_spin.value():,} tentativas...".replace(',', '.'))
+        worker.start()
+
+    def on_finished(self):
+        self.worker.deleteLater()
+        self.worker = None
+        self.run_button.setEnabled(True)
+
+    def on_failed(self, message):
+        print(f"Erro na simulação de estratégia: {message}")
+        self.summary_label.setText(f"Erro na simulação: {message}")
+
+    def on_completed(self, result):
+        self.result = result
+        params = result['params']
+        shape, scale = params['failure']
+        interval = params['interval']
+        difference = result['difference']
+        availability, cost = difference['availability'], difference['cost']
+        text = (f"{params['units']} TAGs • Weibull: forma {shape:.2f} e escala {scale:,.0f} h • "
+                + (f"intervalo preventivo atual {interval:,.0f} h" if np.isfinite(interval)
+                   else "sem preventivas no histórico (o intervalo não altera o resultado)")
+                + f"\nVariação: disponibilidade {availability['mean'] * 100:+.2f} p.p. "
+                f"(IC 95% {availability['ci'][0] * 100:+.2f} a {availability['ci'][1] * 100:+.2f}) • "
+                f"custo anual R$ {cost['mean']:+,.0f} (IC 95% {cost['ci'][0]:+,.0f} a {cost['ci'][1]:+,.0f}) • "
+                f"{result['trials']:,} tentativas em {result['seconds']:.1f} s")
+        text = text.replace(',', '.')
+        if params['pooled']:
+            text += f" • ajustado com a frota inteira: {', '.join(params['pooled'])}"
+        self.summary_label.setText(text)
+        self.draw_result()
+
+    @themed_chart
+    def draw_result(self):
+        self.figure.clear()
+        result = self.result
+        if result is None:
+            ax = self.figure.add_subplot(111)
+            ax.text(0.5, 0.5, "Nenhuma simulação executada", ha='center', va='center', fontsize=12)
+            ax.set_axis_off()
+            self.canvas.draw_idle()
+            return
+
+        labels = ["Atual", f"Intervalo {result['change']:+.0%}"]
+        colors = [self.theme['accent'], self.theme['red']]
+        panels = (('availability', "Disponibilidade (%)", 100.0, "{:.2f}"),
+                  ('cost', "Custo anual (mil R$)", 0.001, "{:,.0f}"))
+        for position, (key, title, scale, label) in enumerate(panels, start=1):
+            ax = self.figure.add_subplot(1, 2, position)
+            ax.set_title(title, fontsize=12)
+            means = [result[name][key]['mean'] * scale for name in ('base', 'scenario')]
+            # Barra: média; traço: faixa de 95% das tentativas (variação de um ano para outro)
+            lows = [result[name][key]['range'][0] * scale for name in ('base', 'scenario')]
+            highs = [result[name][key]['range'][1] * scale for name in ('base', 'scenario')]
+            errors = [np.subtract(means, lows), np.subtract(highs, means)]
+            ax.bar(labels, means, color=colors, yerr=errors, capsize=6, ecolor=self.theme['text_secondary'])
+            for x, (value, high) in enumerate(zip(means, highs)):
+                ax.annotate(label.format(value).replace(',', '.'), (x, high),
+                            xytext=(0, 4), textcoords="offset points", ha='center', fontsize=9)
+            bottom = min(lows) - (max(highs) - min(lows)) * 0.2
+            if key == 'availability' and bottom > 0:
+                ax.set_ylim(bottom=bottom)
+        self.figure.tight_layout()
+        self.canvas.draw_idle()
+
+    def update_theme(self, theme):
+        self.theme = theme
+        self.figure.set_facecolor(theme['bg_card'])
+        self.draw_result()
+
+    def memory_bytes(self):
+        return self.canvas.memory_bytes()
+
+    def release(self):
+        self.canvas.release()
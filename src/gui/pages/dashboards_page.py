@@ -1,9 +1,15 @@
-from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QScrollArea, QStackedWidget, QPushButton, QLabel, QComboBox, QSizePolicy, QFileDialog
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QScrollArea, QStackedWidget, QPushButton, QLabel, QSizePolicy, QFileDialog, QMenu
 from PySide6.QtCore import QPropertyAnimation, QEasingCurve
 from PySide6.QtGui import QIcon, QPixmap
-from gui.themes import Themes, get_stylesheet
+from gui.themes import Themes
+from gui.export_worker import ExportWorker, ExportProgressDialog
+from services.export import FORMATS, xlsx_available
+from utils.memory import memory_budget
 from .dashboards.grain_dashboard import GrainDashboard
 from .dashboards.maintenance_dashboard import MaintenanceDashboard
+from .dashboards.quality_dashboard import QualityDashboard
+from .dashboards.alarms_dashboard import AlarmsDashboard
+from .dashboards.machines_dashboard import MachinesDashboard
 
 class DashboardWindow(QWidget):
     def __init__(self, db_handler, theme=Themes.LIGHT):
@@ -11,10 +17,13 @@ class DashboardWindow(QWidget):
         self.db_handler = db_handler
         self.theme = theme
         self.animations = []
+        self.export_workers = []
         self.grain_dashboard = None
         self.maintenance_dashboard = None
+        self.quality_dashboard = None
+        self.alarms_dashboard = None
+        self.machines_dashboard = None
         self.init_ui()
-        self.apply_theme()
 
     def init_ui(self):
         main_layout = QVBoxLayout(self)
@@ -37,6 +46,7 @@ class DashboardWindow(QWidget):
         self.create_dashboard_selection_buttons()
 
         self.dashboard_stack = QStackedWidget()
+        self.dashboard_stack.setObjectName("dashboardStack")
         self.dashboard_stack.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
 
         self.grain_dashboard = GrainDashboard(self.db_handler, self.theme)
@@ -47,9 +57,27 @@ class DashboardWindow(QWidget):
         self.maintenance_dashboard.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         self.dashboard_stack.addWidget(self.maintenance_dashboard)
 
+        self.quality_dashboard = QualityDashboard(self.db_handler, self.theme)
+        self.quality_dashboard.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.dashboard_stack.addWidget(self.quality_dashboard)
+
+        self.alarms_dashboard = AlarmsDashboard(self.db_handler, self.theme)
+        self.alarms_dashboard.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.dashboard_stack.addWidget(self.alarms_dashboard)
+
+        self.machines_dashboard = MachinesDashboard(self.db_handler, self.theme)
+        self.machines_dashboard.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.dashboard_stack.addWidget(self.machines_dashboard)
+
         self.layout.addWidget(self.dashboard_stack)
         self.layout.addStretch()
 
+        # Dashboards ocultos são os candidatos a liberar memória quando o orçamento estoura
+        memory_budget.register("Dashboards / Grão", self.grain_dashboard)
+        memory_budget.register("Dashboards / Manutenção", self.maintenance_dashboard)
+        memory_budget.register("Dashboards / Qualidade", self.quality_dashboard)
+        memory_budget.register("Dashboards / Máquinas", self.machines_dashboard)
+
     def create_export_button(self):
         self.export_button = QLabel()
         self.export_button.setFixedSize(30, 30)
@@ -59,10 +87,36 @@ class DashboardWindow(QWidget):
 
     def export_current_page(self, event):
         current_widget = self.dashboard_stack.currentWidget()
-        if current_widget:
-            file_path, _ = QFileDialog.getSaveFileName(self, "Salvar Página", "", "PDF Files (*.pdf);;All Files (*)")
-            if file_path:
-                current_widget.export_to_pdf(file_path)
+        if not current_widget:
+            return
+        menu = QMenu(self)
+        menu.addAction("Página (PDF)", self.export_page_pdf)
+        menu.addSeparator()
+        for dataset in current_widget.export_datasets():
+            for file_format, label in FORMATS.items():
+                action = menu.addAction(f"Dados {dataset['name']} ({label.split(' ')[0]})",
+                                        lambda d=dataset, f=file_format: self.export_data(d, f))
+                action.setEnabled(file_format != 'xlsx' or xlsx_available())
+        menu.exec(event.globalPosition().toPoint())
+
+    def export_page_pdf(self):
+        current_widget = self.dashboard_stack.currentWidget()
+        file_path, _ = QFileDialog.getSaveFileName(self, "Salvar Página", "", "PDF Files (*.pdf);;All Files (*)")
+        if file_path:
+            current_widget.export_to_pdf(file_path)
+
+    def export_data(self, dataset, file_format):
+        file_path, _ = QFileDialog.getSaveFileName(self, "Exportar Dados", f"{dataset['name']}.{file_format}",
+                                                   f"{FORMATS[file_format]};;All Files (*)")
+        if not file_path:
+            return
+        worker = ExportWorker(self.db_handler, dataset, file_path, file_format, self)
+        dialog = ExportProgressDialog(worker, self)
+        self.export_workers.append(worker)
+        worker.finished.connect(lambda: self.export_workers.remove(worker))
+        worker.finished.connect(worker.deleteLater)
+        worker.start()
+        dialog.show()
 
     def create_dashboard_selection_buttons(self):
         self.selection_layout = QHBoxLayout()
@@ -70,103 +124,57 @@ class DashboardWindow(QWidget):
 
         self.grain_button = QPushButton("Grão")
         self.grain_button.setFixedSize(200, 50)
+        self.grain_button.setProperty("role", "dashboardTab")
         self.grain_button.clicked.connect(lambda: self.dashboard_stack.setCurrentIndex(0))
         self.selection_layout.addWidget(self.grain_button)
 
         self.maintenance_button = QPushButton("Manutenção")
         self.maintenance_button.setFixedSize(200, 50)
+        self.maintenance_button.setProperty("role", "dashboardTab")
         self.maintenance_button.clicked.connect(lambda: self.dashboard_stack.setCurrentIndex(1))
         self.selection_layout.addWidget(self.maintenance_button)
 
+        self.quality_button = QPushButton("Qualidade")
+        self.quality_button.setFixedSize(200, 50)
+        self.quality_button.setProperty("role", "dashboardTab")
+        self.quality_button.clicked.connect(lambda: self.dashboard_stack.setCurrentIndex(2))
+        self.selection_layout.addWidget(self.quality_button)
+
+        self.alarms_button = QPushButton("Alarmes")
+        self.alarms_button.setFixedSize(200, 50)
+        self.alarms_button.setProperty("role", "dashboardTab")
+        self.alarms_button.clicked.connect(lambda: self.dashboard_stack.setCurrentIndex(3))
+        self.selection_layout.addWidget(self.alarms_button)
+
+        self.machines_button = QPushButton("Máquinas")
+        self.machines_button.setFixedSize(200, 50)
+        self.machines_button.setProperty("role", "dashboardTab")
+        self.machines_button.clicked.connect(lambda: self.dashboard_stack.setCurrentIndex(4))
+        self.selection_layout.addWidget(self.machines_button)
+
         self.selection_layout.addStretch()
         self.create_export_button()
         self.layout.addLayout(self.selection_layout)
 
-    def apply_theme(self):
-        stylesheet = get_stylesheet(self.theme)
-        self.setStyleSheet(stylesheet)
-
-        for label in self.findChildren(QLabel):
-            label.setStyleSheet(f"color: {self.theme['text_primary']};")
-        for combo in self.findChildren(QComboBox):
-            combo.setStyleSheet(f"""
-                QComboBox {{
-                    background-color: {self.theme['bg_card']};
-                    color: {self.theme['text_primary']};
-                    border: 1px solid {self.theme['border']};
-                    border-radius: 5px;
-                    padding: 5px;
-                }}
-                QComboBox::drop-down {{
-                    border-left: 1px solid {self.theme['border']};
-                }}
-                QComboBox:hover {{
-                    background-color: {self.theme['hover']};
-                }}
-            """)
-        for button in self.findChildren(QPushButton):
-            if button in [self.grain_button, self.maintenance_button, self.export_button]:
-                button.setStyleSheet(f"""
-                    QPushButton {{
-                        background-color: {self.theme['red']};
-                        color: {self.theme['button_text']};
-                        border: none;
-                        border-radius: 10px;
-                        padding: 8px;
-                        font-size: 18px;
-                    }}
-                    QPushButton:hover {{
-                        background-color: {self.theme['red_hover']};
-                    }}
-                    QPushButton:pressed {{
-                        background-color: {self.theme['active']};
-                    }}
-                """)
-            else:
-                button.setStyleSheet(f"""
-                    QPushButton {{
-                        background-color: {self.theme['accent']};
-                        color: {self.theme['button_text']};
-                        border: none;
-                        border-radius: 5px;
-                        padding: 8px;
-                        font-size: 12px;
-                    }}
-                    QPushButton:hover {{
-                        background-color: {self.theme['hover']};
-                    }}
-                    QPushButton:pressed {{
-                        background-color: {self.theme['active']};
-                    }}
-                """)
-        self.dashboard_stack.setStyleSheet(f"""
-            QStackedWidget {{
-                background-color: {self.theme['bg_card']};
-                border-radius: {self.theme['card_radius']};
-            }}
-        """)
-        for widget in [self.grain_dashboard, self.maintenance_dashboard]:
-            if widget:
-                widget.setStyleSheet(f"""
-                    QWidget {{
-                        background-color: {self.theme['bg_card']};
-                        border-radius: {self.theme['card_radius']};
-                    }}
-                """)
-
     def update_theme(self, theme_name):
         self.theme = getattr(Themes, theme_name)
-        self.apply_theme()
         if self.grain_dashboard:
             self.grain_dashboard.update_theme(self.theme)
         if self.maintenance_dashboard:
             self.maintenance_dashboard.update_theme(self.theme)
-        self.style().unpolish(self)
-        self.style().polish(self)
+        if self.quality_dashboard:
+            self.quality_dashboard.update_theme(self.theme)
+        if self.alarms_dashboard:
+            self.alarms_dashboard.update_theme(self.theme)
+        if self.machines_dashboard:
+            self.machines_dashboard.update_theme(self.theme)
 
     def resizeEvent(self, event):
         super().resizeEvent(event)
-        self.dashboard_stack.setMaximumWidth(self.width() - 60)
+        max_width = self.width() - 60
+        if self.dashboard_stack.maximumWidth() == max_width:
+            return
+        self.dashboard_stack.setMaximumWidth(max_width)
         current_widget = self.dashboard_stack.currentWidget()
         if current_widget:
             current_widget.updateGeometry()
\ No newline at end of file
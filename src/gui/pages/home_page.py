@@ -9,6 +9,7 @@ class HomePage(QWidget):
         super().__init__()
         self.db = db
         self.theme = theme
+        self.setProperty("role", "page")
         self.init_ui()
 
     def init_ui(self):
@@ -18,13 +19,11 @@ class HomePage(QWidget):
 
         welcome_label = QLabel("Bem-vindo!")
         welcome_label.setFont(QFont('Segoe UI', 48, QFont.Bold))
-        welcome_label.setStyleSheet("background-color: transparent;")
         welcome_label.setAlignment(Qt.AlignCenter)
         layout.addWidget(welcome_label)
 
         slogan_label = QLabel("O sistema perfeito para o monitoramento do seu negócio!")
         slogan_label.setFont(QFont('Segoe UI', 18))
-        slogan_label.setStyleSheet("background-color: transparent;")
         slogan_label.setAlignment(Qt.AlignCenter)
         layout.addWidget(slogan_label)
 
@@ -34,7 +33,3 @@ class HomePage(QWidget):
 
     def update_theme(self, theme_name):
         self.theme = getattr(Themes, theme_name)
-        self.setStyleSheet(f"""
-            background-color: {self.theme['bg_primary']};
-            color: {self.theme['text_primary']};
-        """)
\ No newline at end of file
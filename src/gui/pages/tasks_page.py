@@ -1,11 +1,219 @@
-from PySide6.QtWidgets import QWidget, QVBoxLayout
+from matplotlib.figure import Figure
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QColor, QFont
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableWidget,
+                               QTableWidgetItem, QHeaderView, QAbstractItemView, QSplitter)
+from gui.themes import Themes, themed_chart
+from gui.pages.dashboards.chart_canvas import ChartCanvas
+from services.predictive_maintenance import TASK_DONE, planner_for
+from utils.tracing import traced
+
+PLAN_HEADERS = ["TAG", "Horas desde o serviço", "MTBF (h)", "Limite (h)", "Disponibilidade", "Próxima", "Situação"]
+TASK_HEADERS = ["Tarefa", "Situação", "Prazo", "Descrição"]
+SITUATION_COLORS = {'em manutenção': 'accent', 'vencida': 'red', 'próxima': 'warning'}
+
 
 class TasksPage(QWidget):
-    def __init__(self, db):
+    # Tarefas de manutenção e o plano preditivo por TAG: horas de operação desde o último serviço comparadas ao
+    # limite estimado pela MTBF. O plano é recalculado ao abrir a página (incremental enquanto só houver ordens novas)
+    def __init__(self, db, theme=Themes.LIGHT):
         super().__init__()
         self.db = db
+        self.theme = theme
+        self.planner = planner_for(db)
+        self.summary = None
+        self.setProperty("role", "page")
+        self.setObjectName("tasksPage")
         self.init_ui()
-    
+
     def init_ui(self):
-        layout = QVBoxLayout()
-        self.setLayout(layout)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(10)
+
+        title = QLabel("Tarefas e Manutenção Preditiva")
+        title.setFont(QFont('Segoe UI', 20, QFont.Bold))
+        layout.addWidget(title)
+
+        self.summary_text = ""
+        self.summary_label = QLabel()
+        self.summary_label.setFont(QFont('Segoe UI', 11))
+        layout.addWidget(self.summary_label)
+
+        splitter = QSplitter(Qt.Vertical)
+        top = QWidget()
+        top_layout = QHBoxLayout(top)
+        top_layout.setContentsMargins(0, 0, 0, 0)
+        self.plan_table = self.create_table(PLAN_HEADERS)
+        top_layout.addWidget(self.plan_table, 3)
+        self.canvas = ChartCanvas(Figure(figsize=(5, 3), facecolor=self.theme['bg_card']))
+        self.canvas.setMinimumWidth(320)
+        top_layout.addWidget(self.canvas, 2)
+        splitter.addWidget(top)
+
+        bottom = QWidget()
+        bottom_layout = QVBoxLayout(bottom)
+        bottom_layout.setContentsMargins(0, 0, 0, 0)
+        buttons = QHBoxLayout()
+        generate_button = QPushButton("Gerar tarefas")
+        generate_button.clicked.connect(self.generate_tasks)
+        buttons.addWidget(generate_button)
+        self.done_button = QPushButton("Concluir")
+        self.done_button.setEnabled(False)
+        self.done_button.clicked.connect(self.complete_task)
+        buttons.addWidget(self.done_button)
+        buttons.addStretch()
+        bottom_layout.addLayout(buttons)
+        self.task_table = self.create_table(TASK_HEADERS)
+        self.task_table.itemSelectionChanged.connect(self.on_task_selected)
+        bottom_layout.addWidget(self.task_table)
+        splitter.addWidget(bottom)
+        layout.addWidget(splitter, 1)
+
+    def create_table(self, headers):
+        table = QTableWidget(0, len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        table.setSelectionMode(QAbstractItemView.SingleSelection)
+        table.verticalHeader().setVisible(False)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        table.horizontalHeader().setStretchLastSection(True)
+        return table
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+
+    @traced('tasks.refresh', 'data')
+    def refresh(self):
+        try:
+            plan = self.planner.plan()
+            self.summary = self.planner.fleet_summary()
+        except Exception as e:
+            print(f"Erro ao calcular o plano preditivo: {str(e)}")
+            plan, self.summary = [], None
+        self.fill_plan(plan)
+        self.update_summary(plan)
+        self.draw_distribution()
+        self.load_tasks()
+
+    def fill_plan(self, plan):
+        table = self.plan_table
+        table.setUpdatesEnabled(False)
+        table.setRowCount(len(plan))
+        for row, (tag, since, mtbf, _mttr, availability, limit, when, situation) in enumerate(plan):
+            values = [tag, f"{since:,.0f}", "-" if mtbf != mtbf else f"{mtbf:,.0f}", f"{limit:,.0f}",
+                      f"{availability:.1%}", when.strftime("%d/%m/%Y"), situation]
+            color = SITUATION_COLORS.get(situation)
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value.replace(',', '.'))
+                if column:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                if color:
+                    item.setData(Qt.UserRole, color)
+                    item.setForeground(QColor(self.theme[color]))
+                table.setItem(row, column, item)
+        table.setUpdatesEnabled(True)
+
+    def update_summary(self, plan):
+        if not plan:
+            self.summary_text = "Sem histórico de manutenção para estimar o plano preditivo."
+            self.summary_label.setText(self.summary_text)
+            return
+        counts = {}
+        for entry in plan:
+            counts[entry[7]] = counts.get(entry[7], 0) + 1
+        text = (f"{len(plan)} TAGs • vencidas: {counts.get('vencida', 0)} • próximas: {counts.get('próxima', 0)}"
+                f" • em manutenção: {counts.get('em manutenção', 0)}")
+        if self.summary is not None:
+            text += (f" • MTBF da frota: {self.summary['fleet_mtbf']:,.0f} h • tempo entre falhas p10/p50/p90: "
+                     f"{self.summary['p10']:,.0f} / {self.summary['p50']:,.0f} / {self.summary['p90']:,.0f} h")
+        self.summary_text = text.replace(',', '.')
+        self.summary_label.setText(self.summary_text)
+
+    @themed_chart
+    def draw_distribution(self):
+        figure = self.canvas.figure
+        figure.clear()
+        figure.set_facecolor(self.theme['bg_card'])
+        ax = figure.add_subplot(111)
+        ax.set_title("Tempo entre falhas da frota", fontsize=11)
+        summary = self.summary
+        if summary is None:
+            ax.text(0.5, 0.5, "Nenhum dado disponível", ha='center', va='center', fontsize=10)
+            ax.set_axis_off()
+        else:
+            edges = summary['edges']
+            ax.bar(edges[:-1], summary['counts'], width=edges[1:] - edges[:-1], align='edge',
+                   color=self.theme['accent'], edgecolor=self.theme['border'])
+            for key, style in (('p10', ':'), ('p50', '--'), ('p90', ':')):
+                ax.axvline(summary[key], color=self.theme['red'], linestyle=style, linewidth=1, label=key)
+            ax.set_xlabel("Horas de operação")
+            ax.set_ylabel("Falhas")
+            ax.legend(fontsize=8)
+        figure.tight_layout()
+        self.canvas.draw_idle()
+
+    def load_tasks(self):
+        try:
+            tasks = self.db.read("""
+                SELECT id, title, status, due_date, description FROM tarefas
+                ORDER BY status = ?, due_date IS NULL, due_date
+            """, (TASK_DONE,))
+        except Exception as e:
+            print(f"Erro ao carregar tarefas: {str(e)}")
+            tasks = []
+        table = self.task_table
+        table.setUpdatesEnabled(False)
+        table.setRowCount(len(tasks))
+        for row, (task_id, title, status, due_date, description) in enumerate(tasks):
+            due = str(due_date)[:10] if due_date else "-"
+            if due != "-":
+                due = f"{due[8:10]}/{due[5:7]}/{due[:4]}"
+            for column, value in enumerate((title, status, due, description or "")):
+                item = QTableWidgetItem(value)
+                item.setData(Qt.UserRole + 1, task_id)
+                table.setItem(row, column, item)
+        table.setUpdatesEnabled(True)
+        self.on_task_selected()
+
+    def selected_task(self):
+        items = self.task_table.selectedItems()
+        if not items:
+            return None
+        row = items[0].row()
+        return self.task_table.item(row, 0).data(Qt.UserRole + 1), self.task_table.item(row, 1).text()
+
+    def on_task_selected(self):
+        selected = self.selected_task()
+        self.done_button.setEnabled(selected is not None and selected[1] != TASK_DONE)
+
+    def generate_tasks(self):
+        try:
+            created, updated = self.planner.generate_tasks()
+            message = f"Tarefas preditivas: {created} criadas, {updated} atualizadas"
+        except Exception as e:
+            print(f"Erro ao gerar tarefas: {str(e)}")
+            message = f"Erro ao gerar tarefas: {e}"
+        self.load_tasks()
+        self.summary_label.setText(f"{self.summary_text}\n{message}")
+
+    def complete_task(self):
+        selected = self.selected_task()
+        if selected is None:
+            return
+        try:
+            self.db.write("UPDATE tarefas SET status = ? WHERE id = ?", (TASK_DONE, selected[0])).result()
+        except Exception as e:
+            print(f"Erro ao concluir a tarefa: {str(e)}")
+        self.load_tasks()
+
+    def update_theme(self, theme_name):
+        self.theme = getattr(Themes, theme_name)
+        for row in range(self.plan_table.rowCount()):
+            for column in range(self.plan_table.columnCount()):
+                item = self.plan_table.item(row, column)
+                if item is not None and item.data(Qt.UserRole):
+                    item.setForeground(QColor(self.theme[item.data(Qt.UserRole)]))
+        self.draw_distribution()
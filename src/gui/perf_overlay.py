@@ -0,0 +1,90 @@
+from PySide6.QtWidgets import QFrame, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QFileDialog
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtGui import QFont
+from utils.tracing import tracer
+
+class PerformanceOverlay(QFrame):
+    def __init__(self, parent, db=None):
+        super().__init__(parent)
+        self.db = db
+        self.setObjectName("perfOverlay")
+        self.setFixedWidth(460)
+        self.init_ui()
+        self.hide()
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(500)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(10, 10, 10, 10)
+        layout.setSpacing(6)
+
+        header = QHBoxLayout()
+        title = QLabel("Desempenho (F12)")
+        title.setFont(QFont('Segoe UI', 10, QFont.Bold))
+        header.addWidget(title)
+        header.addStretch()
+
+        clear_button = QPushButton("Limpar")
+        clear_button.clicked.connect(self.clear)
+        header.addWidget(clear_button)
+
+        export_button = QPushButton("Exportar trace")
+        export_button.clicked.connect(self.export_trace)
+        header.addWidget(export_button)
+        layout.addLayout(header)
+
+        self.table_label = QLabel()
+        self.table_label.setFont(QFont('Consolas', 9))
+        self.table_label.setTextFormat(Qt.PlainText)
+        layout.addWidget(self.table_label)
+
+    def toggle(self):
+        if self.isVisible():
+            self.refresh_timer.stop()
+            self.hide()
+            tracer.disable()
+        else:
+            tracer.enable()
+            self.refresh()
+            self.reposition()
+            self.show()
+            self.raise_()
+            self.refresh_timer.start()
+
+    def reposition(self):
+        parent = self.parentWidget()
+        if parent:
+            self.move(parent.width() - self.width() - 20, 90)
+
+    def refresh(self):
+        stats = sorted(tracer.summary().items(), key=lambda item: item[1]['total_ms'], reverse=True)
+        lines = [f"{'span':<34}{'n':>6}{'último ms':>11}{'máx ms':>9}"]
+        for name, entry in stats[:20]:
+            lines.append(f"{name[:33]:<34}{entry['count']:>6}{entry['last_ms']:>11.1f}{entry['max_ms']:>9.1f}")
+        if len(lines) == 1:
+            lines.append("Sem medições ainda.")
+        if self.db is not None and hasattr(self.db, 'lock_statistics'):
+            stats = self.db.lock_statistics()
+            read, write = stats['read'], stats['write']
+            lines.append("")
+            lines.append(f"Leituras: {read['operations']}  em espera: {read['contended']}  "
+                         f"máx {read['wait_max_ms']:.1f} ms  falhas: {read['failures']}")
+            lines.append(f"Escritas: {stats['commits']} commits  lote médio {stats['avg_batch']:.1f}  "
+                         f"espera máx {write['wait_max_ms']:.1f} ms")
+        self.table_label.setText("\n".join(lines))
+        self.adjustSize()
+
+    def clear(self):
+        tracer.clear()
+        self.refresh()
+
+    def export_trace(self):
+        file_path, _ = QFileDialog.getSaveFileName(self, "Exportar Trace", "mesalpha_trace.json", "Chrome Trace (*.json);;All Files (*)")
+        if file_path:
+            try:
+                tracer.export_chrome_trace(file_path)
+            except OSError as e:
+                print(f"Erro ao exportar trace: {e}")
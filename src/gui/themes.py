@@ -1,3 +1,7 @@
+from functools import lru_cache, wraps
+import matplotlib
+
+
 class Themes:
     LIGHT = {
         'bg_primary': '#FFFFFF',
@@ -13,6 +17,7 @@ class Themes:
         'bg_card': '#F0F0F0',
         'border': '#D0D0D0',
         'success': '#28A745',
+        'warning': '#E0A800',
         'red': '#FF0000',
         'red_hover': '#E60000',
         'card_radius': '10px'
@@ -31,12 +36,20 @@ class Themes:
         'bg_card': '#3C3C3C',
         'border': '#505050',
         'success': '#34CE57',
+        'warning': '#FFC107',
         'red': '#FF0000',
         'red_hover': '#E60000',
         'card_radius': '10px'
     }
-    
+
+
+def theme_name(theme):
+    return 'DARK' if theme is Themes.DARK or theme == 'DARK' else 'LIGHT'
+
+
 def get_stylesheet(theme):
+    # Folha de estilo única da aplicação: widgets são diferenciados por objectName
+    # e pela propriedade dinâmica "role", nunca por setStyleSheet individual
     return f"""
         QMainWindow, QWidget#dashboardContainer {{
             background-color: {theme['bg_primary']};
@@ -64,8 +77,172 @@ def get_stylesheet(theme):
         #themeButton:hover {{
             background-color: {theme['button_hover']};
         }}
+        QWidget[role="page"] {{
+            background-color: {theme['bg_primary']};
+            color: {theme['text_primary']};
+        }}
         QLabel {{
             color: {theme['text_primary']};
             background-color: transparent;
         }}
-    """
\ No newline at end of file
+        #dashboardStack, #dashboardStack QWidget {{
+            background-color: {theme['bg_card']};
+            border-radius: {theme['card_radius']};
+        }}
+        #dashboardContainer QComboBox, #dashboardContainer QSpinBox, #dashboardContainer QDoubleSpinBox,
+        #dashboardContainer QDateEdit, #dashboardContainer QLineEdit,
+        #dashboardContainer QTextBrowser {{
+            background-color: {theme['bg_card']};
+            color: {theme['text_primary']};
+            border: 1px solid {theme['border']};
+            border-radius: 5px;
+            padding: 5px;
+        }}
+        #dashboardContainer QComboBox::drop-down {{
+            border-left: 1px solid {theme['border']};
+        }}
+        #dashboardContainer QComboBox:hover, #dashboardContainer QSpinBox:hover, #dashboardContainer QDoubleSpinBox:hover,
+        #dashboardContainer QDateEdit:hover {{
+            background-color: {theme['hover']};
+        }}
+        #dashboardContainer QComboBox QAbstractItemView {{
+            background-color: {theme['bg_card']};
+            color: {theme['text_primary']};
+            selection-background-color: {theme['hover']};
+        }}
+        #dashboardContainer QPushButton {{
+            background-color: {theme['accent']};
+            color: {theme['button_text']};
+            border: none;
+            border-radius: 5px;
+            padding: 8px;
+            font-size: 12px;
+        }}
+        #dashboardContainer QPushButton:hover {{
+            background-color: {theme['hover']};
+        }}
+        #dashboardContainer QPushButton:pressed {{
+            background-color: {theme['active']};
+        }}
+        #dashboardContainer QPushButton[role="dashboardTab"] {{
+            background-color: {theme['red']};
+            border-radius: 10px;
+            font-size: 18px;
+        }}
+        #dashboardContainer QPushButton[role="dashboardTab"]:hover {{
+            background-color: {theme['red_hover']};
+        }}
+        #dashboardContainer QPushButton[role="dashboardTab"]:pressed {{
+            background-color: {theme['active']};
+        }}
+        #dashboardStack QLabel[role="kpiCard"] {{
+            background-color: {theme['bg_card']};
+            color: {theme['text_primary']};
+            border: 1px solid {theme['border']};
+            border-radius: 8px;
+            padding: 10px;
+            font-size: 14px;
+        }}
+        #dashboardStack QTableWidget {{
+            background-color: {theme['bg_primary']};
+            color: {theme['text_primary']};
+            gridline-color: {theme['border']};
+            border: 1px solid {theme['border']};
+            selection-background-color: {theme['hover']};
+            selection-color: {theme['text_primary']};
+        }}
+        #dashboardStack QHeaderView::section {{
+            background-color: {theme['bg_secondary']};
+            color: {theme['text_primary']};
+            border: none;
+            padding: 4px;
+        }}
+        #dashboardContainer QCheckBox {{
+            color: {theme['text_primary']};
+        }}
+        #dashboardStack QWidget[role="chart"] {{
+            border: 1px solid {theme['border']};
+            border-radius: 10px;
+        }}
+        #tasksPage QTableWidget {{
+            background-color: {theme['bg_card']};
+            color: {theme['text_primary']};
+            gridline-color: {theme['border']};
+            border: 1px solid {theme['border']};
+            selection-background-color: {theme['hover']};
+            selection-color: {theme['text_primary']};
+        }}
+        #tasksPage QHeaderView::section {{
+            background-color: {theme['bg_secondary']};
+            color: {theme['text_primary']};
+            border: none;
+            padding: 4px;
+        }}
+        #tasksPage QPushButton {{
+            background-color: {theme['accent']};
+            color: {theme['button_text']};
+            border: none;
+            border-radius: 5px;
+            padding: 8px 16px;
+        }}
+        #tasksPage QPushButton:hover {{
+            background-color: {theme['hover']};
+        }}
+        #tasksPage QPushButton:disabled {{
+            color: {theme['text_secondary']};
+        }}
+        #perfOverlay {{
+            background-color: {theme['bg_card']};
+            border: 1px solid {theme['border']};
+            border-radius: 8px;
+        }}
+        #perfOverlay QPushButton {{
+            background-color: {theme['accent']};
+            color: {theme['button_text']};
+            border: none;
+            border-radius: 5px;
+            padding: 4px 8px;
+        }}
+    """
+
+
+@lru_cache(maxsize=None)
+def compiled_stylesheet(name):
+    return get_stylesheet(getattr(Themes, name))
+
+
+@lru_cache(maxsize=None)
+def _chart_rc_items(name):
+    theme = getattr(Themes, name)
+    return tuple({
+        'figure.facecolor': theme['bg_card'],
+        'axes.facecolor': theme['bg_secondary'],
+        'axes.edgecolor': theme['border'],
+        'axes.linewidth': 0.5,
+        'axes.labelcolor': theme['text_secondary'],
+        'axes.titlecolor': theme['text_primary'],
+        'axes.grid': True,
+        'axes.spines.top': False,
+        'axes.spines.right': False,
+        'grid.color': theme['border'],
+        'grid.linestyle': '--',
+        'grid.alpha': 0.7,
+        'xtick.color': theme['text_secondary'],
+        'ytick.color': theme['text_secondary'],
+        'xtick.labelsize': 8,
+        'ytick.labelsize': 8,
+        'text.color': theme['text_primary'],
+    }.items())
+
+
+def chart_rc(name):
+    return dict(_chart_rc_items(name))
+
+
+def themed_chart(method):
+    # Artistas e ticks leem rcParams ao serem criados/desenhados, então a construção do gráfico roda dentro do contexto
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with matplotlib.rc_context(chart_rc(theme_name(self.theme))):
+            return method(self, *args, **kwargs)
+    return wrapper
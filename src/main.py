@@ -1,7 +1,14 @@
+import multiprocessing
+import os
 import sys
 from PySide6.QtWidgets import QApplication
 from gui.main_window import MainWindow
 from database.db_handler import DatabaseHandler
+from services.alarm_monitor import AlarmMonitor
+from services.modbus_gateway import ModbusGateway
+from services.scheduler import JobScheduler
+from services.signal_recorder import SignalRecorder
+from services.sync import SyncEngine, open_source, sync_tables
 
 
 def main():
@@ -9,12 +16,49 @@ def main():
     app = QApplication(sys.argv)
 
     db = DatabaseHandler()
+    alarm_monitor = AlarmMonitor(db)
+    alarm_monitor.start()
+    # Manutenção do banco (ANALYZE, optimize, vacuum incremental), relatórios e rotação fora do horário de uso
+    scheduler = JobScheduler(db)
+    scheduler.start()
+
+    # Com MESALPHA_SYNC_SOURCE definido, o banco local é mantido em dia com o central em segundo plano;
+    # MESALPHA_SYNC_WATERMARKS troca watermarks ('Tabela=expressão', separados por ';')
+    sync_engine = None
+    if os.environ.get('MESALPHA_SYNC_SOURCE'):
+        try:
+            watermarks = [spec for spec in os.environ.get('MESALPHA_SYNC_WATERMARKS', '').split(';') if spec.strip()]
+            sync_engine = SyncEngine(db, open_source(os.environ['MESALPHA_SYNC_SOURCE']), sync_tables(watermarks))
+            sync_engine.start()
+        except Exception as e:
+            print(f"Erro ao iniciar a sincronização: {e}")
+
+    # Com CLPs cadastrados em dispositivos_modbus, status e paradas das máquinas vêm da aquisição Modbus/TCP
+    gateway = ModbusGateway(db)
+    recorder = None
+    if gateway.load_devices():
+        recorder = SignalRecorder(db, gateway.store)
+        gateway.start()
+        recorder.start()
 
     window = MainWindow(db)
     window.showMaximized()
 
-    sys.exit(app.exec())
+    exit_code = app.exec()
+    alarm_monitor.stop()
+    scheduler.stop()
+    if recorder is not None:
+        gateway.stop()
+        recorder.stop()
+    if sync_engine is not None:
+        sync_engine.stop()
+    # Depois dos serviços: escritas na fila são gravadas e as conexões fechadas, com checkpoint do WAL
+    db.close()
+    sys.exit(exit_code)
 
 
 if __name__ == "__main__":
+    # No executável do PyInstaller, os processos da simulação (spawn) reexecutam este arquivo: freeze_support
+    # os desvia para o worker antes de abrir janela, agendador e gravação
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -0,0 +1,285 @@
+import sqlite3
+from database.db_handler import NO_FAILURE, IS_FAILURE, ISO_DATETIME
+from database.federation import merge_partials, ratio_rows
+from utils.tracing import traced
+
+
+# Expressão do balde de agrupamento; semana começa na segunda-feira
+GRANULARITIES = {
+    'month': "strftime('%Y-%m', Data)",
+    'week': "date(Data, '-6 days', 'weekday 1')",
+    'day': "date(Data)",
+}
+
+
+# Posição dentro do ano usada para sobrepor anos diferentes no mesmo eixo
+ALIGNMENTS = {
+    'month': "CAST(strftime('%m', Data) AS INTEGER)",
+    'week': "CAST(strftime('%W', Data) AS INTEGER)",
+    'day': "CAST(strftime('%j', Data) AS INTEGER)",
+}
+
+
+# Linhas de uma tabela marcadas como outlier na carga (services.ingest) e ainda não liberadas;
+# a subconsulta usa ix_quarentena_tabela_chave e o SQLite a materializa uma vez por consulta
+QUARANTINED_KEYS = "SELECT chave FROM quarentena WHERE tabela = ? AND chave IS NOT NULL AND liberado = 0"
+# Mesma subconsulta, vazia e com o mesmo parâmetro, para bancos de planta sem a tabela quarentena
+NO_QUARANTINED_KEYS = "SELECT NULL WHERE 0 AND ? IS NOT NULL"
+
+OUTLIER_MODES = ('incluir', 'excluir')
+
+
+def build_date_filter(start=None, end=None, quarantined=None):
+    # Intervalo semiaberto [start, end) comparando a coluna crua: o predicado usa o índice em Data,
+    # ao contrário de strftime(Data) = ?. Com quarantined (nome da tabela), descarta as linhas em quarentena
+    where = " WHERE 1=1"
+    params = []
+    if start:
+        where += " AND Data >= ?"
+        params.append(start)
+    if end:
+        where += " AND Data < ?"
+        params.append(end)
+    if quarantined:
+        where += f" AND ID NOT IN ({QUARANTINED_KEYS})"
+        params.append(quarantined)
+    return where, params
+
+
+def quarantine_table(table, outliers):
+    # Modo de outliers das séries: 'incluir' (padrão) soma todas as linhas; 'excluir' descarta as em quarentena
+    if outliers not in OUTLIER_MODES:
+        raise ValueError(f"Modo de outliers desconhecido: {outliers}")
+    return table if outliers == 'excluir' else None
+
+
+def bucket_expression(granularity):
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Granularidade desconhecida: {granularity}")
+    return GRANULARITIES[granularity]
+
+
+class AggregateService:
+    # Agregados usados pelos dashboards, sem dependência de Qt: a GUI e a API HTTP consomem os mesmos métodos
+    def __init__(self, db_handler):
+        self.db_handler = db_handler
+
+    def query_plants(self, query, params, plant=None):
+        # Sem planta selecionada consulta todas em paralelo e o consolidado é feito por merge_partials
+        sources = [plant] if plant else None
+        if QUARANTINED_KEYS not in query:
+            return self.db_handler.query_sources(query, params, sources)
+        # Planta sem a tabela quarentena não tem linhas em quarentena: em vez de falhar e sumir do consolidado,
+        # recebe a consulta com a subconsulta vazia
+        results = {}
+        for has_table, names in self.split_by_table('quarentena', sources or self.db_handler.source_names()):
+            if names:
+                variant = query if has_table else query.replace(QUARANTINED_KEYS, NO_QUARANTINED_KEYS)
+                results.update(self.db_handler.query_sources(variant, params, names))
+        return results
+
+    def split_by_table(self, table, sources):
+        found, missing = [], []
+        for source in sources:
+            try:
+                exists = self.db_handler.has_table(table, source)
+            except (sqlite3.Error, KeyError):
+                # Planta inacessível: a consulta normal registra o erro em _safe_query
+                exists = True
+            (found if exists else missing).append(source)
+        return (True, found), (False, missing)
+
+    def data_versions(self, tables, plant=None):
+        # Versão de cada tabela em cada planta consultada; muda a cada escrita (triggers de table_versions)
+        sources = [plant] if plant else self.db_handler.source_names()
+        versions = {}
+        for source in sources:
+            try:
+                source_versions = self.db_handler.table_versions(tables, source)
+            except sqlite3.Error:
+                # Banco de planta sem table_versions: não há como validar cache para esta consulta
+                return None
+            for table, version in source_versions.items():
+                versions[f"{source}:{table}"] = version
+        return versions
+
+    @traced('service.date_bounds', 'data')
+    def date_bounds(self, tables=('ProducaoSoja', 'FareloSojaTostado'), plant=None):
+        # Um MIN e um MAX por subconsulta: cada um vira uma única busca no índice de Data,
+        # enquanto SELECT MIN(Data), MAX(Data) juntos obrigaria a varrer a tabela
+        query = " UNION ALL ".join(
+            f"SELECT (SELECT MIN(Data) FROM {table}), (SELECT MAX(Data) FROM {table})" for table in tables)
+        bounds = [row for rows in self.query_plants(query, (), plant).values() for row in rows]
+        starts = [row[0] for row in bounds if row[0]]
+        ends = [row[1] for row in bounds if row[1]]
+        if not starts:
+            return None, None
+        return min(starts)[:10], max(ends)[:10]
+
+    @traced('service.production_series', 'data')
+    def production_series(self, start=None, end=None, plant=None, granularity='month', outliers='incluir'):
+        where, params = build_date_filter(start, end, quarantine_table('ProducaoSoja', outliers))
+        query = f"""
+            SELECT {bucket_expression(granularity)} as Periodo, SUM(ProducaoDiaria) as Total
+            FROM ProducaoSoja
+            {where}
+            GROUP BY Periodo ORDER BY Periodo
+        """
+        return merge_partials(self.query_plants(query, params, plant))
+
+    @traced('service.farelo_moisture_series', 'data')
+    def farelo_moisture_series(self, start=None, end=None, plant=None, granularity='month', outliers='incluir'):
+        where, params = build_date_filter(start, end, quarantine_table('FareloSojaTostado', outliers))
+        query = f"""
+            SELECT {bucket_expression(granularity)} as Periodo, SUM(UmidadeFarelo), COUNT(UmidadeFarelo)
+            FROM FareloSojaTostado
+            {where}
+            GROUP BY Periodo ORDER BY Periodo
+        """
+        return ratio_rows(merge_partials(self.query_plants(query, params, plant)))
+
+    # Comparação entre anos: uma única consulta agrupada por (ano, posição no ano) cobre todos os anos pedidos,
+    # em vez de uma consulta por ano. O intervalo [1º de janeiro do primeiro, 1º de janeiro após o último)
+    # usa o índice de Data; anos fora da lista dentro do intervalo são descartados pelo IN
+
+    def comparison_filter(self, years, alignment, quarantined=None):
+        if alignment not in ALIGNMENTS:
+            raise ValueError(f"Alinhamento desconhecido: {alignment}")
+        years = sorted({int(year) for year in years})
+        where, params = build_date_filter(f"{years[0]:04d}-01-01", f"{years[-1] + 1:04d}-01-01", quarantined)
+        where += f" AND strftime('%Y', Data) IN ({', '.join('?' for _ in years)})"
+        return where, params + [f"{year:04d}" for year in years]
+
+    @traced('service.production_comparison', 'data')
+    def production_comparison(self, years, plant=None, alignment='month', outliers='incluir'):
+        # [(ano, posição, total)]
+        where, params = self.comparison_filter(years, alignment, quarantine_table('ProducaoSoja', outliers))
+        query = f"""
+            SELECT CAST(strftime('%Y', Data) AS INTEGER) AS Ano, {ALIGNMENTS[alignment]} AS Posicao,
+                   SUM(ProducaoDiaria)
+            FROM ProducaoSoja
+            {where}
+            GROUP BY Ano, Posicao ORDER BY Ano, Posicao
+        """
+        return merge_partials(self.query_plants(query, params, plant), key_size=2)
+
+    @traced('service.farelo_moisture_comparison', 'data')
+    def farelo_moisture_comparison(self, years, plant=None, alignment='month', outliers='incluir'):
+        # [(ano, posição, umidade média)]
+        where, params = self.comparison_filter(years, alignment, quarantine_table('FareloSojaTostado', outliers))
+        query = f"""
+            SELECT CAST(strftime('%Y', Data) AS INTEGER) AS Ano, {ALIGNMENTS[alignment]} AS Posicao,
+                   SUM(UmidadeFarelo), COUNT(UmidadeFarelo)
+            FROM FareloSojaTostado
+            {where}
+            GROUP BY Ano, Posicao ORDER BY Ano, Posicao
+        """
+        return ratio_rows(merge_partials(self.query_plants(query, params, plant), key_size=2), key_size=2)
+
+    @traced('service.farelo_quality_series', 'data')
+    def farelo_quality_series(self, start=None, end=None, plant=None, granularity='month'):
+        where, params = build_date_filter(start, end)
+        query = f"""
+            SELECT {bucket_expression(granularity)} as Periodo,
+                   SUM(UmidadeFarelo), SUM(ProteinaBrutaFarelo), SUM(GorduraFarelo), COUNT(*)
+            FROM FareloSojaTostado
+            {where}
+            GROUP BY Periodo ORDER BY Periodo
+        """
+        rows = merge_partials(self.query_plants(query, params, plant))
+        return [(periodo, umidade / count, proteina / count, gordura / count)
+                for periodo, umidade, proteina, gordura, count in rows if count]
+
+    @traced('service.flagged_periods', 'data')
+    def flagged_periods(self, table, start=None, end=None, plant=None, granularity='month'):
+        # [(período, linhas em quarentena)] para destacar nos gráficos os períodos com outliers não liberados
+        where, params = build_date_filter(start, end)
+        query = f"""
+            SELECT {bucket_expression(granularity)} as Periodo, COUNT(*)
+            FROM {table}
+            {where} AND ID IN ({QUARANTINED_KEYS})
+            GROUP BY Periodo ORDER BY Periodo
+        """
+        return merge_partials(self.query_plants(query, params + [table], plant))
+
+    # Consultas de manutenção leem os contadores mantidos por triggers (falhas_por_tag/falhas_por_tipo):
+    # custo proporcional ao número de TAGs e tipos de falha, não ao histórico de TabelaTeste
+
+    @traced('service.maintenance_kpis', 'data')
+    def maintenance_kpis(self):
+        row = self.db_handler.read("""
+            SELECT COUNT(CASE WHEN TAG <> '' THEN 1 END), COUNT(CASE WHEN abertas > 0 AND TAG <> '' THEN 1 END),
+                   SUM(falhas)
+            FROM falhas_por_tag
+        """)[0]
+        return {
+            "total_equipamentos": row[0] or 0,
+            "equipamentos_em_manutencao": row[1] or 0,
+            "quantidade_falhas": row[2] or 0,
+        }
+
+    @traced('service.failures_by_tag', 'data')
+    def failures_by_tag(self):
+        return self.db_handler.read("""
+            SELECT TAG, falhas FROM falhas_por_tag
+            WHERE falhas > 0 AND TAG <> ''
+            ORDER BY TAG
+        """)
+
+    @traced('service.failure_distribution', 'data')
+    def failure_distribution(self):
+        return self.db_handler.read("SELECT Falha, quantidade FROM falhas_por_tipo ORDER BY quantidade DESC, Falha")
+
+    # Pareto: [(nome, quantidade, acumulado, % acumulado)] em ordem decrescente, com o acumulado
+    # calculado por funções de janela no próprio SQLite
+
+    @traced('service.failure_pareto', 'data')
+    def failure_pareto(self):
+        # Tipos de falha, a partir dos contadores de falhas_por_tipo
+        return self.db_handler.read(f"""
+            SELECT Falha, quantidade,
+                   SUM(quantidade) OVER ranking AS acumulado,
+                   100.0 * SUM(quantidade) OVER ranking / SUM(quantidade) OVER () AS percentual
+            FROM falhas_por_tipo
+            WHERE Falha <> '{NO_FAILURE}'
+            WINDOW ranking AS (ORDER BY quantidade DESC, Falha ROWS UNBOUNDED PRECEDING)
+            ORDER BY quantidade DESC, Falha
+        """)
+
+    @traced('service.failure_pareto_tags', 'data')
+    def failure_pareto_tags(self, falha=None):
+        # TAGs de um tipo de falha: agregação só sobre a faixa de ix_tabelateste_falha_tag daquela falha.
+        # Sem falha, TAGs com qualquer falha, a partir dos contadores de falhas_por_tag
+        if falha is None:
+            return self.db_handler.read("""
+                SELECT TAG, falhas,
+                       SUM(falhas) OVER ranking AS acumulado,
+                       100.0 * SUM(falhas) OVER ranking / SUM(falhas) OVER () AS percentual
+                FROM falhas_por_tag
+                WHERE falhas > 0 AND TAG <> ''
+                WINDOW ranking AS (ORDER BY falhas DESC, TAG ROWS UNBOUNDED PRECEDING)
+                ORDER BY falhas DESC, TAG
+            """)
+        return self.db_handler.read("""
+            SELECT TAG, COUNT(*) AS quantidade,
+                   SUM(COUNT(*)) OVER ranking AS acumulado,
+                   100.0 * SUM(COUNT(*)) OVER ranking / SUM(COUNT(*)) OVER () AS percentual
+            FROM TabelaTeste
+            WHERE Falha = ? AND TAG IS NOT NULL AND TAG <> ''
+            GROUP BY TAG
+            WINDOW ranking AS (ORDER BY COUNT(*) DESC, TAG ROWS UNBOUNDED PRECEDING)
+            ORDER BY quantidade DESC, TAG
+        """, (falha,))
+
+    @traced('service.failure_orders', 'data')
+    def failure_orders(self, tag, falha=None, limit=200):
+        # Ordens de uma TAG (com uma falha ou com qualquer falha), mais recentes primeiro
+        where = "Falha = ?" if falha is not None else IS_FAILURE.format(row='TabelaTeste') + " = 1"
+        params = (falha, tag) if falha is not None else (tag,)
+        return self.db_handler.read(f"""
+            SELECT DataInicial, DataFinal, Tipo, Falha, Horímetro, Operador, Descrição
+            FROM TabelaTeste
+            WHERE {where} AND TAG = ?
+            ORDER BY {ISO_DATETIME.format(column='DataInicial')} DESC
+            LIMIT ?
+        """, (*params, limit))
@@ -0,0 +1,248 @@
+import argparse
+import threading
+import time
+import numpy as np
+from analytics.alarms import AlarmEngine, AlarmRule
+from services.predictive_maintenance import local_now
+from utils.tracing import span
+
+POLL_INTERVAL = 5.0
+BATCH_SIZE = 50000
+
+RULE_COLUMNS = ('id', 'nome', 'tabela', 'metrica', 'tipo', 'limite_inferior', 'limite_superior',
+                'histerese', 'duracao', 'valor_estado', 'severidade', 'chave')
+
+# Regras iniciais, gravadas só quando regras_alarme está vazia; depois são editadas na própria tabela
+DEFAULT_RULES = (
+    ('Umidade do farelo fora de especificação', 'FareloSojaTostado', 'UmidadeFarelo', 'limite',
+     8.5, 12.5, 0.2, 0, None, 'alta'),
+    ('Variação brusca da umidade do farelo', 'FareloSojaTostado', 'UmidadeFarelo', 'taxa',
+     -0.05, 0.05, 0.01, 0, None, 'media'),
+    ('Umidade da soja acima do limite de armazenagem', 'ProducaoSoja', 'UmidadeSoja', 'limite',
+     None, 13.5, 0.3, 0, None, 'media'),
+    ('Impurezas da soja acima do limite', 'ProducaoSoja', 'ImpurezasSoja', 'limite',
+     None, 2.0, 0.2, 0, None, 'baixa'),
+    ('Máquina parada por mais de 30 minutos', 'maquinas', 'status', 'estado',
+     None, None, 0, 1800, 'Parada', 'alta'),
+)
+
+# Tabelas de medições: coluna de tempo e coluna de chave (None = a própria métrica é a chave)
+MEASUREMENT_TABLES = {
+    'ProducaoSoja': ('Data', None),
+    'FareloSojaTostado': ('Data', None),
+}
+
+
+def to_seconds(texts):
+    # 'AAAA-MM-DD' ou 'AAAA-MM-DD HH:MM:SS' -> segundos desde a época, vetorizado; valores malformados viram NaN
+    try:
+        stamps = np.array([text[:19].replace(' ', 'T') for text in texts], dtype='datetime64[s]')
+    except (TypeError, ValueError):
+        stamps = np.array([parse_stamp(text) for text in texts], dtype='datetime64[s]')
+    return np.where(np.isnat(stamps), np.nan, stamps.astype(np.int64).astype(float))
+
+
+def parse_stamp(text):
+    try:
+        return np.datetime64(text[:19].replace(' ', 'T'), 's')
+    except (TypeError, ValueError):
+        return np.datetime64('NaT')
+
+
+def to_floats(values):
+    # Medições numéricas; texto não numérico vira NaN em vez de derrubar o lote
+    try:
+        return np.array(values, dtype=float)
+    except (TypeError, ValueError):
+        return np.array([parse_float(value) for value in values], dtype=float)
+
+
+def parse_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def to_text(seconds):
+    # Inverso de to_seconds: segundos de hora local sem fuso -> 'AAAA-MM-DD HH:MM:SS'
+    return str(np.datetime64(int(seconds), 's')).replace('T', ' ')
+
+
+class AlarmMonitor:
+    # Lê só as linhas novas de cada tabela (marca por rowid), avalia o lote no AlarmEngine e grava
+    # disparos/normalizações em uma única transação. A primeira execução faz o backfill do histórico
+    def __init__(self, db_handler, poll_interval=POLL_INTERVAL, batch_size=BATCH_SIZE):
+        self.db_handler = db_handler
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.engine = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def ensure_default_rules(self):
+        if self.db_handler.read("SELECT COUNT(*) FROM regras_alarme")[0][0]:
+            return
+        columns = RULE_COLUMNS[1:len(DEFAULT_RULES[0]) + 1]
+        self.db_handler.write_many(f"""
+            INSERT INTO regras_alarme ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})
+        """, DEFAULT_RULES).result()
+
+    def load_rules(self):
+        self.ensure_default_rules()
+        rows = self.db_handler.read(f"SELECT {', '.join(RULE_COLUMNS)} FROM regras_alarme WHERE ativa = 1")
+        engine = AlarmEngine(AlarmRule.from_row(row) for row in rows)
+        for rule_id, key, started in self.db_handler.read(
+                "SELECT regra_id, chave, inicio FROM alarmes WHERE fim IS NULL"):
+            if rule_id in engine.rules:
+                engine.restore_open(rule_id, key, to_seconds([started])[0])
+        self.engine = engine
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='alarm-monitor', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Erro ao avaliar alarmes: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def poll(self):
+        with self._lock:
+            if self.engine is None:
+                self.load_rules()
+            raised = 0
+            for table in MEASUREMENT_TABLES:
+                if self.engine.metrics(table):
+                    raised += self.poll_table(table)
+            if self.engine.metrics('maquinas'):
+                raised += self.poll_machines()
+            return raised
+
+    def poll_table(self, table):
+        time_column, key_column = MEASUREMENT_TABLES[table]
+        metrics = self.engine.metrics(table)
+        rows = self.db_handler.read("SELECT ultimo_rowid FROM alarmes_marcas WHERE tabela = ?", (table,))
+        last_rowid = rows[0][0] if rows else 0
+        total = 0
+        while True:
+            columns = [time_column] + ([key_column] if key_column else []) + metrics
+            batch = self.db_handler.read(
+                f"SELECT rowid, {', '.join(columns)} FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                (last_rowid, self.batch_size))
+            if not batch:
+                return total
+            with span('alarms.batch', 'data', table=table, rows=len(batch)):
+                rowids, *data = zip(*batch)
+                times = to_seconds(data[0])
+                # Linhas com data inválida ficam de fora, mas a marca avança: o lote não é relido para sempre
+                valid = ~np.isnan(times)
+                if not valid.all():
+                    print(f"Alarmes: {np.count_nonzero(~valid)} linha(s) de {table} "
+                          f"com {time_column} inválida ignoradas")
+                times = times[valid]
+                offset = 2 if key_column else 1
+                events = []
+                for i, metric in enumerate(metrics):
+                    values = to_floats(data[offset + i])[valid]
+                    keys = np.asarray(data[1])[valid] if key_column else np.full(len(times), metric)
+                    events.extend(self.engine.evaluate(table, metric, keys, times, values))
+            last_rowid = rowids[-1]
+            total += self.store(events, table, last_rowid)
+
+    def poll_machines(self):
+        # maquinas guarda só o status atual: cada leitura é uma amostra no instante da consulta,
+        # e a regra de duração mede por quanto tempo o status se manteve
+        rows = self.db_handler.read("SELECT name, status FROM maquinas")
+        if not rows:
+            return 0
+        names, status = zip(*rows)
+        # Mesma convenção de Data e de paradas/maquinas: hora local sem fuso, tratada como UTC por to_text
+        now = float(int(local_now()))
+        events = self.engine.evaluate('maquinas', 'status', names, np.full(len(rows), now), np.array(status))
+        return self.store(events)
+
+    def store(self, events, table=None, last_rowid=None):
+        raises = []
+        statements = []
+        for moment, kind, rule, key, value in events:
+            stamp = to_text(moment)
+            if kind == 'disparo':
+                shown = value if isinstance(value, str) else f"{value:.2f}"
+                message = f"{rule.nome}: {key} = {shown}"
+                statements.append(("""
+                    INSERT OR IGNORE INTO alarmes (regra_id, chave, inicio, valor, mensagem, severidade)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (rule.id, str(key), stamp, str(value), message, rule.severidade)))
+                raises.append(rule.id)
+            else:
+                statements.append(("UPDATE alarmes SET fim = ? WHERE regra_id = ? AND chave = ? AND fim IS NULL",
+                                   (stamp, rule.id, str(key))))
+        if table is not None:
+            statements.append(("""
+                INSERT INTO alarmes_marcas (tabela, ultimo_rowid) VALUES (?, ?)
+                ON CONFLICT(tabela) DO UPDATE SET ultimo_rowid = excluded.ultimo_rowid
+            """, (table, int(last_rowid))))
+        if not statements:
+            return 0
+
+        def apply(conn):
+            for sql, params in statements:
+                conn.execute(sql, params)
+        # Eventos e a nova marca na mesma transação: um lote nunca é aplicado pela metade
+        self.db_handler.write_call(apply).result()
+        return len(raises)
+
+
+def benchmark(rows=1_000_000, keys=200):
+    rng = np.random.default_rng(7)
+    rules = [
+        AlarmRule(1, 'limite', 'bench', 'valor', 'limite', 8.5, 12.5, 0.2),
+        AlarmRule(2, 'taxa', 'bench', 'valor', 'taxa', -30.0, 30.0, 5.0),
+        AlarmRule(3, 'duração', 'bench', 'valor', 'limite', None, 12.0, 0.1, 600),
+    ]
+    engine = AlarmEngine(rules)
+    names = np.array([f"TAG-{i:03d}" for i in range(keys)])
+    key_index = rng.integers(0, keys, rows)
+    times = np.sort(rng.uniform(0, 30 * 86400, rows))
+    values = 10.5 + np.cumsum(rng.normal(0, 0.05, rows)) % 4 - 1
+    start = time.perf_counter()
+    events = 0
+    for chunk in range(0, rows, BATCH_SIZE):
+        part = slice(chunk, chunk + BATCH_SIZE)
+        events += len(engine.evaluate('bench', 'valor', names[key_index[part]], times[part], values[part]))
+    elapsed = time.perf_counter() - start
+    print(f"{rows} medições, {len(rules)} regras, {keys} chaves: {elapsed:.2f} s "
+          f"({rows / elapsed:,.0f} medições/s), {events} eventos")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monitor de alarmes do MESalpha")
+    parser.add_argument('--db', default='mesalpha.db')
+    parser.add_argument('--benchmark', action='store_true', help="Mede a vazão do motor com dados sintéticos")
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark()
+        return
+
+    from database.db_handler import DatabaseHandler
+    db = DatabaseHandler(args.db)
+    monitor = AlarmMonitor(db)
+    print(f"Backfill: {monitor.poll()} alarmes disparados")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
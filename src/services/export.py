@@ -0,0 +1,159 @@
+import csv
+import os
+from services.aggregates import build_date_filter
+from utils.tracing import span
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+CHUNK_SIZE = 5000
+XLSX_MAX_ROWS = 1048576
+FORMATS = {
+    'csv': "CSV (*.csv)",
+    'xlsx': "Excel (*.xlsx)",
+}
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def xlsx_available():
+    return xlsxwriter is not None or openpyxl is not None
+
+
+class _CsvSink:
+    def __init__(self, file_path):
+        # utf-8-sig e ';' para o Excel em português abrir o arquivo com acentos e colunas corretas
+        self.file = open(file_path, 'w', newline='', encoding='utf-8-sig')
+        self.writer = csv.writer(self.file, delimiter=';')
+
+    def write_header(self, columns):
+        self.writer.writerow(columns)
+
+    def write_rows(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class _XlsxSink:
+    # Excel tem limite de linhas por planilha; exportações maiores continuam em novas abas
+    def __init__(self, file_path, sheet_name):
+        self.sheet_name = sheet_name[:28]
+        self.columns = []
+        self.sheet_count = 0
+        self.row = 0
+        if xlsxwriter is not None:
+            # constant_memory grava cada linha no disco assim que a próxima começa
+            self.workbook = xlsxwriter.Workbook(file_path, {'constant_memory': True, 'strings_to_numbers': False})
+        else:
+            self.workbook = openpyxl.Workbook(write_only=True)
+            self.file_path = file_path
+        self.sheet = None
+
+    def _new_sheet(self):
+        self.sheet_count += 1
+        name = self.sheet_name if self.sheet_count == 1 else f"{self.sheet_name} {self.sheet_count}"
+        if xlsxwriter is not None:
+            self.sheet = self.workbook.add_worksheet(name)
+            self.sheet.write_row(0, 0, self.columns)
+        else:
+            self.sheet = self.workbook.create_sheet(name)
+            self.sheet.append(self.columns)
+        self.row = 1
+
+    def write_header(self, columns):
+        self.columns = list(columns)
+        self._new_sheet()
+
+    def write_rows(self, rows):
+        for values in rows:
+            if self.row >= XLSX_MAX_ROWS:
+                self._new_sheet()
+            if xlsxwriter is not None:
+                self.sheet.write_row(self.row, 0, values)
+            else:
+                self.sheet.append(values)
+            self.row += 1
+
+    def close(self):
+        if xlsxwriter is not None:
+            self.workbook.close()
+        else:
+            self.workbook.save(self.file_path)
+
+
+def open_sink(file_path, file_format, sheet_name):
+    if file_format == 'csv':
+        return _CsvSink(file_path)
+    if file_format == 'xlsx':
+        if not xlsx_available():
+            raise RuntimeError("Exportação para Excel requer o pacote xlsxwriter ou openpyxl")
+        return _XlsxSink(file_path, sheet_name)
+    raise ValueError(f"Formato de exportação desconhecido: {file_format}")
+
+
+def table_dataset(db_handler, table, plant=None, start=None, end=None, order_by='Data'):
+    where, params = build_date_filter(start, end) if order_by == 'Data' else ("", [])
+    return {
+        'name': table,
+        'query': f"SELECT * FROM {table}{where} ORDER BY {order_by}",
+        'params': tuple(params),
+        'sources': [plant] if plant else db_handler.source_names(),
+    }
+
+
+def count_rows(db_handler, dataset):
+    query = f"SELECT COUNT(*) FROM ({dataset['query']})"
+    return sum(db_handler.read(query, dataset['params'], source)[0][0] for source in dataset['sources'])
+
+
+def export_dataset(db_handler, dataset, file_path, file_format, progress=None, cancel_event=None,
+                   chunk_size=CHUNK_SIZE):
+    # dataset: {'name', 'query', 'params', 'sources'}; linhas vão do cursor direto para o arquivo em blocos,
+    # então a memória usada não depende do tamanho da exportação
+    total = count_rows(db_handler, dataset)
+    if progress:
+        progress(0, total)
+
+    # Grava em arquivo temporário e só substitui o destino ao final: cancelamento não deixa arquivo pela metade
+    partial_path = file_path + '.part'
+    sink = open_sink(partial_path, file_format, dataset['name'])
+    sources = dataset['sources']
+    tag_source = len(sources) > 1
+    written = 0
+    try:
+        with span('export.dataset', 'export', dataset=dataset['name'], format=file_format):
+            for index, source in enumerate(sources):
+                columns, chunks = db_handler.stream(dataset['query'], dataset['params'], source, chunk_size)
+                if index == 0:
+                    sink.write_header(['Planta'] + columns if tag_source else columns)
+                for rows in chunks:
+                    if cancel_event is not None and cancel_event.is_set():
+                        chunks.close()
+                        raise ExportCancelled()
+                    if tag_source:
+                        rows = [(source,) + tuple(row) for row in rows]
+                    sink.write_rows(rows)
+                    written += len(rows)
+                    if progress:
+                        progress(written, max(total, written))
+        sink.close()
+    except BaseException:
+        try:
+            sink.close()
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+        raise
+    os.replace(partial_path, file_path)
+    return written
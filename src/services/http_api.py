@@ -0,0 +1,304 @@
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+from urllib.parse import urlsplit, parse_qs
+from database.db_handler import LOCAL_SOURCE
+from services.aggregates import AggregateService, GRANULARITIES, OUTLIER_MODES
+from services.live_stream import LiveKpiBroadcaster
+from utils.tracing import span
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+GZIP_MIN_SIZE = 1024
+MAX_CACHED_RESULTS = 256
+STATUS_TEXT = {
+    200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+    405: 'Method Not Allowed', 406: 'Not Acceptable', 500: 'Internal Server Error',
+}
+
+# start inclusivo e end exclusivo (AAAA-MM-DD ou AAAA-MM-DD HH:MM:SS); granularity: month, week ou day
+SERIES_PARAMS = ('start', 'end', 'plant', 'granularity')
+# outliers: incluir (padrão) ou excluir as linhas em quarentena (services.ingest)
+FILTERED_SERIES_PARAMS = SERIES_PARAMS + ('outliers',)
+
+# Rota -> (método do AggregateService, tabelas das quais depende, colunas, parâmetros aceitos)
+ROUTES = {
+    '/api/soja/mensal': (
+        'production_series', ('ProducaoSoja', 'quarentena'), ('periodo', 'total'), FILTERED_SERIES_PARAMS),
+    '/api/farelo/umidade': (
+        'farelo_moisture_series', ('FareloSojaTostado', 'quarentena'), ('periodo', 'umidade'),
+        FILTERED_SERIES_PARAMS),
+    '/api/farelo/qualidade': (
+        'farelo_quality_series', ('FareloSojaTostado',), ('periodo', 'umidade', 'proteina', 'gordura'),
+        SERIES_PARAMS),
+    '/api/manutencao/falhas': (
+        'failures_by_tag', ('TabelaTeste',), ('tag', 'falhas'), ()),
+    '/api/manutencao/distribuicao': (
+        'failure_distribution', ('TabelaTeste',), ('falha', 'quantidade'), ()),
+    '/api/manutencao/pareto': (
+        'failure_pareto', ('TabelaTeste',), ('falha', 'quantidade', 'acumulado', 'percentual'), ()),
+    '/api/manutencao/pareto/tags': (
+        'failure_pareto_tags', ('TabelaTeste',), ('tag', 'quantidade', 'acumulado', 'percentual'), ('falha',)),
+}
+
+
+class BadRequest(Exception):
+    pass
+
+
+class ApiServer:
+    # Servidor HTTP local somente leitura sobre o AggregateService; consultas rodam em threads
+    # para não bloquear o loop, e requisições idênticas simultâneas compartilham uma só consulta
+    def __init__(self, db_handler, host='127.0.0.1', port=8765):
+        self.db_handler = db_handler
+        self.service = AggregateService(db_handler)
+        self.live = LiveKpiBroadcaster(db_handler)
+        self.host = host
+        self.port = port
+        self.server = None
+        self._inflight = {}
+        self._results = {}
+        self.stats = {'requests': 0, 'not_modified': 0, 'cache_hits': 0, 'coalesced': 0, 'queries': 0}
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port, backlog=1024)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+    async def serve_forever(self):
+        await self.start()
+        print(f"API de dashboards em http://{self.host}:{self.port}")
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                except BadRequest as e:
+                    # Cabeçalho inválido: o restante do fluxo não é confiável, responde e encerra a conexão
+                    self.write_response(writer, *self.error(400, str(e)), keep_alive=False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, target, headers = request
+                if method == 'GET' and urlsplit(target).path == '/api/stream':
+                    # Server-Sent Events: a conexão fica com o broadcaster até o cliente sair ou ser derrubado
+                    await self.live.serve(writer)
+                    break
+                try:
+                    status, response_headers, body = await self.dispatch(method, target, headers)
+                except Exception as e:
+                    print(f"Erro ao atender {target}: {e}")
+                    status, response_headers, body = self.error(500, "Erro interno ao consultar os dados")
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                self.write_response(writer, status, response_headers, body, keep_alive, method == 'HEAD')
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+        try:
+            method, target, _version = request_line.decode('latin-1').split()
+        except ValueError:
+            return None
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        # Só há rotas GET; um eventual corpo é descartado para não corromper a próxima requisição
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise BadRequest("Content-Length inválido")
+        if length:
+            await reader.readexactly(length)
+        return method, target, headers
+
+    def write_response(self, writer, status, headers, body, keep_alive, head_only=False):
+        headers = dict(headers)
+        headers['Content-Length'] = str(len(body))
+        headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT[status]}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1'))
+        if body and not head_only:
+            writer.write(body)
+
+    async def dispatch(self, method, target, headers):
+        self.stats['requests'] += 1
+        if method not in ('GET', 'HEAD'):
+            return self.error(405, "Método não suportado")
+        url = urlsplit(target)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        loop = asyncio.get_running_loop()
+
+        if url.path == '/api/versions':
+            versions = await loop.run_in_executor(None, self.db_handler.table_versions)
+            return self.encode(200, {'versions': versions}, headers)
+        if url.path == '/api/manutencao/kpis':
+            key = (url.path,)
+            versions = await loop.run_in_executor(None, self.service.data_versions, ('TabelaTeste',), LOCAL_SOURCE)
+            matched = self.not_modified(key, versions, headers)
+            if matched:
+                return 304, {'ETag': matched, 'Cache-Control': 'no-cache'}, b''
+            etag, kpis = await self.fetch(key, self.service.maintenance_kpis, {}, versions)
+            return self.encode(200, kpis, headers, etag=etag)
+        if url.path not in ROUTES:
+            return self.error(404, "Rota não encontrada")
+
+        method_name, tables, columns, accepted = ROUTES[url.path]
+        output_format = params.pop('format', 'json')
+        if output_format not in ('json', 'arrow'):
+            return self.error(400, "Formato inválido: use json ou arrow")
+        if output_format == 'arrow' and pa is None:
+            return self.error(406, "Formato Arrow indisponível: pyarrow não está instalado")
+        unknown = set(params) - set(accepted)
+        if unknown:
+            return self.error(400, f"Parâmetros não suportados: {', '.join(sorted(unknown))}")
+        if params.get('granularity', 'month') not in GRANULARITIES:
+            return self.error(400, f"Granularidade inválida: use {', '.join(GRANULARITIES)}")
+        if params.get('outliers', 'incluir') not in OUTLIER_MODES:
+            return self.error(400, f"Modo de outliers inválido: use {', '.join(OUTLIER_MODES)}")
+
+        # Manutenção só existe no banco local; agregados de produção aceitam planta ou consolidado
+        plant = params.get('plant') if 'plant' in accepted else LOCAL_SOURCE
+        if plant and plant not in self.db_handler.source_names():
+            return self.error(404, f"Planta desconhecida: {plant}")
+
+        # ETag validado antes de qualquer consulta: versões das tabelas são uma leitura de poucas linhas
+        key = (url.path, tuple(sorted(params.items())), output_format)
+        versions = await loop.run_in_executor(None, self.service.data_versions, tables, plant)
+        matched = self.not_modified(key, versions, headers)
+        if matched:
+            return 304, {'ETag': matched, 'Cache-Control': 'no-cache'}, b''
+
+        func = getattr(self.service, method_name)
+        etag, rows = await self.fetch(key, func, params, versions)
+        if output_format == 'arrow':
+            return self.encode_arrow(rows, columns, etag)
+        payload = {'columns': list(columns), 'rows': [list(row) for row in rows]}
+        return self.encode(200, payload, headers, etag=etag)
+
+    async def fetch(self, key, func, params, versions):
+        loop = asyncio.get_running_loop()
+        etag = self.make_etag(key, versions)
+        cache_key = (key, etag)
+        if etag is not None and cache_key in self._results:
+            self.stats['cache_hits'] += 1
+            return etag, self._results[cache_key]
+
+        inflight = self._inflight.get(cache_key)
+        if inflight is not None:
+            self.stats['coalesced'] += 1
+            return etag, await asyncio.shield(inflight)
+
+        future = loop.run_in_executor(None, lambda: func(**params))
+        self._inflight[cache_key] = future
+        self.stats['queries'] += 1
+        try:
+            result = await future
+        finally:
+            self._inflight.pop(cache_key, None)
+        if etag is not None:
+            if len(self._results) >= MAX_CACHED_RESULTS:
+                self._results.pop(next(iter(self._results)))
+            self._results[cache_key] = result
+        return etag, result
+
+    def not_modified(self, key, versions, headers):
+        # Devolve a ETag (identidade ou gzip) que o cliente já tem, ou None
+        etag = self.make_etag(key, versions)
+        if etag is None:
+            return None
+        cached = self.parse_etags(headers.get('if-none-match', ''))
+        for variant in (etag, self.gzip_etag(etag)):
+            if variant in cached:
+                self.stats['not_modified'] += 1
+                return variant
+        return None
+
+    def make_etag(self, key, versions):
+        if versions is None:
+            return None
+        digest = hashlib.sha1(repr((key, sorted(versions.items()))).encode('utf-8'))
+        return f'"{digest.hexdigest()[:20]}"'
+
+    def gzip_etag(self, etag):
+        # Corpo comprimido é outra representação: ETag forte própria, senão caches trocariam uma pela outra
+        return etag[:-1] + '-gz"'
+
+    def parse_etags(self, header):
+        return {tag.strip().removeprefix('W/') for tag in header.split(',') if tag.strip()}
+
+    def encode(self, status, payload, request_headers, etag=None):
+        with span('api.encode_json', 'api'):
+            body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+            headers = {'Content-Type': 'application/json; charset=utf-8', 'Vary': 'Accept-Encoding'}
+            if etag is not None:
+                headers['ETag'] = etag
+                headers['Cache-Control'] = 'no-cache'
+            if len(body) >= GZIP_MIN_SIZE and 'gzip' in request_headers.get('accept-encoding', ''):
+                body = gzip.compress(body, compresslevel=5)
+                headers['Content-Encoding'] = 'gzip'
+                if etag is not None:
+                    headers['ETag'] = self.gzip_etag(etag)
+        return status, headers, body
+
+    def encode_arrow(self, rows, columns, etag):
+        with span('api.encode_arrow', 'api'):
+            table = pa.table({name: [row[i] for row in rows] for i, name in enumerate(columns)})
+            sink = pa.BufferOutputStream()
+            with pa.ipc.new_stream(sink, table.schema) as stream:
+                stream.write_table(table)
+            body = sink.getvalue().to_pybytes()
+        headers = {'Content-Type': 'application/vnd.apache.arrow.stream'}
+        if etag is not None:
+            headers['ETag'] = etag
+            headers['Cache-Control'] = 'no-cache'
+        return 200, headers, body
+
+    def error(self, status, message):
+        body = json.dumps({'erro': message}, ensure_ascii=False).encode('utf-8')
+        return status, {'Content-Type': 'application/json; charset=utf-8'}, body
+
+
+def main():
+    from database.db_handler import DatabaseHandler
+
+    parser = argparse.ArgumentParser(description="API HTTP local com os agregados dos dashboards")
+    parser.add_argument('--db', default='mesalpha.db')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    db = DatabaseHandler(args.db)
+    try:
+        asyncio.run(ApiServer(db, args.host, args.port).serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
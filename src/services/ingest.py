@@ -0,0 +1,265 @@
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from analytics.outliers import THRESHOLD, WINDOW, rolling_robust_z
+from services.aggregates import QUARANTINED_KEYS
+from utils.tracing import span, traced
+
+KEY = 'ID'
+DATE = 'Data'
+DATE_FORMAT = '%Y-%m-%d'
+CHUNK_ROWS = 500_000
+# Tabela -> coluna numérica -> (mínimo, máximo, MAD mínimo). Fora da faixa física a linha é rejeitada;
+# dentro dela, |z robusto| acima de THRESHOLD contra os últimos WINDOW registros marca outlier
+VALIDATION_RULES = {
+    'ProducaoSoja': {
+        'UmidadeSoja': (0.0, 40.0, 0.1),
+        'ProteinaBrutaSoja': (0.0, 60.0, 0.1),
+        'ImpurezasSoja': (0.0, 20.0, 0.2),
+        'ProducaoDiaria': (0.0, 5000.0, 1.0),
+        'ProducaoMensal': (0.0, 150000.0, 30.0),
+    },
+    'FareloSojaTostado': {
+        'UmidadeFarelo': (0.0, 30.0, 0.1),
+        'ProteinaBrutaFarelo': (0.0, 70.0, 0.1),
+        'GorduraFarelo': (0.0, 20.0, 0.05),
+    },
+}
+REJECTED = ('esquema', 'faixa', 'duplicada')
+OUTLIER = 'outlier'
+
+
+def table_columns(table):
+    return [KEY, DATE] + list(VALIDATION_RULES[table])
+
+
+def detect_table(columns):
+    # Tabela cujo conjunto de colunas está todo presente no cabeçalho
+    for table in VALIDATION_RULES:
+        if set(table_columns(table)) <= set(columns):
+            return table
+    raise ValueError(f"Cabeçalho não corresponde a nenhuma tabela: {', '.join(columns)}")
+
+
+class BatchValidator:
+    # Validação vetorizada de um lote de texto cru (DataFrame de str): conversão de tipos, faixas, chaves
+    # duplicadas no lote e outliers por z robusto em janela móvel, ordenada por Data e continuada a partir
+    # dos registros já gravados (os que estão em quarentena não entram na janela)
+    def __init__(self, db_handler, table):
+        if table not in VALIDATION_RULES:
+            raise ValueError(f"Tabela sem regras de validação: {table}")
+        self.db_handler = db_handler
+        self.table = table
+        self.rules = VALIDATION_RULES[table]
+
+    def history(self, before):
+        columns = list(self.rules)
+        rows = self.db_handler.read(f"""
+            SELECT {', '.join(columns)} FROM {self.table}
+            WHERE {DATE} < ? AND {KEY} NOT IN ({QUARANTINED_KEYS})
+            ORDER BY {DATE} DESC LIMIT {WINDOW}
+        """, (before, self.table))
+        rows.reverse()
+        return {column: np.array([row[i] for row in rows], dtype=np.float64) for i, column in enumerate(columns)}
+
+    def validate(self, raw):
+        # Devolve (linhas válidas como DataFrame tipado e ordenado por Data, registros de quarentena)
+        missing = [column for column in table_columns(self.table) if column not in raw.columns]
+        if missing:
+            raise ValueError(f"Colunas ausentes para {self.table}: {', '.join(missing)}")
+        raw = raw[table_columns(self.table)].reset_index(drop=True)
+        keys = pd.to_numeric(raw[KEY], errors='coerce')
+        dates = pd.to_datetime(raw[DATE].str.strip(), format=DATE_FORMAT, errors='coerce')
+        values = {column: pd.to_numeric(raw[column], errors='coerce').to_numpy(dtype=np.float64)
+                  for column in self.rules}
+        keys = keys.to_numpy(dtype=np.float64)
+
+        # Primeiro motivo de cada linha rejeitada e a coluna que o causou
+        reason = np.full(len(raw), '', dtype=object)
+        column_of = np.full(len(raw), '', dtype=object)
+
+        def reject(mask, label, column):
+            mask = mask & (reason == '')
+            reason[mask] = label
+            column_of[mask] = column
+
+        reject(np.isnan(keys) | (keys != np.floor(keys)), 'esquema', KEY)
+        reject(dates.isna().to_numpy(), 'esquema', DATE)
+        for column in self.rules:
+            reject(np.isnan(values[column]), 'esquema', column)
+        for column, (low, high, _min_mad) in self.rules.items():
+            with np.errstate(invalid='ignore'):
+                reject((values[column] < low) | (values[column] > high), 'faixa', column)
+        # Mesma chave repetida no lote: vale a última ocorrência
+        reject(pd.Series(keys).duplicated(keep='last').to_numpy() & ~np.isnan(keys), 'duplicada', KEY)
+
+        quarantine = []
+        rejected = np.flatnonzero(reason != '')
+        if len(rejected):
+            lines = raw.iloc[rejected].fillna('').astype(str).agg(','.join, axis=1).tolist()
+            # Rejeitadas não entram na tabela: chave fica NULL (a linha original guarda o ID informado)
+            for i, line in zip(rejected.tolist(), lines):
+                quarantine.append((self.table, None, column_of[i], str(raw.at[i, column_of[i]]), reason[i], None,
+                                   line))
+
+        valid = np.flatnonzero(reason == '')
+        order = valid[np.argsort(dates.to_numpy()[valid], kind='stable')]
+        frame = pd.DataFrame({KEY: keys[order].astype(np.int64), DATE: raw[DATE].str.strip().to_numpy()[order]})
+        for column in self.rules:
+            frame[column] = values[column][order]
+        if len(frame):
+            history = self.history(frame[DATE].iat[0])
+            for column, (_low, _high, min_mad) in self.rules.items():
+                scores = rolling_robust_z(frame[column].to_numpy(), history[column], min_mad=min_mad)
+                for i in np.flatnonzero(np.abs(scores) > THRESHOLD).tolist():
+                    quarantine.append((self.table, int(frame[KEY].iat[i]), column, f"{frame[column].iat[i]:g}",
+                                       OUTLIER, float(scores[i]), None))
+        return frame, quarantine
+
+
+@traced('ingest.batch', 'data')
+def ingest_frame(db_handler, table, raw, origin='manual'):
+    # Valida e grava um lote: válidas (inclusive outliers) em upsert na tabela, rejeitadas e outliers na quarentena,
+    # tudo numa transação. Regravar uma chave descarta a marcação de outlier anterior dela
+    with span('ingest.validate', 'data', rows=len(raw)):
+        frame, quarantine = BatchValidator(db_handler, table).validate(raw)
+    columns = table_columns(table)
+    assignments = ", ".join(f"{column} = excluded.{column}" for column in columns if column != KEY)
+    rows = list(zip(*(frame[column].tolist() for column in columns)))
+    keys = frame[KEY].to_numpy()
+    flagged = db_handler.read(
+        "SELECT DISTINCT chave FROM quarentena WHERE tabela = ? AND motivo = ? AND chave BETWEEN ? AND ?",
+        (table, OUTLIER, int(keys.min()), int(keys.max()))) if len(keys) else []
+    stale = [(table, key) for key in np.intersect1d([row[0] for row in flagged], keys).tolist()]
+
+    def write(conn):
+        conn.executemany("DELETE FROM quarentena WHERE tabela = ? AND chave = ? AND motivo = 'outlier'", stale)
+        conn.executemany(f"""
+            INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})
+            ON CONFLICT({KEY}) DO UPDATE SET {assignments}
+        """, rows)
+        conn.executemany("""
+            INSERT INTO quarentena (tabela, chave, coluna, valor, motivo, escore, linha, origem)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, [entry + (origin,) for entry in quarantine])
+    with span('ingest.write', 'data', rows=len(rows)):
+        db_handler.write_call(write).result()
+    rejected = sum(1 for entry in quarantine if entry[4] in REJECTED)
+    outliers = len({entry[1] for entry in quarantine if entry[4] == OUTLIER})
+    return {'gravadas': len(rows), 'rejeitadas': rejected, 'outliers': outliers}
+
+
+def ingest_records(db_handler, table, records, origin='manual'):
+    # Lançamentos manuais: lista de dicts coluna -> valor, validados como uma linha de CSV
+    raw = pd.DataFrame.from_records(records).astype(str)
+    return ingest_frame(db_handler, table, raw, origin)
+
+
+def ingest_csv(db_handler, path, table=None, chunk_rows=CHUNK_ROWS):
+    # Lê em blocos como texto (a conversão fica com a validação, para que um valor ruim rejeite só a sua linha)
+    totals = {'gravadas': 0, 'rejeitadas': 0, 'outliers': 0}
+    origin = os.path.basename(path)
+    for chunk in pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_rows):
+        chunk.columns = [column.strip() for column in chunk.columns]
+        table = table or detect_table(chunk.columns)
+        for name, count in ingest_frame(db_handler, table, chunk, origin).items():
+            totals[name] += count
+    return table, totals
+
+
+def quarantine_entries(db_handler, table=None, include_released=False, limit=200):
+    where, params = ["1=1"], []
+    if table:
+        where.append("tabela = ?")
+        params.append(table)
+    if not include_released:
+        where.append("liberado = 0")
+    return db_handler.read(f"""
+        SELECT id, tabela, chave, coluna, valor, motivo, escore, origem, criado_em, liberado
+        FROM quarentena WHERE {' AND '.join(where)} ORDER BY id DESC LIMIT {int(limit)}
+    """, tuple(params))
+
+
+def release(db_handler, entry_ids):
+    # Outlier confirmado como valor real: volta a contar nos dashboards
+    return db_handler.write_many("UPDATE quarentena SET liberado = 1 WHERE id = ?",
+                                 [(entry_id,) for entry_id in entry_ids]).result()
+
+
+def benchmark(rows=2_000_000, typos=1000):
+    # Produção diária sintética com erros de digitação (vírgula deslocada: 151.1 -> 1511) e linhas malformadas
+    from database.db_handler import DatabaseHandler
+    rng = np.random.default_rng(5)
+    production = np.round(150 + rng.normal(0, 8, rows), 1)
+    injected = rng.choice(rows, typos, replace=False)
+    production[injected] *= 10
+    dates = (np.datetime64('2000-01-01') + np.arange(rows) // 24).astype(str)
+    frame = pd.DataFrame({
+        KEY: np.arange(1, rows + 1),
+        DATE: dates,
+        'UmidadeSoja': np.round(12.5 + rng.normal(0, 0.4, rows), 1),
+        'ProteinaBrutaSoja': np.round(36.5 + rng.normal(0, 0.5, rows), 1),
+        'ImpurezasSoja': np.round(1.8 + rng.normal(0, 0.3, rows).clip(-1.5), 1),
+        'ProducaoDiaria': production,
+        'ProducaoMensal': np.round(production * 30, 1),
+    })
+    frame['UmidadeSoja'] = frame['UmidadeSoja'].astype(object)
+    frame.loc[rng.choice(rows, typos, replace=False), 'UmidadeSoja'] = 'n/d'
+    with tempfile.TemporaryDirectory() as folder:
+        csv_path = os.path.join(folder, 'producao.csv')
+        frame.to_csv(csv_path, index=False)
+        db = DatabaseHandler(os.path.join(folder, 'ingest.db'))
+        start = time.perf_counter()
+        _table, totals = ingest_csv(db, csv_path)
+        elapsed = time.perf_counter() - start
+        flagged = {row[0] for row in db.read(
+            "SELECT chave FROM quarentena WHERE motivo = ? AND coluna = 'ProducaoDiaria'", (OUTLIER,))}
+        found = len(flagged & set((injected + 1).tolist()))
+        db.close()
+    def count(value):
+        return f"{value:,.0f}".replace(',', '.')
+
+    print(f"{count(rows)} linhas em {elapsed:.1f} s ({count(rows / elapsed * 60)} linhas/min): "
+          f"{count(totals['gravadas'])} gravadas, {count(totals['rejeitadas'])} rejeitadas, "
+          f"{count(totals['outliers'])} com outlier")
+    print(f"Erros de digitação detectados: {found} de {typos} "
+          f"({len(flagged) - found} outras marcações em ProducaoDiaria)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga validada de CSV de produção com quarentena de outliers")
+    parser.add_argument('csv', nargs='*', help="Arquivos CSV (a tabela é deduzida do cabeçalho)")
+    parser.add_argument('--db', default='mesalpha.db')
+    parser.add_argument('--tabela', choices=list(VALIDATION_RULES))
+    parser.add_argument('--quarentena', action='store_true', help="Lista as entradas em quarentena")
+    parser.add_argument('--liberar', type=int, nargs='+', metavar='ID', help="Libera entradas da quarentena")
+    parser.add_argument('--benchmark', type=int, metavar='LINHAS', help="Mede a carga de um CSV sintético")
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark(args.benchmark)
+        return
+
+    from database.db_handler import DatabaseHandler
+    db = DatabaseHandler(args.db)
+    try:
+        for path in args.csv:
+            table, totals = ingest_csv(db, path, args.tabela)
+            print(f"{path} -> {table}: {totals['gravadas']} gravadas, {totals['rejeitadas']} rejeitadas, "
+                  f"{totals['outliers']} com outlier")
+        if args.liberar:
+            release(db, args.liberar)
+            print(f"{len(args.liberar)} entradas liberadas")
+        if args.quarentena:
+            for entry_id, table, key, column, value, reason, score, origin, created, _released in \
+                    quarantine_entries(db, args.tabela):
+                score_text = f" z={score:.1f}" if score is not None else ""
+                print(f"{entry_id:>6} {created} {table}[{key}] {column}={value} {reason}{score_text} ({origin})")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+import argparse
+import asyncio
+import json
+import socket
+import time
+from database.db_handler import LOCAL_SOURCE
+from utils.tracing import span
+
+POLL_INTERVAL = 0.5
+HEARTBEAT_INTERVAL = 15.0
+CLIENT_QUEUE_SIZE = 16
+SEND_TIMEOUT = 5.0
+SEND_BUFFER_SIZE = 64 * 1024
+
+# Seção do painel -> tabelas cuja versão, ao mudar, exige recalcular a seção
+SECTIONS = {
+    'maquinas': ('maquinas',),
+    'manutencao': ('TabelaTeste', 'paradas'),
+    'producao': ('ProducaoSoja',),
+}
+
+SSE_HEADERS = (
+    "HTTP/1.1 200 OK\r\n"
+    "Content-Type: text/event-stream; charset=utf-8\r\n"
+    "Cache-Control: no-cache\r\n"
+    "Connection: keep-alive\r\n"
+    "X-Accel-Buffering: no\r\n\r\n"
+).encode('latin-1')
+
+
+def sse_frame(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=str))
+    return ("\n".join(lines) + "\n\n").encode('utf-8')
+
+
+def machines_delta(previous, current):
+    # Só as máquinas novas ou alteradas e os ids removidos, com a contagem por status completa (é pequena)
+    before = {row[0]: row for row in previous['lista']}
+    after = {row[0]: row for row in current['lista']}
+    return {
+        'status': current['status'],
+        'alteradas': [row for machine_id, row in after.items() if before.get(machine_id) != row],
+        'removidas': [machine_id for machine_id in before if machine_id not in after],
+    }
+
+
+class _Subscriber:
+    __slots__ = ('writer', 'queue', 'dropped')
+
+    def __init__(self, writer, queue_size):
+        self.writer = writer
+        self.queue = asyncio.Queue(queue_size)
+        self.dropped = False
+
+
+class LiveKpiBroadcaster:
+    # Um único laço detecta mudanças pelas versões das tabelas, calcula o delta uma vez e
+    # distribui os mesmos bytes para todos os assinantes; cada um tem fila limitada própria
+    def __init__(self, db_handler, poll_interval=POLL_INTERVAL, queue_size=CLIENT_QUEUE_SIZE,
+                 send_timeout=SEND_TIMEOUT):
+        self.db_handler = db_handler
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.subscribers = set()
+        self.state = {}
+        self.versions = {}
+        self.day = None
+        self.seq = 0
+        self._snapshot_frame = None
+        self._task = None
+        # Sem assinantes o laço fica parado neste evento em vez de consultar o banco
+        self._active = asyncio.Event()
+        self.stats = {'deltas': 0, 'frames_sent': 0, 'dropped': 0, 'polls': 0}
+
+    def ensure_started(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for subscriber in list(self.subscribers):
+            self.drop(subscriber, count=False)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        last_heartbeat = time.monotonic()
+        while True:
+            await self._active.wait()
+            try:
+                detected = await loop.run_in_executor(None, self.detect_changes)
+            except Exception as e:
+                print(f"Erro ao detectar mudanças para o painel ao vivo: {e}")
+                detected = None
+            # O estado só é alterado aqui, no laço: snapshot_frame e serve nunca o veem pela metade
+            changes = self.apply_changes(*detected) if detected else {}
+            if changes:
+                self.seq += 1
+                frame = sse_frame('delta', {'seq': self.seq, 'ts': time.time(), 'changes': changes}, self.seq)
+                self._snapshot_frame = None
+                self.stats['deltas'] += 1
+                self.publish(frame)
+                last_heartbeat = time.monotonic()
+            elif time.monotonic() - last_heartbeat >= HEARTBEAT_INTERVAL:
+                # Comentário SSE mantém proxies e TVs com a conexão aberta
+                self.publish(b": ping\n\n")
+                last_heartbeat = time.monotonic()
+            await asyncio.sleep(self.poll_interval)
+
+    def detect_changes(self):
+        # Roda em thread e só lê o estado: uma leitura barata de table_versions e só as seções afetadas são
+        # recalculadas. Devolve (versões, dia, {seção: valor novo}) para apply_changes
+        versions = self.db_handler.table_versions(source=LOCAL_SOURCE)
+        today = time.strftime('%Y-%m-%d')
+        changed_tables = {table for table, version in versions.items() if self.versions.get(table) != version}
+        stale = [name for name, tables in SECTIONS.items()
+                 if name not in self.state or changed_tables.intersection(tables)]
+        if today != self.day and 'producao' not in stale:
+            stale.append('producao')
+
+        values = {}
+        with span('live.compute_sections', 'data', sections=len(stale)):
+            for name in stale:
+                value = getattr(self, f'compute_{name}')()
+                if self.state.get(name) != value:
+                    values[name] = value
+        return versions, today, values
+
+    def apply_changes(self, versions, today, values):
+        # No laço: grava o estado novo e devolve o delta de cada seção alterada
+        self.stats['polls'] += 1
+        self.versions = versions
+        self.day = today
+        changes = {}
+        for name, value in values.items():
+            previous = self.state.get(name)
+            self.state[name] = value
+            changes[name] = machines_delta(previous, value) if name == 'maquinas' and previous else value
+        return changes
+
+    def compute_maquinas(self):
+        rows = self.db_handler.read("SELECT id, name, status FROM maquinas ORDER BY id")
+        status = {}
+        for _id, _name, machine_status in rows:
+            status[machine_status] = status.get(machine_status, 0) + 1
+        return {'status': status, 'lista': [list(row) for row in rows]}
+
+    def compute_manutencao(self):
+        em_manutencao = self.db_handler.read(
+            "SELECT COUNT(*) FROM falhas_por_tag WHERE abertas > 0 AND TAG <> ''")[0][0]
+        paradas_ativas = self.db_handler.read(
+            "SELECT COUNT(*) FROM paradas WHERE start_time <= datetime('now', 'localtime') "
+            "AND end_time > datetime('now', 'localtime')")[0][0]
+        return {'em_manutencao': em_manutencao or 0, 'paradas_ativas': paradas_ativas or 0}
+
+    def compute_producao(self):
+        # Intervalo [hoje, amanhã) em vez de date(Data) = hoje para poder usar índice em Data
+        total = self.db_handler.read("""
+            SELECT SUM(ProducaoDiaria) FROM ProducaoSoja
+            WHERE Data >= date('now', 'localtime') AND Data < date('now', 'localtime', '+1 day')
+        """)[0][0]
+        return {'dia': self.day, 'producao_hoje': total or 0}
+
+    def snapshot_frame(self):
+        if self._snapshot_frame is None:
+            self._snapshot_frame = sse_frame('snapshot', {'seq': self.seq, 'ts': time.time(), 'state': self.state},
+                                             self.seq)
+        return self._snapshot_frame
+
+    def publish(self, frame):
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber.queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                # Consumidor lento: desconectar é melhor do que segurar memória ou atrasar os demais
+                self.drop(subscriber)
+
+    def remove(self, subscriber):
+        self.subscribers.discard(subscriber)
+        if not self.subscribers:
+            self._active.clear()
+
+    def drop(self, subscriber, count=True):
+        if subscriber in self.subscribers:
+            self.remove(subscriber)
+            subscriber.dropped = True
+            if count:
+                self.stats['dropped'] += 1
+            # Descarta o que estava pendente e acorda o laço de envio com o marcador de fim
+            while not subscriber.queue.empty():
+                subscriber.queue.get_nowait()
+            subscriber.queue.put_nowait(None)
+            subscriber.writer.close()
+
+    async def serve(self, writer):
+        self.ensure_started()
+        subscriber = _Subscriber(writer, self.queue_size)
+        # Buffers pequenos por conexão: a memória fica limitada com centenas de TVs e o
+        # cliente lento aparece logo como fila cheia em vez de se esconder no kernel
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER_SIZE)
+        writer.transport.set_write_buffer_limits(high=SEND_BUFFER_SIZE)
+        writer.write(SSE_HEADERS)
+        if self.state:
+            writer.write(self.snapshot_frame())
+        self.subscribers.add(subscriber)
+        self._active.set()
+        try:
+            while True:
+                frame = await subscriber.queue.get()
+                if frame is None:
+                    break
+                writer.write(frame)
+                # drain com prazo: o buffer do socket cheio por muito tempo também conta como consumidor lento
+                await asyncio.wait_for(writer.drain(), self.send_timeout)
+                self.stats['frames_sent'] += 1
+        except asyncio.TimeoutError:
+            self.drop(subscriber)
+        except ConnectionError:
+            pass
+        finally:
+            self.remove(subscriber)
+
+
+async def run_load_test(db_path, clients, slow_clients, writes, interval):
+    from database.db_handler import DatabaseHandler
+    from services.http_api import ApiServer
+
+    db = DatabaseHandler(db_path)
+    api = ApiServer(db, port=0)
+    api.live.poll_interval = 0.05
+    await api.start()
+    latencies = []
+    received = []
+
+    async def client(slow):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if slow:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        sock.setblocking(False)
+        await asyncio.get_running_loop().sock_connect(sock, (api.host, api.port))
+        # O StreamReader lê até 2 * limit antes de pausar; nos clientes lentos o limite fica pequeno
+        reader, writer = await asyncio.open_connection(sock=sock, limit=2 ** 16 if slow else 2 ** 22)
+        writer.write(b"GET /api/stream HTTP/1.1\r\nHost: localhost\r\nAccept: text/event-stream\r\n\r\n")
+        await writer.drain()
+        count = 0
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            if slow:
+                # Nunca lê: o buffer do socket enche e o servidor deve derrubar a conexão
+                await asyncio.sleep(3600)
+            while True:
+                block = await reader.readuntil(b"\n\n")
+                for line in block.split(b"\n"):
+                    if line.startswith(b"data: "):
+                        data = json.loads(line[6:])
+                        if 'changes' in data:
+                            latencies.append(time.time() - data['ts'])
+                            count += 1
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            received.append(count)
+            writer.close()
+
+    tasks = [asyncio.create_task(client(i < slow_clients)) for i in range(clients)]
+    while len(api.live.subscribers) < clients:
+        await asyncio.sleep(0.05)
+    # Cada máquina nova vai no delta com um nome de ~2 KB, o que enche logo os buffers dos clientes que não leem
+    for i in range(writes):
+        db.write("INSERT INTO maquinas (name, status, last_maintenance) VALUES (?, ?, datetime('now'))",
+                 (f"carga-{i:04d}-" + "x" * 2000, 'Operando' if i % 2 else 'Parada'))
+        await asyncio.sleep(interval)
+    db.writer.flush()
+    await asyncio.sleep(2.0)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await api.live.stop()
+    api.server.close()
+    db.close()
+
+    latencies.sort()
+    fast = sorted(received[slow_clients:]) if slow_clients < clients else [0]
+    print(f"clientes: {clients} ({slow_clients} lentos)  escritas: {writes}")
+    print(f"deltas calculados: {api.live.stats['deltas']}  frames enviados: {api.live.stats['frames_sent']}  "
+          f"derrubados: {api.live.stats['dropped']}")
+    print(f"deltas por cliente rápido: mín {fast[0]}  máx {fast[-1]}")
+    if latencies:
+        print(f"latência: p50 {latencies[len(latencies) // 2] * 1000:.1f} ms  "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms  máx {latencies[-1] * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do painel ao vivo (SSE) com clientes locais")
+    parser.add_argument('--db', required=True, help="Banco de teste: o teste insere linhas em maquinas")
+    parser.add_argument('--clients', type=int, default=300)
+    parser.add_argument('--slow-clients', type=int, default=10)
+    parser.add_argument('--writes', type=int, default=200)
+    parser.add_argument('--interval', type=float, default=0.02)
+    args = parser.parse_args()
+    asyncio.run(run_load_test(args.db, args.clients, args.slow_clients, args.writes, args.interval))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+import argparse
+import asyncio
+import os
+import random
+import struct
+import tempfile
+import threading
+import time
+from collections import deque
+import numpy as np
+from analytics.timeseries import SignalStore
+from utils.tracing import span
+
+READ_HOLDING_REGISTERS = 3
+# Cabeçalho MBAP (transação, protocolo, tamanho, unidade) + função, endereço e quantidade
+REQUEST_FORMAT = '>HHHBBHH'
+HEADER_FORMAT = '>HHHB'
+HEADER_SIZE = 7
+MAX_MBAP_LENGTH = 254
+# Limite do protocolo por leitura; registros separados por até MAX_GAP posições vão na mesma requisição
+# (ler alguns registros a mais custa menos que uma ida e volta extra)
+MAX_BLOCK = 125
+MAX_GAP = 8
+REQUEST_TIMEOUT = 1.0
+BACKOFF_MIN = 0.5
+BACKOFF_MAX = 30.0
+EVENT_FLUSH_INTERVAL = 2.0
+LATENCY_SAMPLES = 200
+
+STATUS_SIGNAL = 'status'
+REASON_SIGNAL = 'motivo'
+STATUS_CODES = {0: 'Parada', 1: 'Operando', 2: 'Manutenção'}
+STOP_REASONS = {0: 'Não informado', 1: 'Falha mecânica', 2: 'Falha elétrica', 3: 'Falta de material',
+                4: 'Setup', 5: 'Limpeza'}
+
+
+class ModbusError(Exception):
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+class ModbusFramingError(ModbusError):
+    # Resposta truncada, malformada ou fora de sequência: o fluxo perdeu o alinhamento e a conexão é descartada
+    pass
+
+
+def plan_reads(addresses, max_gap=MAX_GAP, max_block=MAX_BLOCK):
+    # Endereços -> blocos (início, quantidade) contíguos: uma requisição por bloco em vez de uma por registro
+    blocks = []
+    for address in sorted(set(addresses)):
+        if blocks:
+            start, count = blocks[-1]
+            if address - (start + count) <= max_gap and address - start < max_block:
+                blocks[-1] = (start, address - start + 1)
+                continue
+        blocks.append((address, 1))
+    return blocks
+
+
+def to_text(moment):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(moment))
+
+
+class ModbusClient:
+    # Cliente Modbus/TCP mínimo sobre streams do asyncio: uma requisição por vez por conexão
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.transaction = 0
+
+    @classmethod
+    async def connect(cls, host, port, timeout=REQUEST_TIMEOUT):
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        return cls(reader, writer)
+
+    async def read_holding_registers(self, unit, address, count):
+        self.transaction = (self.transaction + 1) & 0xFFFF
+        self.writer.write(struct.pack(REQUEST_FORMAT, self.transaction, 0, 6, unit, READ_HOLDING_REGISTERS,
+                                      address, count))
+        transaction, protocol, length, _unit = struct.unpack(HEADER_FORMAT,
+                                                             await self.reader.readexactly(HEADER_SIZE))
+        # Tamanho do MBAP conta a unidade e o PDU (função + até 252 bytes)
+        if not 2 <= length <= MAX_MBAP_LENGTH:
+            raise ModbusFramingError(f"Tamanho inválido no cabeçalho: {length}")
+        pdu = await self.reader.readexactly(length - 1)
+        if transaction != self.transaction or protocol != 0:
+            raise ModbusFramingError("Resposta fora de sequência")
+        if pdu[0] == READ_HOLDING_REGISTERS | 0x80:
+            if len(pdu) != 2:
+                raise ModbusFramingError("Resposta de exceção malformada")
+            raise ModbusError(f"Exceção Modbus {pdu[1]}", pdu[1])
+        if pdu[0] != READ_HOLDING_REGISTERS or len(pdu) != 2 + 2 * count or pdu[1] != 2 * count:
+            raise ModbusFramingError("Resposta inválida")
+        return struct.unpack(f'>{count}H', pdu[2:])
+
+    def close(self):
+        self.writer.close()
+
+
+class Device:
+    def __init__(self, id, maquina, host, porta, unidade, intervalo, registers):
+        self.id = id
+        self.machine = maquina
+        self.host = host
+        self.port = porta
+        self.unit = unidade
+        self.interval = intervalo
+        # [(sinal, endereço, escala)]
+        self.registers = registers
+        self.blocks = plan_reads(address for _signal, address, _scale in registers)
+        self.status = None
+        self.stop_started = None
+        self.stop_reason = None
+        self.polls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.reconnects = 0
+        self.overruns = 0
+        self.last_error = None
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+
+class ModbusGateway:
+    # Lê os CLPs cadastrados em dispositivos_modbus, todos concorrentes num único event loop em thread própria.
+    # Cada dispositivo tem seu intervalo, lê registros em blocos contíguos, e com timeout ou conexão perdida
+    # reconecta com backoff exponencial e jitter, sem atrasar os outros. Sinais vão para o SignalStore;
+    # mudanças de status e paradas são acumuladas e gravadas juntas a cada EVENT_FLUSH_INTERVAL
+    def __init__(self, db_handler, store=None, timeout=REQUEST_TIMEOUT, flush_interval=EVENT_FLUSH_INTERVAL):
+        self.db_handler = db_handler
+        self.store = store if store is not None else SignalStore()
+        self.timeout = timeout
+        self.flush_interval = flush_interval
+        self.devices = []
+        self._statuses = {}
+        self._stops = []
+        self.status_changes = 0
+        self.stops_recorded = 0
+        self._loop = None
+        self._stopping = None
+        self._thread = None
+
+    def load_devices(self):
+        registers = {}
+        for device_id, signal, address, scale in self.db_handler.read(
+                "SELECT dispositivo_id, sinal, endereco, escala FROM registros_modbus ORDER BY dispositivo_id, endereco"):
+            registers.setdefault(device_id, []).append((signal, address, scale))
+        self.devices = [Device(*row, registers.get(row[0], [])) for row in self.db_handler.read("""
+            SELECT id, maquina, host, porta, unidade, intervalo FROM dispositivos_modbus WHERE ativo = 1 ORDER BY id
+        """)]
+        self.devices = [device for device in self.devices if device.registers]
+        return len(self.devices)
+
+    def start(self):
+        if self._thread is None:
+            if not self.devices:
+                self.load_devices()
+            ready = threading.Event()
+            self._thread = threading.Thread(target=lambda: asyncio.run(self._main(ready)), name='modbus-gateway',
+                                            daemon=True)
+            self._thread.start()
+            ready.wait()
+
+    def stop(self):
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+            self._thread.join()
+            self._thread = None
+
+    async def _main(self, ready):
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        ready.set()
+        tasks = [asyncio.create_task(self.poll_device(device)) for device in self.devices]
+        flusher = asyncio.create_task(self.flush_loop())
+        await self._stopping.wait()
+        for task in tasks + [flusher]:
+            task.cancel()
+        await asyncio.gather(*tasks, flusher, return_exceptions=True)
+        await self.flush_events()
+
+    async def flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush_events()
+            except Exception as e:
+                print(f"Erro ao gravar eventos das máquinas: {e}")
+
+    async def poll_device(self, device):
+        loop = asyncio.get_running_loop()
+        # Primeiro ciclo espalhado no intervalo: centenas de CLPs não são consultados no mesmo instante
+        await asyncio.sleep(random.uniform(0, device.interval))
+        client = None
+        backoff = BACKOFF_MIN
+        next_poll = loop.time()
+        try:
+            while True:
+                if client is None:
+                    try:
+                        client = await ModbusClient.connect(device.host, device.port, self.timeout)
+                    except (OSError, asyncio.TimeoutError) as e:
+                        device.reconnects += 1
+                        device.last_error = str(e) or type(e).__name__
+                        await asyncio.sleep(backoff * random.uniform(0.5, 1.0))
+                        backoff = min(backoff * 2, BACKOFF_MAX)
+                        next_poll = loop.time()
+                        continue
+
+                started = loop.time()
+                try:
+                    values = {}
+                    for start, count in device.blocks:
+                        block = await asyncio.wait_for(
+                            client.read_holding_registers(device.unit, start, count), self.timeout)
+                        values.update(zip(range(start, start + count), block))
+                    device.polls += 1
+                    device.latencies.append(loop.time() - started)
+                    self.record(device, time.time(), values)
+                    # Só uma leitura completa zera a espera: uma falha persistente logo após conectar continua espaçada
+                    backoff = BACKOFF_MIN
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                    # Uma resposta atrasada chegaria fora de sequência: descarta a conexão
+                    if isinstance(e, asyncio.TimeoutError):
+                        device.timeouts += 1
+                    else:
+                        device.errors += 1
+                    device.last_error = str(e) or type(e).__name__
+                    client.close()
+                    client = None
+                    continue
+                except Exception as e:
+                    device.errors += 1
+                    if isinstance(e, ModbusError) and not isinstance(e, ModbusFramingError):
+                        # Exceção do CLP (endereço inválido etc.): a conexão continua válida
+                        device.last_error = str(e)
+                    else:
+                        # Resposta malformada ou falha inesperada não pode encerrar a tarefa do CLP: descarta a
+                        # conexão e espera antes de reconectar, para não martelar um CLP que responde errado
+                        device.last_error = f"{type(e).__name__}: {e}"
+                        client.close()
+                        client = None
+                        await asyncio.sleep(backoff * random.uniform(0.5, 1.0))
+                        backoff = min(backoff * 2, BACKOFF_MAX)
+                        next_poll = loop.time()
+                        continue
+
+                next_poll += device.interval
+                delay = next_poll - loop.time()
+                if delay < 0:
+                    # Ciclo mais lento que o intervalo: não tenta recuperar as leituras perdidas
+                    device.overruns += 1
+                    next_poll = loop.time()
+                    delay = 0
+                await asyncio.sleep(delay)
+        finally:
+            if client is not None:
+                client.close()
+
+    def record(self, device, moment, values):
+        raw = {}
+        for signal, address, scale in device.registers:
+            if signal in (STATUS_SIGNAL, REASON_SIGNAL):
+                raw[signal] = values[address]
+            else:
+                self.store.append((device.machine, signal), (moment,), (values[address] * scale,))
+        if STATUS_SIGNAL not in raw:
+            return
+        status = STATUS_CODES.get(raw[STATUS_SIGNAL], 'Parada')
+        if status == device.status:
+            return
+        # Mudança de status: a parada aberta fecha ao sair de 'Parada' e vira uma linha em paradas
+        if device.stop_started is not None:
+            self._stops.append((device.machine, to_text(device.stop_started), to_text(moment), device.stop_reason))
+            device.stop_started = None
+        if status == 'Parada':
+            device.stop_started = moment
+            device.stop_reason = STOP_REASONS.get(raw.get(REASON_SIGNAL), STOP_REASONS[0])
+        device.status = status
+        self._statuses[device.machine] = status
+
+    async def flush_events(self):
+        statuses, stops = self._statuses, self._stops
+        if not statuses and not stops:
+            return
+        self._statuses, self._stops = {}, []
+
+        def apply(conn):
+            for machine, status in statuses.items():
+                if not conn.execute("UPDATE maquinas SET status = ? WHERE name = ?", (status, machine)).rowcount:
+                    conn.execute("INSERT INTO maquinas (name, status) VALUES (?, ?)", (machine, status))
+            conn.executemany("""
+                INSERT INTO paradas (machine_id, start_time, end_time, reason)
+                SELECT id, ?, ?, ? FROM maquinas WHERE name = ? ORDER BY id LIMIT 1
+            """, [(start, end, reason, machine) for machine, start, end, reason in stops])
+        with span('modbus.flush', 'data', statuses=len(statuses), stops=len(stops)):
+            await asyncio.wrap_future(self.db_handler.write_call(apply))
+        self.status_changes += len(statuses)
+        self.stops_recorded += len(stops)
+
+    def statistics(self):
+        latencies = np.array([value for device in self.devices for value in device.latencies])
+        return {
+            'dispositivos': len(self.devices),
+            'leituras': sum(device.polls for device in self.devices),
+            'erros': sum(device.errors for device in self.devices),
+            'timeouts': sum(device.timeouts for device in self.devices),
+            'reconexoes': sum(device.reconnects for device in self.devices),
+            'atrasos': sum(device.overruns for device in self.devices),
+            'latencia_p50_ms': float(np.percentile(latencies, 50) * 1000) if len(latencies) else None,
+            'latencia_p99_ms': float(np.percentile(latencies, 99) * 1000) if len(latencies) else None,
+            'mudancas_status': self.status_changes,
+            'paradas': self.stops_recorded,
+        }
+
+
+def register_devices(db_handler, devices, registers):
+    # devices: [(máquina, host, porta, unidade, intervalo)]; registers: [(sinal, endereço, escala)] para todos
+    def apply(conn):
+        for device in devices:
+            device_id = conn.execute("""
+                INSERT INTO dispositivos_modbus (maquina, host, porta, unidade, intervalo) VALUES (?, ?, ?, ?, ?)
+            """, device).lastrowid
+            conn.executemany("INSERT INTO registros_modbus (dispositivo_id, sinal, endereco, escala) VALUES (?, ?, ?, ?)",
+                             [(device_id, *register) for register in registers])
+    db_handler.write_call(apply).result()
+
+
+def benchmark(devices=300, seconds=20.0, interval=1.0, base_port=None):
+    # Simulador em outro processo (como CLPs reais, fora do event loop do gateway) e gateway lendo todos
+    import multiprocessing
+    from services.plc_simulator import SIMULATED_REGISTERS, DEFAULT_PORT, run_simulator, wait_ready
+    base_port = base_port or DEFAULT_PORT
+    simulator = multiprocessing.Process(target=run_simulator, args=(devices, '127.0.0.1', base_port), daemon=True)
+    simulator.start()
+    try:
+        wait_ready('127.0.0.1', base_port, devices)
+        with tempfile.TemporaryDirectory() as folder:
+            from database.db_handler import DatabaseHandler
+            db = DatabaseHandler(os.path.join(folder, 'modbus.db'))
+            register_devices(db, [(f"CLP-{i:03d}", '127.0.0.1', base_port + i, 1, interval) for i in range(devices)],
+                             SIMULATED_REGISTERS)
+            store = SignalStore()
+            gateway = ModbusGateway(db, store)
+            gateway.start()
+            time.sleep(seconds)
+            gateway.stop()
+            stats = gateway.statistics()
+            paradas = db.read("SELECT COUNT(*) FROM paradas")[0][0]
+            db.close()
+    finally:
+        simulator.terminate()
+        simulator.join()
+    expected = devices * seconds / interval
+    print(f"{devices} CLPs a cada {interval:g} s por {seconds:g} s: {stats['leituras']:,} leituras "
+          f"({stats['leituras'] / seconds:,.0f}/s, {stats['leituras'] / expected:.0%} do esperado)")
+    print(f"Latência p50 {stats['latencia_p50_ms']:.2f} ms, p99 {stats['latencia_p99_ms']:.2f} ms; "
+          f"{stats['timeouts']} timeouts, {stats['erros']} erros, {stats['reconexoes']} reconexões, "
+          f"{stats['atrasos']} ciclos atrasados")
+    print(f"{len(store.keys)} séries no SignalStore, {stats['mudancas_status']} mudanças de status, "
+          f"{paradas} paradas gravadas ({store.memory_bytes() / 1024 / 1024:.1f} MB de buffers)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aquisição Modbus/TCP dos CLPs para maquinas, paradas e sinais")
+    parser.add_argument('--db', default='mesalpha.db')
+    parser.add_argument('--benchmark', type=int, metavar='CLPS',
+                        help="Teste de carga contra o simulador local com CLPS dispositivos")
+    parser.add_argument('--add-simulated', type=int, metavar='CLPS',
+                        help="Cadastra CLPS dispositivos apontando para o simulador local (services.plc_simulator)")
+    parser.add_argument('--seconds', type=float, default=20.0)
+    parser.add_argument('--interval', type=float, default=1.0)
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark(args.benchmark, args.seconds, args.interval)
+        return
+
+    from database.db_handler import DatabaseHandler
+    db = DatabaseHandler(args.db)
+    if args.add_simulated:
+        from services.plc_simulator import SIMULATED_REGISTERS, DEFAULT_PORT
+        register_devices(db, [(f"CLP-{i:03d}", '127.0.0.1', DEFAULT_PORT + i, 1, args.interval)
+                              for i in range(args.add_simulated)], SIMULATED_REGISTERS)
+    gateway = ModbusGateway(db)
+    if not gateway.load_devices():
+        print("Nenhum dispositivo ativo em dispositivos_modbus")
+        db.close()
+        return
+    gateway.start()
+    try:
+        while True:
+            time.sleep(10)
+            print(gateway.statistics())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        gateway.stop()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
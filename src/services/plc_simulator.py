@@ -0,0 +1,139 @@
+import argparse
+import asyncio
+import math
+import random
+import socket
+import struct
+import time
+from services.modbus_gateway import HEADER_FORMAT, HEADER_SIZE, READ_HOLDING_REGISTERS
+
+DEFAULT_PORT = 15020
+REGISTER_COUNT = 16
+# Mapa de registros de cada CLP simulado, no formato de registros_modbus: (sinal, endereço, escala)
+SIMULATED_REGISTERS = (
+    ('status', 0, 1.0),
+    ('motivo', 1, 1.0),
+    ('velocidade', 2, 0.1),
+    ('temperatura', 3, 0.1),
+    ('corrente', 4, 0.1),
+    ('producao', 8, 1.0),
+)
+# Taxas (por segundo) das transições de status: paradas a cada ~10 min, retomada em ~30 s
+STOP_RATE = 1 / 600
+RESTART_RATE = 1 / 30
+ILLEGAL_FUNCTION = 1
+ILLEGAL_ADDRESS = 2
+
+
+class SimulatedPlc:
+    # Estado de uma máquina calculado sob demanda a partir do tempo decorrido desde a última leitura:
+    # centenas de CLPs simulados não custam nada enquanto ninguém os consulta
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.registers = [0] * REGISTER_COUNT
+        self.registers[0] = 1
+        self.base_speed = self.rng.uniform(800, 1500)
+        self.temperature = self.rng.uniform(300, 450)
+        self.updated = time.monotonic()
+
+    def update(self):
+        now = time.monotonic()
+        elapsed = now - self.updated
+        self.updated = now
+        registers = self.registers
+        running = registers[0] == 1
+        if self.rng.random() < 1 - math.exp(-(STOP_RATE if running else RESTART_RATE) * elapsed):
+            running = not running
+            registers[0] = 1 if running else 0
+            registers[1] = 0 if running else self.rng.randint(1, 5)
+        if running:
+            registers[2] = max(int(self.base_speed + self.rng.gauss(0, 15)), 0)
+            registers[4] = max(int(120 + self.rng.gauss(0, 5)), 0)
+            registers[8] = (registers[8] + int(elapsed * self.base_speed / 60)) & 0xFFFF
+            self.temperature = min(self.temperature + elapsed * 0.5, 800)
+        else:
+            registers[2] = 0
+            registers[4] = 0
+            self.temperature = max(self.temperature - elapsed * 1.0, 250)
+        registers[3] = int(self.temperature + self.rng.gauss(0, 2))
+
+    def read(self, address, count):
+        self.update()
+        return self.registers[address:address + count]
+
+
+class PlcSimulator:
+    # Um servidor Modbus/TCP por CLP simulado, em portas consecutivas a partir de base_port, com latência opcional
+    def __init__(self, devices, host='127.0.0.1', base_port=DEFAULT_PORT, latency=0.0, seed=3):
+        self.host = host
+        self.base_port = base_port
+        self.latency = latency
+        self.plcs = [SimulatedPlc(seed * 100_003 + i) for i in range(devices)]
+        self.servers = []
+
+    async def start(self):
+        for i, plc in enumerate(self.plcs):
+            self.servers.append(await asyncio.start_server(
+                lambda reader, writer, plc=plc: self.handle(plc, reader, writer), self.host, self.base_port + i))
+
+    async def serve_forever(self):
+        await self.start()
+        await asyncio.gather(*(server.serve_forever() for server in self.servers))
+
+    async def handle(self, plc, reader, writer):
+        try:
+            while True:
+                transaction, protocol, length, unit = struct.unpack(HEADER_FORMAT,
+                                                                    await reader.readexactly(HEADER_SIZE))
+                pdu = await reader.readexactly(length - 1)
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                function = pdu[0]
+                if function != READ_HOLDING_REGISTERS:
+                    body = bytes((function | 0x80, ILLEGAL_FUNCTION))
+                else:
+                    address, count = struct.unpack('>HH', pdu[1:5])
+                    if not 1 <= count <= 125 or address + count > REGISTER_COUNT:
+                        body = bytes((function | 0x80, ILLEGAL_ADDRESS))
+                    else:
+                        body = struct.pack(f'>BB{count}H', function, 2 * count, *plc.read(address, count))
+                writer.write(struct.pack(HEADER_FORMAT, transaction, protocol, len(body) + 1, unit) + body)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def run_simulator(devices, host='127.0.0.1', base_port=DEFAULT_PORT, latency=0.0):
+    try:
+        asyncio.run(PlcSimulator(devices, host, base_port, latency).serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+def wait_ready(host, base_port, devices, timeout=30.0):
+    # Espera a última porta aceitar conexões (os servidores abrem em ordem)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection((host, base_port + devices - 1), timeout=1.0).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulador de CLPs Modbus/TCP para testes do gateway")
+    parser.add_argument('--devices', type=int, default=10)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Porta do primeiro CLP; os demais seguem")
+    parser.add_argument('--latency', type=float, default=0.0, help="Atraso artificial por resposta (s)")
+    args = parser.parse_args()
+    print(f"{args.devices} CLPs em {args.host}:{args.port}-{args.port + args.devices - 1}")
+    run_simulator(args.devices, args.host, args.port, args.latency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import weakref
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from analytics.reliability import RunHoursModel
+from utils.tracing import span, traced
+
+# Tarefas são geradas para TAGs vencidas ou que vencem dentro deste prazo
+LEAD_DAYS = 7
+TASK_PREFIX = "Manutenção preditiva: "
+TASK_PENDING = 'Pendente'
+TASK_DONE = 'Concluída'
+FAILURE_TYPE = 'Corretiva'
+# Horímetro 'HHH:MM:SS' -> horas, calculado no SQLite junto com a leitura
+HOURS = ("(CAST(substr(Horímetro, 1, instr(Horímetro, ':') - 1) AS REAL)"
+         " + CAST(substr(Horímetro, instr(Horímetro, ':') + 1, 2) AS REAL) / 60"
+         " + CAST(substr(Horímetro, -2) AS REAL) / 3600)")
+SITUATIONS = ('em manutenção', 'vencida', 'próxima', 'em dia')
+
+
+def to_seconds(texts):
+    # 'DD/MM/AAAA HH:MM:SS' -> segundos; datas de TabelaTeste são hora local sem fuso e são tratadas como UTC,
+    # a mesma convenção de local_now. Converter no numpy sai bem mais barato que strftime('%s') no SQLite
+    stamps = np.array([f"{text[6:10]}-{text[3:5]}-{text[:2]}T{text[11:]}" if text else 'NaT' for text in texts],
+                      dtype='datetime64[s]')
+    return np.where(np.isnat(stamps), np.nan, stamps.astype(np.int64).astype(np.float64))
+
+
+def local_now():
+    return datetime.now().replace(tzinfo=timezone.utc).timestamp()
+
+
+def to_local(seconds):
+    return datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None)
+
+
+class PredictiveMaintenance:
+    # Mantém o RunHoursModel em dia com TabelaTeste: enquanto a versão da tabela só avançou por inserções,
+    # lê apenas as linhas novas (rowid acima da última marca) e aplica o lote; qualquer alteração ou exclusão,
+    # ou ordem fora de sequência, recalcula do zero
+    def __init__(self, db_handler):
+        self.db_handler = db_handler
+        self.model = None
+        self.last_rowid = 0
+        self.version = None
+        self.full_rebuilds = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, after_rowid=0):
+        rows = self.db_handler.read(f"""
+            SELECT rowid, COALESCE(TAG, ''), DataInicial, COALESCE(DataFinal, ''), Tipo = ?, {HOURS}
+            FROM TabelaTeste
+            WHERE rowid > ? AND DataInicial IS NOT NULL AND DataInicial != ''
+            ORDER BY rowid
+        """, (FAILURE_TYPE, after_rowid))
+        if not rows:
+            return None
+        rowids, tags, starts, ends, failures, hours = zip(*rows)
+        return (rowids[-1], tags, to_seconds(starts), to_seconds(ends),
+                np.array(failures, dtype=bool), np.array(hours, dtype=float))
+
+    @traced('predictive.refresh', 'data')
+    def refresh(self):
+        # Devolve True se o modelo mudou
+        with self._lock:
+            version = self.db_handler.table_versions(('TabelaTeste',)).get('TabelaTeste')
+            if self.model is not None and version == self.version:
+                return False
+            batch = self.fetch(self.last_rowid) if self.model is not None else None
+            new_rows = len(batch[1]) if batch else 0
+            # Cada linha inserida soma 1 à versão: diferença igual às linhas novas significa que nada foi alterado
+            incremental = (self.model is not None and self.version is not None and version is not None
+                           and version - self.version == new_rows)
+            if incremental and batch:
+                with span('predictive.incremental', 'data', rows=new_rows):
+                    incremental = self.model.update(*batch[1:])
+                if incremental:
+                    self.last_rowid = batch[0]
+            if not incremental:
+                self.rebuild()
+            self.version = version
+            return True
+
+    def rebuild(self):
+        with span('predictive.rebuild', 'data'):
+            self.model = RunHoursModel()
+            self.last_rowid = 0
+            batch = self.fetch()
+            if batch:
+                self.model.update(*batch[1:])
+                self.last_rowid = batch[0]
+            self.full_rebuilds += 1
+
+    def plan(self, now=None):
+        # [(TAG, horas desde o último serviço, MTBF da TAG, MTTR, disponibilidade, limite, data prevista, situação)],
+        # das mais urgentes para as menos
+        self.refresh()
+        now = local_now() if now is None else now
+        with self._lock:
+            model = self.model
+            if model is None or not len(model):
+                return []
+            prediction = model.predict(now)
+        due = prediction['due']
+        lead = LEAD_DAYS * 86400
+        situation = np.select([prediction['in_service'], due <= now, due <= now + lead], [0, 1, 2], default=3)
+        with np.errstate(invalid='ignore'):
+            availability = prediction['estimate'] / (prediction['estimate'] + np.nan_to_num(prediction['mttr']))
+        order = np.lexsort((due, situation))
+        return [(model.tags[i], float(prediction['since'][i]), float(prediction['mtbf'][i]),
+                 float(prediction['mttr'][i]), float(availability[i]), float(prediction['limit'][i]),
+                 to_local(due[i]), SITUATIONS[situation[i]]) for i in order]
+
+    def fleet_summary(self):
+        self.refresh()
+        with self._lock:
+            if self.model is None or not len(self.model):
+                return None
+            summary = self.model.distribution()
+            prediction = self.model.predict(local_now())
+        if summary is not None:
+            summary['fleet_mtbf'] = prediction['fleet_mtbf']
+            summary['tags'] = len(self.model)
+        return summary
+
+    def generate_tasks(self, now=None):
+        # Uma tarefa por TAG vencida ou próxima e ciclo de serviço (fim da última ordem da TAG): se a do ciclo está
+        # pendente, só a data é atualizada; se foi concluída, nada é criado até a próxima ordem em TabelaTeste
+        # abrir um novo ciclo
+        now = local_now() if now is None else now
+        plan = self.plan(now)
+        with self._lock:
+            model = self.model
+            served = dict(zip(model.tags, model.last_end[:len(model.tags)].tolist())) if model is not None else {}
+        due = [(tag, since, limit, when, situation) for tag, since, _mtbf, _mttr, _availability, limit, when, situation
+               in plan if situation in ('vencida', 'próxima')]
+        cycles = {tag: (served_at, task_id, status) for tag, served_at, task_id, status in self.db_handler.read("""
+            SELECT p.tag, p.ultimo_servico, t.id, t.status
+            FROM tarefas_preditivas p JOIN tarefas t ON t.id = p.tarefa_id
+        """)}
+        # Pendentes sem ciclo registrado (geradas antes de tarefas_preditivas) são reaproveitadas pelo título
+        pending = dict(self.db_handler.read(
+            "SELECT title, id FROM tarefas WHERE status != ? AND title LIKE ?", (TASK_DONE, TASK_PREFIX + '%')))
+        inserts, updates = [], []
+        for tag, since, limit, when, situation in due:
+            cycle = cycles.get(tag)
+            if cycle is not None and cycle[2] == TASK_DONE and cycle[0] == served[tag]:
+                continue
+            title = TASK_PREFIX + tag
+            description = (f"{since:.0f} h de operação desde o último serviço; limite {limit:.0f} h "
+                           f"({situation}). Gerada a partir do histórico de manutenção.")
+            stamp = when.strftime("%Y-%m-%d %H:%M:%S")
+            task_id = cycle[1] if cycle is not None and cycle[2] != TASK_DONE else pending.get(title)
+            if task_id is not None:
+                updates.append((description, stamp, task_id, tag, served[tag]))
+            else:
+                inserts.append((title, description, TASK_PENDING, stamp, tag, served[tag]))
+
+        def apply(conn):
+            assigned = [(tag, served_at, task_id) for _description, _stamp, task_id, tag, served_at in updates]
+            for title, description, status, stamp, tag, served_at in inserts:
+                cursor = conn.execute("INSERT INTO tarefas (title, description, status, due_date) VALUES (?, ?, ?, ?)",
+                                      (title, description, status, stamp))
+                assigned.append((tag, served_at, cursor.lastrowid))
+            conn.executemany("UPDATE tarefas SET description = ?, due_date = ? WHERE id = ?",
+                             [update[:3] for update in updates])
+            conn.executemany("""
+                INSERT INTO tarefas_preditivas (tag, ultimo_servico, tarefa_id) VALUES (?, ?, ?)
+                ON CONFLICT(tag) DO UPDATE SET ultimo_servico = excluded.ultimo_servico, tarefa_id = excluded.tarefa_id
+            """, assigned)
+        if inserts or updates:
+            self.db_handler.write_call(apply).result()
+        return len(inserts), len(updates)
+
+
+_planners = weakref.WeakKeyDictionary()
+
+
+def planner_for(db_handler):
+    # Um planejador por banco, compartilhado entre a tela de tarefas e o agendador: o estado incremental é um só
+    planner = _planners.get(db_handler)
+    if planner is None:
+        planner = _planners[db_handler] = PredictiveMaintenance(db_handler)
+    return planner
+
+
+def predictive_tasks(db_handler):
+    created, updated = planner_for(db_handler).generate_tasks()
+    return f"{created} tarefas criadas, {updated} atualizadas"
+
+
+def benchmark(tags=5000, orders_per_tag=40, new_rows=200):
+    rng = random.Random(13)
+    with tempfile.TemporaryDirectory() as folder:
+        from database.db_handler import DatabaseHandler
+        path = os.path.join(folder, 'preditiva.db')
+        db = DatabaseHandler(path)
+        base = datetime(2022, 1, 1)
+
+        def orders(count, offset_days):
+            for _ in range(count):
+                start = base + timedelta(days=offset_days + rng.uniform(0, 700), seconds=rng.randint(0, 86399))
+                hours = rng.uniform(1, 72)
+                end = start + timedelta(hours=hours)
+                yield (start.strftime("%d/%m/%Y %H:%M:%S"), end.strftime("%d/%m/%Y %H:%M:%S"),
+                       f"TAG-{rng.randint(1, tags):05d}", rng.choice(('Preventiva', FAILURE_TYPE, FAILURE_TYPE)),
+                       f"{int(hours):02d}:{int(hours * 60) % 60:02d}:00")
+
+        conn = sqlite3.connect(path)
+        with conn:
+            conn.executemany("""
+                INSERT INTO TabelaTeste (DataInicial, DataFinal, TAG, Tipo, Falha, Descrição, Horímetro, Operador)
+                VALUES (?, ?, ?, ?, 'Mecânica', '', ?, 'operador')
+            """, orders(tags * orders_per_tag, 0))
+        conn.close()
+
+        planner = PredictiveMaintenance(db)
+        start = time.perf_counter()
+        plan = planner.plan()
+        print(f"{tags:,} TAGs, {tags * orders_per_tag:,} ordens: recálculo completo (leitura + cálculo) "
+              f"em {(time.perf_counter() - start) * 1000:.0f} ms")
+        batch = planner.fetch()
+        start = time.perf_counter()
+        model = RunHoursModel()
+        model.update(*batch[1:])
+        model.predict(local_now())
+        print(f"Só o cálculo vetorizado: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        db.write_many("""
+            INSERT INTO TabelaTeste (DataInicial, DataFinal, TAG, Tipo, Falha, Descrição, Horímetro, Operador)
+            VALUES (?, ?, ?, ?, 'Mecânica', '', ?, 'operador')
+        """, list(orders(new_rows, 720))).result()
+        start = time.perf_counter()
+        plan = planner.plan()
+        print(f"{new_rows} ordens novas: atualização incremental em {(time.perf_counter() - start) * 1000:.1f} ms "
+              f"({planner.full_rebuilds} recálculo completo no total)")
+        start = time.perf_counter()
+        created, updated = planner.generate_tasks()
+        print(f"{created} tarefas criadas, {updated} atualizadas em {(time.perf_counter() - start) * 1000:.0f} ms; "
+              f"mais urgente: {plan[0][0]} ({plan[0][7]})")
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manutenção preditiva a partir do histórico de ordens")
+    parser.add_argument('--db', default='mesalpha.db')
+    parser.add_argument('--benchmark', action='store_true', help="Mede o recálculo com milhares de TAGs sintéticas")
+    parser.add_argument('--tags', type=int, default=5000)
+    parser.add_argument('--generate', action='store_true', help="Gera as tarefas das TAGs vencidas ou próximas")
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark(args.tags)
+        return
+
+    from database.db_handler import DatabaseHandler
+    db = DatabaseHandler(args.db)
+    planner = PredictiveMaintenance(db)
+    for tag, since, mtbf, _mttr, availability, limit, when, situation in planner.plan():
+        print(f"{tag:<12} {since:>8.0f} h  MTBF {mtbf:>8.0f} h  limite {limit:>8.0f} h  "
+              f"disp. {availability:.1%}  {when:%d/%m/%Y}  {situation}")
+    if args.generate:
+        created, updated = planner.generate_tasks()
+        print(f"{created} tarefas criadas, {updated} atualizadas")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from services.export import export_dataset, table_dataset
+from services.predictive_maintenance import predictive_tasks
+from utils.tracing import span
+
+MAX_WORKERS = 2
+# Teto de espera entre verificações: edições em rotinas (cron, ativa) valem sem reiniciar o programa
+POLL_INTERVAL = 60.0
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Páginas devolvidas ao sistema por execução do vacuum incremental: limita o tempo com o escritor ocupado
+VACUUM_PAGES = 20000
+REPORT_TABLES = ('ProducaoSoja', 'FareloSojaTostado')
+REPORT_RETENTION_DAYS = 90
+HISTORY_RETENTION_DAYS = 180
+
+# (minimo, maximo) de cada campo: minuto, hora, dia do mês, mês, dia da semana (0 = domingo; 7 também)
+CRON_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+# Procura do próximo disparo limitada: uma expressão como "0 0 31 2 *" nunca acontece
+CRON_SEARCH_YEARS = 5
+
+
+def parse_cron_field(text, low, high):
+    values = set()
+    for part in text.split(','):
+        step = 1
+        if '/' in part:
+            part, step = part.split('/')
+            step = int(step)
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = map(int, part.split('-'))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if step < 1 or not low <= start <= end <= high:
+            raise ValueError(f"Campo cron inválido: {text}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+class CronSchedule:
+    # Expressão cron de 5 campos ("minuto hora dia mês dia-da-semana") com *, listas, faixas e passos.
+    # Como no cron, se dia do mês e dia da semana forem restritos, basta um dos dois coincidir
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Expressão cron precisa de 5 campos: {expression}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            parse_cron_field(field, low, high) for field, (low, high) in zip(fields, CRON_FIELDS))
+        self.weekdays = frozenset(day % 7 for day in weekdays)
+        self.any_day = fields[2].startswith('*')
+        self.any_weekday = fields[4].startswith('*')
+
+    def day_matches(self, moment):
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, moment):
+        # Avança campo a campo (mês, dia, hora, minuto) em vez de minuto a minuto
+        moment = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment.year + CRON_SEARCH_YEARS
+        while moment.year <= limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self.day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        return None
+
+
+def optimize_statistics(db_handler):
+    # Analisa só as tabelas cujas estatísticas ficaram desatualizadas, com amostragem limitada
+    def run(conn):
+        conn.execute("PRAGMA analysis_limit=400")
+        conn.execute("PRAGMA optimize=0x10002")
+    db_handler.write_call(run).result()
+    return "PRAGMA optimize concluído"
+
+
+def analyze(db_handler):
+    def run(conn):
+        conn.execute("PRAGMA analysis_limit=0")
+        conn.execute("ANALYZE")
+        return conn.execute("SELECT COUNT(DISTINCT tbl) FROM sqlite_stat1").fetchone()[0]
+    return f"ANALYZE: estatísticas de {db_handler.write_call(run).result()} tabelas"
+
+
+def incremental_vacuum(db_handler, pages=VACUUM_PAGES):
+    # Nunca VACUUM completo: ele renumera rowids de tabelas sem INTEGER PRIMARY KEY (TabelaTeste),
+    # e o índice de busca, sync_mapa e alarmes_marcas guardam esses rowids.
+    # Vacuum incremental só move páginas do fim do arquivo e exige auto_vacuum=INCREMENTAL (bancos novos)
+    def run(conn):
+        mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if mode != 2:
+            return mode, free, 0
+        # O módulo sqlite3 avança o PRAGMA uma vez só, liberando poucas páginas por chamada: repete até o limite
+        remaining = free
+        while remaining and free - remaining < pages:
+            conn.execute(f"PRAGMA incremental_vacuum({pages - (free - remaining)})")
+            current = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if current >= remaining:
+                break
+            remaining = current
+        return mode, free, free - remaining
+    mode, free, released = db_handler.write_call(run).result()
+    if mode != 2:
+        return f"auto_vacuum desligado neste banco: {free} páginas livres reaproveitadas pelas próximas gravações"
+    return f"{released} de {free} páginas livres devolvidas ao sistema"
+
+
+def optimize_search_index(db_handler):
+    # Funde os segmentos do índice FTS5 criados pelos triggers a cada gravação
+    db_handler.write("INSERT INTO busca_manutencao (busca_manutencao) VALUES ('optimize')").result()
+    return "Índice de busca otimizado"
+
+
+def verify_failure_counters(db_handler):
+    # Os contadores de falhas são mantidos por triggers; cargas feitas com triggers desligados os desalinham
+    def run(conn):
+        expected = conn.execute("SELECT COUNT(*) FROM TabelaTeste").fetchone()[0]
+        by_tag, by_kind = conn.execute("""
+            SELECT (SELECT COALESCE(SUM(registros), 0) FROM falhas_por_tag),
+                   (SELECT COALESCE(SUM(quantidade), 0) FROM falhas_por_tipo)
+        """).fetchone()
+        if by_tag == expected and by_kind == expected:
+            return False
+        db_handler.rebuild_failure_counters(conn)
+        return True
+    rebuilt = db_handler.write_call(run).result()
+    return "Contadores de falhas recalculados" if rebuilt else "Contadores de falhas consistentes"
+
+
+def report_folder(db_handler):
+    return os.path.join(os.path.dirname(os.path.abspath(db_handler.db_path)), 'relatorios')
+
+
+def daily_report(db_handler, day=None):
+    # Exporta as medições do dia anterior, uma planilha CSV por tabela
+    day = day or date.today() - timedelta(days=1)
+    folder = report_folder(db_handler)
+    os.makedirs(folder, exist_ok=True)
+    written = {}
+    for table in REPORT_TABLES:
+        dataset = table_dataset(db_handler, table, start=day.isoformat(), end=(day + timedelta(days=1)).isoformat())
+        written[table] = export_dataset(db_handler, dataset, os.path.join(folder, f"{day.isoformat()}_{table}.csv"),
+                                        'csv')
+    return ", ".join(f"{table}: {rows} linhas" for table, rows in written.items())
+
+
+def rotate_archives(db_handler):
+    # Remove relatórios e histórico de execuções mais antigos que o período de retenção
+    cutoff = time.time() - REPORT_RETENTION_DAYS * 86400
+    folder = report_folder(db_handler)
+    removed = 0
+    if os.path.isdir(folder):
+        for entry in os.scandir(folder):
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+    history_cutoff = (datetime.now() - timedelta(days=HISTORY_RETENTION_DAYS)).strftime(TIME_FORMAT)
+    pruned = db_handler.write("DELETE FROM rotinas_execucoes WHERE inicio < ?", (history_cutoff,)).result()
+    return f"{removed} relatórios e {pruned} execuções antigas removidos"
+
+
+# Rotinas padrão: nome -> (cron inicial, função). O cron gravado em rotinas prevalece depois da primeira execução
+DEFAULT_JOBS = {
+    'otimizar_estatisticas': ("0 * * * *", optimize_statistics),
+    'relatorio_diario': ("10 0 * * *", daily_report),
+    'analisar': ("30 2 * * *", analyze),
+    'vacuum_incremental': ("0 3 * * *", incremental_vacuum),
+    'otimizar_busca': ("15 3 * * *", optimize_search_index),
+    'rotacionar_arquivos': ("45 3 * * *", rotate_archives),
+    'verificar_contadores': ("0 4 * * 0", verify_failure_counters),
+    'manutencao_preditiva': ("*/30 * * * *", predictive_tasks),
+}
+
+
+def parse_time(text):
+    return datetime.strptime(text, TIME_FORMAT) if text else None
+
+
+class JobScheduler:
+    # Agendador dentro do processo: uma thread calcula os disparos e entrega as rotinas vencidas a um pool
+    # de workers. O próximo disparo de cada rotina fica em rotinas; na abertura, as que venceram com o
+    # programa fechado rodam uma vez só (catch-up), não uma vez por disparo perdido.
+    # Gravações das rotinas passam pelo escritor único, como as demais
+    def __init__(self, db_handler, jobs=None, workers=MAX_WORKERS, poll_interval=POLL_INTERVAL, catch_up=True):
+        self.db_handler = db_handler
+        self.jobs = dict(jobs or DEFAULT_JOBS)
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.catch_up = catch_up
+        self.schedules = {}
+        self.next_runs = {}
+        self._running = set()
+        self._executor = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+            self._thread = threading.Thread(target=self._run, name='job-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+            # Rotinas em andamento terminam; as que ainda não começaram são descartadas
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def _run(self):
+        try:
+            self.load(startup=True)
+        except Exception as e:
+            print(f"Erro ao carregar rotinas agendadas: {e}")
+        while not self._stop.is_set():
+            try:
+                self.load()
+                self.dispatch_due()
+            except Exception as e:
+                print(f"Erro no agendador de rotinas: {e}")
+            self._wake.wait(self.seconds_to_next())
+            self._wake.clear()
+
+    def load(self, startup=False):
+        # Sincroniza com rotinas: cria as que faltam, aplica crons editados e desativações
+        now = datetime.now()
+        stored = {name: (cron, active, parse_time(next_run)) for name, cron, active, next_run in
+                  self.db_handler.read("SELECT nome, cron, ativa, proxima_execucao FROM rotinas")}
+        missing = []
+        with self._lock:
+            for name, (cron, _func) in self.jobs.items():
+                if name not in stored:
+                    schedule = CronSchedule(cron)
+                    stored[name] = (cron, 1, schedule.next_after(now))
+                    missing.append((name, cron, stored[name][2].strftime(TIME_FORMAT)))
+                cron, active, next_run = stored[name]
+                if not active:
+                    self.schedules.pop(name, None)
+                    self.next_runs.pop(name, None)
+                    continue
+                schedule = self.schedules.get(name)
+                if schedule is None or schedule.expression != cron:
+                    try:
+                        schedule = CronSchedule(cron)
+                    except ValueError as e:
+                        print(f"Rotina {name} ignorada: {e}")
+                        continue
+                    if name in self.schedules:
+                        # Cron editado: o disparo salvo era do agendamento antigo
+                        next_run = schedule.next_after(now)
+                    self.schedules[name] = schedule
+                if startup and not self.catch_up and next_run is not None and next_run <= now:
+                    next_run = schedule.next_after(now)
+                self.next_runs[name] = next_run
+        if missing:
+            self.db_handler.write_many(
+                "INSERT OR IGNORE INTO rotinas (nome, cron, proxima_execucao) VALUES (?, ?, ?)", missing).result()
+        if startup:
+            # Execuções que estavam em andamento quando o programa fechou
+            self.db_handler.write(
+                "UPDATE rotinas_execucoes SET status = 'interrompida' WHERE status = 'executando'").result()
+
+    def seconds_to_next(self):
+        now = datetime.now()
+        with self._lock:
+            pending = [moment for name, moment in self.next_runs.items()
+                       if moment is not None and name not in self._running]
+        if not pending:
+            return self.poll_interval
+        return min(max((min(pending) - now).total_seconds(), 0.0), self.poll_interval)
+
+    def dispatch_due(self):
+        now = datetime.now()
+        due = []
+        with self._lock:
+            for name, moment in self.next_runs.items():
+                if moment is not None and moment <= now and name not in self._running:
+                    # O próximo disparo parte de agora: vários disparos perdidos viram uma execução só
+                    self.next_runs[name] = self.schedules[name].next_after(now)
+                    self._running.add(name)
+                    due.append((name, moment))
+        for name, moment in due:
+            self.db_handler.write("UPDATE rotinas SET proxima_execucao = ? WHERE nome = ?",
+                                  (self.next_runs[name].strftime(TIME_FORMAT) if self.next_runs[name] else None,
+                                   name)).result()
+            self._executor.submit(self._execute, name, moment)
+        return [name for name, _moment in due]
+
+    def _execute(self, name, scheduled):
+        try:
+            self.run_job(name, scheduled)
+        finally:
+            with self._lock:
+                self._running.discard(name)
+            self._wake.set()
+
+    def run_job(self, name, scheduled=None):
+        # Executa a rotina e registra a execução: começa como 'executando' e termina com duração e resultado
+        func = self.jobs[name][1]
+        started = datetime.now()
+        run_id = self.db_handler.write_call(lambda conn: conn.execute("""
+            INSERT INTO rotinas_execucoes (rotina, agendada_para, inicio, status) VALUES (?, ?, ?, 'executando')
+        """, (name, scheduled.strftime(TIME_FORMAT) if scheduled else None,
+              started.strftime(TIME_FORMAT))).lastrowid).result()
+        start = time.perf_counter()
+        try:
+            with span('scheduler.job', 'jobs', job=name):
+                result, status = func(self.db_handler), 'ok'
+        except Exception as e:
+            result, status = str(e), 'erro'
+            print(f"Erro na rotina {name}: {e}")
+        duration = time.perf_counter() - start
+
+        def finish(conn):
+            conn.execute("UPDATE rotinas_execucoes SET duracao = ?, status = ?, resultado = ? WHERE id = ?",
+                         (duration, status, result, run_id))
+            conn.execute("UPDATE rotinas SET ultima_execucao = ? WHERE nome = ?", (started.strftime(TIME_FORMAT), name))
+        self.db_handler.write_call(finish).result()
+        return status, result, duration
+
+    def status(self):
+        # [(nome, cron, ativa, próxima, última, status da última, duração da última)]
+        return self.db_handler.read("""
+            SELECT r.nome, r.cron, r.ativa, r.proxima_execucao, r.ultima_execucao, e.status, e.duracao
+            FROM rotinas r
+            LEFT JOIN rotinas_execucoes e ON e.id = (
+                SELECT MAX(id) FROM rotinas_execucoes WHERE rotina = r.nome)
+            ORDER BY r.proxima_execucao
+        """)
+
+    def history(self, name=None, limit=50):
+        where, params = (" WHERE rotina = ?", (name,)) if name else ("", ())
+        return self.db_handler.read(f"""
+            SELECT rotina, agendada_para, inicio, duracao, status, resultado
+            FROM rotinas_execucoes{where} ORDER BY id DESC LIMIT ?
+        """, (*params, limit))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rotinas agendadas de manutenção do banco e relatórios")
+    parser.add_argument('--db', default='mesalpha.db')
+    parser.add_argument('--run', metavar='ROTINA', help="Executa uma rotina agora e registra no histórico")
+    parser.add_argument('--history', action='store_true', help="Mostra as últimas execuções")
+    parser.add_argument('--watch', action='store_true',
+                        help="Mantém o agendador rodando em primeiro plano (sem a interface)")
+    args = parser.parse_args()
+
+    from database.db_handler import DatabaseHandler
+    db = DatabaseHandler(args.db)
+    scheduler = JobScheduler(db)
+    try:
+        if args.run:
+            if args.run not in scheduler.jobs:
+                parser.error(f"Rotina desconhecida: {args.run} (disponíveis: {', '.join(scheduler.jobs)})")
+            status, result, duration = scheduler.run_job(args.run)
+            print(f"{args.run}: {status} em {duration:.2f} s: {result}")
+        elif args.history:
+            for name, scheduled, started, duration, status, result in scheduler.history():
+                shown = f"{duration:.2f} s" if duration is not None else "-"
+                print(f"{started}  {name:<22} {status:<11} {shown:>9}  agendada: {scheduled or 'manual'}  {result or ''}")
+        elif args.watch:
+            scheduler.start()
+            while True:
+                time.sleep(3600)
+        else:
+            scheduler.load()
+            for name, cron, active, next_run, last_run, status, duration in scheduler.status():
+                shown = f"{status} ({duration:.2f} s)" if status and duration is not None else (status or "-")
+                print(f"{name:<22} {cron:<12} {'ativa' if active else 'inativa':<8} próxima: {next_run}  "
+                      f"última: {last_run or 'nunca'}  {shown}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scheduler.stop()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
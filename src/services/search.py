@@ -0,0 +1,191 @@
+import argparse
+import html
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import time
+from database.db_handler import LOCAL_SOURCE, ISO_DATETIME
+from utils.tracing import traced
+
+MAX_RESULTS = 50
+MAX_FACETS = 20
+# Só as RANK_WINDOW ocorrências mais recentes são ordenadas por relevância e contadas nas facetas:
+# o índice entrega rowids em ordem decrescente sem ordenar, e uma busca genérica ("motor") em milhões
+# de ordens não paga bm25 e destaque para centenas de milhares de linhas que ninguém vai ler
+RANK_WINDOW = 5000
+# Marcadores de destaque que não aparecem em texto digitado; viram <b> depois do html.escape
+MARK_START = '\x02'
+MARK_END = '\x03'
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+INICIO = ISO_DATETIME.format(column='t.DataInicial')
+MONTH = f"substr({INICIO}, 1, 7)"
+
+
+def build_match(text, tag=None):
+    # Texto livre -> consulta FTS5: cada palavra vira prefixo ("rolam"* acha "rolamento") e todas são exigidas.
+    # As aspas impedem que operadores do FTS5 (AND, NEAR, -, :) digitados causem erro de sintaxe
+    tokens = TOKEN_PATTERN.findall(text or "")
+    if not tokens:
+        return ""
+    match = " ".join(f'"{token}"*' for token in tokens)
+    if tag is not None:
+        quoted = tag.replace('"', '""')
+        match = f'({match}) AND TAG : "{quoted}"'
+    return match
+
+
+def to_html(marked):
+    return html.escape(marked or "").replace(MARK_START, "<b>").replace(MARK_END, "</b>")
+
+
+def month_range(month):
+    # 'AAAA-MM' -> limites ISO [primeiro dia do mês, primeiro dia do mês seguinte)
+    year, number = map(int, month.split('-'))
+    return f"{month}-01", f"{year + number // 12:04d}-{number % 12 + 1:02d}-01"
+
+
+class MaintenanceSearch:
+    def __init__(self, db_handler, source=LOCAL_SOURCE):
+        self.db_handler = db_handler
+        self.source = source
+
+    def recent_matches(self, columns, match, month):
+        # Subconsulta com as RANK_WINDOW ocorrências mais recentes; o filtro de mês precisa da data de TabelaTeste
+        source = "busca_manutencao"
+        where = "busca_manutencao MATCH ?"
+        params = [match]
+        if month:
+            source += " JOIN TabelaTeste t ON t.rowid = busca_manutencao.rowid"
+            where += f" AND {INICIO} >= ? AND {INICIO} < ?"
+            params.extend(month_range(month))
+        return f"""
+            SELECT busca_manutencao.rowid AS rowid, {columns}
+            FROM {source}
+            WHERE {where}
+            ORDER BY busca_manutencao.rowid DESC LIMIT {RANK_WINDOW}
+        """, params
+
+    @traced('search.query', 'data')
+    def search(self, text, tag=None, month=None, limit=MAX_RESULTS):
+        # [(rowid, TAG, DataInicial, falha em HTML, trecho da descrição em HTML)], mais relevantes primeiro.
+        # bm25 pesa a Falha 2x: um termo no tipo de falha diz mais que uma menção solta na descrição
+        match = build_match(text, tag)
+        if not match:
+            return []
+        recent, params = self.recent_matches(f"""
+            bm25(busca_manutencao, 1.0, 2.0, 0.5) AS score,
+            highlight(busca_manutencao, 1, '{MARK_START}', '{MARK_END}') AS falha,
+            snippet(busca_manutencao, 0, '{MARK_START}', '{MARK_END}', '…', 16) AS trecho
+        """, match, month)
+        rows = self.db_handler.read(f"""
+            SELECT t.rowid, t.TAG, t.DataInicial, f.falha, f.trecho
+            FROM ({recent}) f JOIN TabelaTeste t ON t.rowid = f.rowid
+            ORDER BY f.score
+            LIMIT ?
+        """, (*params, limit), self.source)
+        return [(rowid, tag_name, started, to_html(failure), to_html(snippet))
+                for rowid, tag_name, started, failure, snippet in rows]
+
+    @traced('search.facets', 'data')
+    def facets(self, text, tag=None, month=None):
+        # Contagens por TAG e por mês numa única passada sobre a janela recente sem os filtros de faceta;
+        # cada faceta é somada ignorando o próprio filtro, para que as outras opções continuem visíveis.
+        # 'total' é exato; 'parcial' indica que as facetas cobrem só as RANK_WINDOW ocorrências mais recentes
+        match = build_match(text)
+        if not match:
+            return {'total': 0, 'parcial': False, 'tags': [], 'months': []}
+        recent, params = self.recent_matches("1", match, None)
+        cells = self.db_handler.read(f"""
+            SELECT t.TAG, {MONTH} AS mes, COUNT(*)
+            FROM ({recent}) f JOIN TabelaTeste t ON t.rowid = f.rowid
+            GROUP BY t.TAG, mes
+        """, tuple(params), self.source)
+        tags, months = {}, {}
+        for tag_name, period, count in cells:
+            if month is None or period == month:
+                tags[tag_name] = tags.get(tag_name, 0) + count
+            if tag is None or tag_name == tag:
+                months[period] = months.get(period, 0) + count
+
+        filtered = build_match(text, tag)
+        if month:
+            total = self.db_handler.read(f"""
+                SELECT COUNT(*) FROM busca_manutencao JOIN TabelaTeste t ON t.rowid = busca_manutencao.rowid
+                WHERE busca_manutencao MATCH ? AND {INICIO} >= ? AND {INICIO} < ?
+            """, (filtered, *month_range(month)), self.source)[0][0]
+        else:
+            total = self.db_handler.read(
+                "SELECT COUNT(*) FROM busca_manutencao WHERE busca_manutencao MATCH ?", (filtered,), self.source)[0][0]
+        return {
+            'total': total,
+            'parcial': sum(count for _, _, count in cells) >= RANK_WINDOW,
+            'tags': sorted(tags.items(), key=lambda item: (-item[1], item[0]))[:MAX_FACETS],
+            'months': sorted(months.items(), reverse=True)[:MAX_FACETS],
+        }
+
+
+WORDS = ("rolamento", "vazamento", "motor", "superaquecimento", "correia", "desalinhada", "ruído", "vibração",
+         "válvula", "travada", "sensor", "falha", "elétrica", "hidráulica", "óleo", "pressão", "baixa", "alta",
+         "troca", "inspeção", "lubrificação", "acoplamento", "rompido", "disjuntor", "desarmado", "bomba",
+         "cavitação", "redutor", "engrenagem", "desgaste", "painel", "contator", "queimado", "filtro", "entupido")
+FAILURES = ("Elétrica", "Mecânica", "Hidráulica", "Pneumática", "Instrumentação")
+
+
+def benchmark(rows=2_000_000, queries=("rolam", "vazamento óleo", "motor superaq", "bomba cavit", "contator")):
+    rng = random.Random(5)
+    with tempfile.TemporaryDirectory() as folder:
+        from database.db_handler import DatabaseHandler
+        path = os.path.join(folder, 'busca.db')
+        db = DatabaseHandler(path)
+        start = time.perf_counter()
+        conn = sqlite3.connect(path)
+        with conn:
+            conn.executemany("""
+                INSERT INTO TabelaTeste (DataInicial, DataFinal, TAG, Tipo, Falha, Descrição, Horímetro, Operador)
+                VALUES (?, '', ?, 'Corretiva', ?, ?, '01:00:00', 'operador')
+            """, ((f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.choice((2023, 2024, 2025))} 08:00:00",
+                   f"TAG-{rng.randint(1, 300):03d}", rng.choice(FAILURES),
+                   " ".join(rng.choices(WORDS, k=rng.randint(4, 12)))) for _ in range(rows)))
+        conn.close()
+        print(f"{rows:,} registros inseridos com índice mantido por triggers em {time.perf_counter() - start:.1f} s")
+
+        search = MaintenanceSearch(db)
+        for text in queries:
+            search.search(text)
+            start = time.perf_counter()
+            results = search.search(text)
+            ranked = time.perf_counter() - start
+            start = time.perf_counter()
+            facets = search.facets(text)
+            faceted = time.perf_counter() - start
+            top_tag = facets['tags'][0][0] if facets['tags'] else None
+            start = time.perf_counter()
+            search.search(text, tag=top_tag)
+            filtered = time.perf_counter() - start
+            print(f"'{text}': {facets['total']:,} ocorrências; top {len(results)} em {ranked * 1000:.1f} ms, "
+                  f"facetas em {faceted * 1000:.0f} ms, filtrado por TAG em {filtered * 1000:.1f} ms")
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Busca textual nas ordens de manutenção")
+    parser.add_argument('--db', default='mesalpha.db')
+    parser.add_argument('--benchmark', action='store_true', help="Mede a busca com 2 milhões de registros sintéticos")
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('text', nargs='?')
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark(args.rows)
+        return
+
+    from database.db_handler import DatabaseHandler
+    db = DatabaseHandler(args.db)
+    for rowid, tag, started, failure, snippet in MaintenanceSearch(db).search(args.text or ""):
+        print(f"{rowid:>8}  {tag:<10} {started}  {failure}: {snippet}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
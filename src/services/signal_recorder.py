@@ -0,0 +1,115 @@
+import argparse
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+from analytics.timeseries import SignalStore
+from utils.tracing import span
+
+BUCKET_SECONDS = 60
+FLUSH_INTERVAL = 60.0
+
+
+def to_texts(seconds):
+    # Hora local 'AAAA-MM-DD HH:MM:SS', a mesma convenção de paradas/maquinas (modbus_gateway.to_text);
+    # o lote repete poucos inícios de balde, então cada um é formatado uma vez só
+    starts, inverse = np.unique(np.asarray(seconds, dtype=np.float64), return_inverse=True)
+    texts = np.array([time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(start)) for start in starts], dtype=object)
+    return texts[inverse]
+
+
+class SignalRecorder:
+    # Descarrega periodicamente o SignalStore em baldes agregados (média/mín/máx/último) na tabela
+    # sinais_agregados; os sinais brutos de alta frequência ficam só na memória, com tamanho fixo
+    def __init__(self, db_handler, store=None, bucket_seconds=BUCKET_SECONDS, interval=FLUSH_INTERVAL):
+        self.db_handler = db_handler
+        self.store = store if store is not None else SignalStore()
+        self.bucket_seconds = bucket_seconds
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='signal-recorder', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Erro ao gravar sinais agregados: {e}")
+
+    def flush(self, until=None):
+        with span('signals.flush', 'data'):
+            rows = self.store.downsample(self.bucket_seconds, until)
+            if not rows:
+                return 0
+            keys, starts, *stats = zip(*rows)
+            stamps = to_texts(starts)
+            records = [(tag, signal, stamp, float(mean), float(low), float(high), float(last), count)
+                       for (tag, signal), stamp, mean, low, high, last, count in zip(keys, stamps, *stats)]
+            self.db_handler.write_many("""
+                INSERT OR REPLACE INTO sinais_agregados
+                    (tag, sinal, inicio, media, minimo, maximo, ultimo, amostras)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, records).result()
+            return len(records)
+
+
+def benchmark(tags=500, hz=10, seconds=600, capacity=3000):
+    # tags séries amostradas a hz por 'seconds' segundos simulados, em ciclos de leitura (append_tick)
+    rng = np.random.default_rng(11)
+    store = SignalStore(capacity=capacity)
+    keys = [(f"TAG-{i:03d}", 'velocidade') for i in range(tags)]
+    base = 1_700_000_000.0
+    steps = hz * seconds
+    level = rng.uniform(50, 150, tags).astype(np.float32)
+
+    start = time.perf_counter()
+    for step in range(steps):
+        store.append_tick(keys, base + step / hz, level + rng.standard_normal(tags, dtype=np.float32))
+    elapsed = time.perf_counter() - start
+    samples = tags * steps
+    print(f"{tags} TAGs x {hz} Hz x {seconds} s = {samples:,} amostras em {elapsed:.2f} s "
+          f"({samples / elapsed:,.0f} amostras/s, {elapsed / steps * 1000:.3f} ms por ciclo)")
+    print(f"Memória dos buffers: {store.memory_bytes() / 1024 / 1024:.1f} MB "
+          f"(fixa: {capacity} amostras por série)")
+
+    start = time.perf_counter()
+    for key in keys:
+        store.window(key, base + seconds - 60, base + seconds)
+    print(f"Janela de 60 s de todas as séries: {(time.perf_counter() - start) * 1000:.2f} ms (views, sem cópia)")
+
+    with tempfile.TemporaryDirectory() as folder:
+        from database.db_handler import DatabaseHandler
+        db = DatabaseHandler(os.path.join(folder, 'sinais.db'))
+        recorder = SignalRecorder(db, store)
+        start = time.perf_counter()
+        written = recorder.flush(until=base + seconds)
+        print(f"Descarga agregada ({BUCKET_SECONDS} s): {written} linhas em {time.perf_counter() - start:.2f} s")
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Armazenamento de sinais de máquinas em memória")
+    parser.add_argument('--tags', type=int, default=500)
+    parser.add_argument('--hz', type=int, default=10)
+    parser.add_argument('--seconds', type=int, default=600)
+    parser.add_argument('--capacity', type=int, default=3000)
+    args = parser.parse_args()
+    benchmark(args.tags, args.hz, args.seconds, args.capacity)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import argparse
+import copy
+import multiprocessing
+import time
+import numpy as np
+from analytics.reliability import HOUR
+from analytics.simulation import (HORIZON_HOURS, fit_lognormal, fit_weibull, run_scenarios, summarize)
+from services.predictive_maintenance import FAILURE_TYPE, HOURS, to_seconds
+from utils.tracing import span, traced
+
+ALL_CLASSES = 'Todas'
+DEFAULT_TRIALS = 100_000
+# Custos padrão (R$): hora de máquina parada, ordem corretiva e ordem preventiva
+DEFAULT_COSTS = {'downtime': 800.0, 'corrective': 2500.0, 'preventive': 900.0}
+
+
+def tag_class(tag):
+    # Classe da TAG é o prefixo antes do hífen: 'TCR-24' -> 'TCR'
+    return tag.split('-', 1)[0] if tag else ''
+
+
+def fetch_history(db_handler):
+    # Intervalos de operação entre ordens consecutivas da mesma TAG (horas), se terminaram em falha, e as durações
+    # de reparo (Corretiva) e de preventiva, todos rotulados pela classe da TAG. Paradas das máquinas cujo nome é
+    # uma TAG entram como durações de reparo da classe
+    rows = db_handler.read(f"""
+        SELECT COALESCE(TAG, ''), DataInicial, COALESCE(DataFinal, ''), Tipo = ?, {HOURS}
+        FROM TabelaTeste
+        WHERE DataInicial IS NOT NULL AND DataInicial != ''
+    """, (FAILURE_TYPE,))
+    if not rows:
+        return None
+    tags, starts, ends, failed, hours = zip(*rows)
+    index = {}
+    codes = np.fromiter((index.setdefault(tag, len(index)) for tag in tags), dtype=np.int64, count=len(tags))
+    classes = np.array([tag_class(tag) for tag in index])
+    starts, ends = to_seconds(starts), to_seconds(ends)
+    failed = np.array(failed, dtype=bool)
+    hours = np.array(hours, dtype=np.float64)
+    order = np.lexsort((starts, codes))
+    codes, starts, ends, failed, hours = codes[order], starts[order], ends[order], failed[order], hours[order]
+
+    # Intervalo i: do fim da ordem i ao início da ordem i + 1 da mesma TAG; termina em falha se a seguinte é Corretiva
+    with np.errstate(invalid='ignore'):
+        gaps = (starts[1:] - ends[:-1]) / HOUR
+        valid = (codes[1:] == codes[:-1]) & (gaps > 0)
+    stops = db_handler.read("""
+        SELECT m.name, (julianday(p.end_time) - julianday(p.start_time)) * 24
+        FROM paradas p JOIN maquinas m ON m.id = p.machine_id
+        WHERE p.end_time > p.start_time
+    """)
+    return {
+        'intervals': gaps[valid],
+        'interval_failed': failed[1:][valid],
+        'interval_class': classes[codes[1:][valid]],
+        'repairs': hours[failed],
+        'repair_class': classes[codes[failed]],
+        'preventives': hours[~failed],
+        'preventive_class': classes[codes[~failed]],
+        'stops': np.array([duration for _name, duration in stops], dtype=np.float64),
+        'stop_class': np.array([tag_class(name) for name, _duration in stops]),
+        'units': {name: int(np.sum(classes == name)) for name in np.unique(classes)},
+    }
+
+
+def fit_class(history, name=ALL_CLASSES, horizon=HORIZON_HOURS):
+    # Parâmetros de simulação de uma classe; o que a classe não tem histórico para ajustar vem da frota inteira
+    # e fica listado em 'pooled'
+    def select(values, labels):
+        return values if name == ALL_CLASSES else values[labels == name]
+
+    def fit(label, fitter, *samples):
+        fitted = fitter(*(select(values, labels) for values, labels in samples))
+        if fitted is None and name != ALL_CLASSES:
+            pooled.append(label)
+            fitted = fitter(*(values for values, _labels in samples))
+        return fitted
+
+    pooled = []
+    intervals = (history['intervals'], history['interval_class'])
+    failed = (history['interval_failed'], history['interval_class'])
+    repairs = (np.concatenate([history['repairs'], history['stops']]),
+               np.concatenate([history['repair_class'], history['stop_class']]))
+    failure = fit('falhas', fit_weibull, intervals, failed)
+    repair = fit('reparos', fit_lognormal, repairs)
+    preventive = fit('preventivas', fit_lognormal, (history['preventives'], history['preventive_class']))
+    if failure is None or repair is None:
+        raise ValueError("Histórico insuficiente para ajustar falhas e reparos")
+    # Intervalo preventivo atual: média dos intervalos encerrados por preventiva; sem preventivas, roda até falhar
+    planned = select(*intervals)[~select(*failed)]
+    units = sum(history['units'].values()) if name == ALL_CLASSES else history['units'].get(name, 0)
+    return {
+        'units': max(units, 1),
+        'failure': failure,
+        'repair': repair,
+        'preventive': preventive or repair,
+        'interval': float(planned.mean()) if len(planned) else np.inf,
+        'horizon': horizon,
+        'costs': dict(DEFAULT_COSTS),
+        'pooled': pooled,
+    }
+
+
+def class_names(db_handler):
+    tags = db_handler.read("SELECT DISTINCT TAG FROM TabelaTeste WHERE TAG IS NOT NULL AND TAG != ''")
+    return [ALL_CLASSES] + sorted({tag_class(tag) for tag, in tags})
+
+
+@traced('simulation.compare', 'data')
+def compare_interval(params, change, trials=DEFAULT_TRIALS, seed=0, workers=None):
+    # Cenário atual contra o intervalo preventivo multiplicado por (1 + change), ex.: change=-0.2 encurta 20%
+    scenario = copy.deepcopy(params)
+    scenario['interval'] = params['interval'] * (1 + change)
+    start = time.perf_counter()
+    with span('simulation.run', 'data', trials=trials):
+        base, changed = run_scenarios([params, scenario], trials, seed, workers)
+    return {
+        'base': {name: summarize(values) for name, values in base.items()},
+        'scenario': {name: summarize(values) for name, values in changed.items()},
+        'difference': {name: summarize(changed[name] - base[name]) for name in ('availability', 'cost')},
+        'trials': trials,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def benchmark(trials=DEFAULT_TRIALS, workers=None):
+    workers = multiprocessing.cpu_count() if workers is None else workers
+    params = {'units': 5, 'failure': (1.6, 900.0), 'repair': (1.5, 0.8), 'preventive': (0.7, 0.4),
+              'interval': 600.0, 'horizon': HORIZON_HOURS, 'costs': dict(DEFAULT_COSTS)}
+    timings = {}
+    outcomes = {}
+    for count in sorted({1, workers}):
+        start = time.perf_counter()
+        outcomes[count] = run_scenarios([params], trials, seed=7, workers=count)[0]
+        timings[count] = time.perf_counter() - start
+        print(f"{trials:,} tentativas x {params['units']} unidades, {count} processo(s): {timings[count]:.2f} s "
+              f"({trials / timings[count]:,.0f} tentativas/s)".replace(',', '.'))
+    reference = outcomes[1]['availability']
+    same = all(np.array_equal(reference, outcome['availability']) for outcome in outcomes.values())
+    summary = summarize(reference)
+    print(f"Disponibilidade média {summary['mean']:.3%} (IC 95% {summary['ci'][0]:.3%} – {summary['ci'][1]:.3%}); "
+          f"resultado idêntico entre números de processos: {'sim' if same else 'NÃO'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulação Monte Carlo de estratégias de manutenção")
+    parser.add_argument('--db', default='mesalpha.db')
+    parser.add_argument('--classe', default=ALL_CLASSES, help="Prefixo de TAG (ex.: TC) ou 'Todas'")
+    parser.add_argument('--mudanca', type=float, default=-0.2, help="Variação do intervalo preventivo (-0.2 = -20%%)")
+    parser.add_argument('--tentativas', type=int, default=DEFAULT_TRIALS)
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--processos', type=int, default=None)
+    parser.add_argument('--benchmark', action='store_true', help="Mede tentativas/s com parâmetros sintéticos")
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark(args.tentativas, args.processos)
+        return
+
+    from database.db_handler import DatabaseHandler
+    db = DatabaseHandler(args.db)
+    try:
+        history = fetch_history(db)
+    finally:
+        db.close()
+    if history is None:
+        print("Sem ordens em TabelaTeste")
+        return
+    params = fit_class(history, args.classe)
+    shape, scale = params['failure']
+    print(f"Classe {args.classe}: {params['units']} TAGs, Weibull forma {shape:.2f} escala {scale:,.0f} h, "
+          f"intervalo preventivo {params['interval']:,.0f} h"
+          + (f" (da frota: {', '.join(params['pooled'])})" if params['pooled'] else ""))
+    result = compare_interval(params, args.mudanca, args.tentativas, args.semente, args.processos)
+    for label, key in (("Atual", 'base'), (f"Intervalo {args.mudanca:+.0%}", 'scenario')):
+        availability, cost = result[key]['availability'], result[key]['cost']
+        print(f"{label:<16} disponibilidade {availability['mean']:.3%} "
+              f"[{availability['ci'][0]:.3%}, {availability['ci'][1]:.3%}]  "
+              f"custo/ano R$ {cost['mean']:,.0f} [{cost['ci'][0]:,.0f}, {cost['ci'][1]:,.0f}]")
+    print(f"{result['trials']:,} tentativas em {result['seconds']:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
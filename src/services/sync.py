@@ -0,0 +1,342 @@
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from utils.tracing import span
+
+try:
+    import pyodbc
+except ImportError:
+    pyodbc = None
+
+SYNC_INTERVAL = 30.0
+BATCH_SIZE = 5000
+
+# Tabela -> (chave na origem, expressão de watermark na origem). O watermark precisa crescer a cada
+# inserção/alteração: ID para tabelas só de inserção, coluna de data de alteração ou
+# CAST(rowversion AS BIGINT) no SQL Server. Empates no watermark são desfeitos pela chave
+# Com ID como watermark, alterações de linhas já sincronizadas não são vistas: onde a origem as tem, configure
+# uma coluna de alteração com sync_tables/--watermark (ex.: TabelaTeste=CAST(versao AS BIGINT))
+SYNC_TABLES = {
+    'ProducaoSoja': ('ID', 'ID'),
+    'FareloSojaTostado': ('ID', 'ID'),
+    'TabelaTeste': ('ID', 'ID'),
+}
+
+# Tabelas sem chave local -> (chave natural, coluna de desempate). Na primeira sincronização o banco local já
+# pode ter as linhas (ex.: a cópia em uso da planta): a linha da origem é ligada à linha local ainda sem mapa com a
+# mesma chave natural em vez de duplicada. DataFinal só desempata: uma ordem aberta localmente pode ter sido
+# fechada na origem
+NATURAL_KEYS = {
+    'TabelaTeste': (('TAG', 'DataInicial'), 'DataFinal'),
+}
+
+
+def sync_tables(watermarks=()):
+    # SYNC_TABLES com o watermark de algumas tabelas trocado: itens 'Tabela=expressão'
+    tables = dict(SYNC_TABLES)
+    for spec in watermarks:
+        table, separator, expression = spec.partition('=')
+        table, expression = table.strip(), expression.strip()
+        if not separator or table not in tables or not expression:
+            raise ValueError(f"Watermark inválido: {spec!r} (use Tabela=expressão, com Tabela em "
+                             f"{', '.join(tables)})")
+        tables[table] = (tables[table][0], expression)
+    return tables
+
+
+class SqliteSource:
+    # Origem em arquivo SQLite: a mesma API do servidor central, usada em testes e em plantas sem SQL Server
+    def __init__(self, path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Banco de origem não encontrado: {path}")
+        self.path = path
+        self.name = path
+
+    def connect(self):
+        return sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=5.0)
+
+    def batch_query(self, body, limit):
+        return f"SELECT {body} LIMIT {int(limit)}"
+
+
+class OdbcSource:
+    def __init__(self, connection_string):
+        if pyodbc is None:
+            raise RuntimeError("Sincronização com SQL Server requer o pacote pyodbc")
+        self.connection_string = connection_string
+        self.name = connection_string.split(';')[0]
+
+    def connect(self):
+        return pyodbc.connect(self.connection_string, readonly=True, timeout=30)
+
+    def batch_query(self, body, limit):
+        return f"SELECT TOP ({int(limit)}) {body}"
+
+
+def open_source(spec):
+    # 'sqlite:caminho.db' para um arquivo SQLite; qualquer outra coisa é uma connection string ODBC
+    if spec.startswith('sqlite:'):
+        return SqliteSource(spec[len('sqlite:'):])
+    return OdbcSource(spec)
+
+
+class SyncEngine:
+    # Puxa da origem só as linhas com watermark acima do último aplicado, em lotes ordenados por
+    # (watermark, chave), e aplica cada lote com upserts numa única transação junto com o novo
+    # watermark: uma interrupção no meio recomeça do último lote gravado, sem duplicar nem pular linhas
+    def __init__(self, db_handler, source, tables=None, batch_size=BATCH_SIZE, interval=SYNC_INTERVAL):
+        self.db_handler = db_handler
+        self.source = source
+        self.tables = dict(tables or SYNC_TABLES)
+        self.batch_size = batch_size
+        self.interval = interval
+        self._columns = {}
+        self._source_keys = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='sync', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"Erro ao sincronizar com {self.source.name}: {e}")
+            self._stop.wait(self.interval)
+
+    def local_columns(self, table):
+        if table not in self._columns:
+            self._columns[table] = [row[1] for row in self.db_handler.read(f"PRAGMA table_info({table})")]
+        return self._columns[table]
+
+    def source_key(self, conn, table):
+        # Origem sem a coluna chave (ex.: outro mesalpha.db, cujo TabelaTeste não tem ID): rowid vira a chave e,
+        # se o watermark era a própria chave, também o watermark
+        if table not in self._source_keys:
+            key, watermark = self.tables[table]
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT * FROM {table} WHERE 1 = 0")
+            names = {column[0].lower() for column in cursor.description}
+            if key.lower() not in names:
+                watermark = 'rowid' if watermark == key else watermark
+                key = 'rowid'
+            self._source_keys[table] = (key, watermark)
+        return self._source_keys[table]
+
+    def state(self, table):
+        rows = self.db_handler.read(
+            "SELECT watermark, chave, linhas, sincronizado_em FROM sync_estado WHERE tabela = ?", (table,))
+        return rows[0] if rows else (None, None, 0, None)
+
+    def sync(self):
+        with self._lock:
+            applied = {}
+            conn = self.source.connect()
+            try:
+                for table in self.tables:
+                    if self._stop.is_set():
+                        break
+                    try:
+                        applied[table] = self.sync_table(conn, table)
+                    except Exception as e:
+                        self.record_error(table, e)
+                        print(f"Erro ao sincronizar {table}: {e}")
+            finally:
+                conn.close()
+            return applied
+
+    def sync_table(self, conn, table):
+        key, watermark = self.source_key(conn, table)
+        columns = self.local_columns(table)
+        last_watermark, last_key, _count, _synced = self.state(table)
+        total = 0
+        while not self._stop.is_set():
+            query, params = self.batch_query(table, key, watermark, columns, last_watermark, last_key)
+            with span('sync.fetch', 'sync', table=table):
+                batch = conn.cursor().execute(query, params).fetchall()
+            if not batch:
+                break
+            with span('sync.apply', 'sync', table=table, rows=len(batch)):
+                last_watermark, last_key = batch[-1][1], batch[-1][0]
+                self.apply(table, key, columns, batch, last_watermark, last_key)
+            total += len(batch)
+            if len(batch) < self.batch_size:
+                break
+        return total
+
+    def batch_query(self, table, key, watermark, columns, last_watermark, last_key):
+        body = f"{key} AS sync_chave, {watermark} AS sync_watermark, {', '.join(columns)} FROM {table}"
+        params = ()
+        if last_watermark is not None:
+            # Paginação por chave: (watermark, chave) > (último watermark, última chave)
+            body += f" WHERE ({watermark} > ? OR ({watermark} = ? AND {key} > ?))"
+            params = (last_watermark, last_watermark, last_key)
+        body += f" ORDER BY {watermark}, {key}"
+        return self.source.batch_query(body, self.batch_size), params
+
+    def apply(self, table, key, columns, batch, last_watermark, last_key):
+        rows = [tuple(row[2:]) for row in batch]
+        keys = [row[0] for row in batch]
+        assignments = ", ".join(f"{column} = excluded.{column}" for column in columns if column != key)
+        placeholders = ", ".join("?" for _ in columns)
+        now = time.strftime("%Y-%m-%d %H:%M:%S")
+
+        def write(conn):
+            if key in columns:
+                # A chave da origem é a chave local: upsert em lote
+                conn.executemany(f"""
+                    INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})
+                    ON CONFLICT({key}) DO UPDATE SET {assignments}
+                """, rows)
+            else:
+                # Sem chave local (TabelaTeste): sync_mapa liga a chave da origem ao rowid local
+                mapped = dict(conn.execute(
+                    f"SELECT chave_origem, rowid_local FROM sync_mapa WHERE tabela = ? "
+                    f"AND chave_origem IN ({', '.join('?' for _ in keys)})", (table, *map(str, keys))).fetchall())
+                updates = [row + (mapped[str(k)],) for k, row in zip(keys, rows) if str(k) in mapped]
+                if updates:
+                    conn.executemany(
+                        f"UPDATE {table} SET {', '.join(f'{column} = ?' for column in columns)} WHERE rowid = ?",
+                        updates)
+                for k, row in zip(keys, rows):
+                    if str(k) in mapped:
+                        continue
+                    rowid = self.match_local(conn, table, columns, row)
+                    if rowid is not None:
+                        conn.execute(
+                            f"UPDATE {table} SET {', '.join(f'{column} = ?' for column in columns)} WHERE rowid = ?",
+                            row + (rowid,))
+                    else:
+                        rowid = conn.execute(
+                            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", row).lastrowid
+                    mapped[str(k)] = rowid
+                    conn.execute("INSERT INTO sync_mapa (tabela, chave_origem, rowid_local) VALUES (?, ?, ?)",
+                                 (table, str(k), rowid))
+            conn.execute("""
+                INSERT INTO sync_estado (tabela, watermark, chave, linhas, sincronizado_em, erro)
+                VALUES (?, ?, ?, ?, ?, NULL)
+                ON CONFLICT(tabela) DO UPDATE SET watermark = excluded.watermark, chave = excluded.chave,
+                    linhas = sync_estado.linhas + excluded.linhas, sincronizado_em = excluded.sincronizado_em,
+                    erro = NULL
+            """, (table, last_watermark, last_key, len(rows), now))
+        self.db_handler.write_call(write).result()
+
+    def match_local(self, conn, table, columns, row):
+        # rowid local ainda sem mapa com a mesma chave natural (NATURAL_KEYS), ou None
+        if table not in NATURAL_KEYS:
+            return None
+        key_columns, tie_break = NATURAL_KEYS[table]
+        values = dict(zip(columns, row))
+        found = conn.execute(f"""
+            SELECT rowid FROM {table} AS local
+            WHERE {' AND '.join(f'{column} IS ?' for column in key_columns)}
+              AND NOT EXISTS (SELECT 1 FROM sync_mapa WHERE tabela = ? AND rowid_local = local.rowid)
+            ORDER BY {tie_break} IS ? DESC, rowid
+            LIMIT 1
+        """, (*(values[column] for column in key_columns), table, values.get(tie_break))).fetchone()
+        return found[0] if found else None
+
+    def record_error(self, table, error):
+        try:
+            self.db_handler.write("""
+                INSERT INTO sync_estado (tabela, erro) VALUES (?, ?)
+                ON CONFLICT(tabela) DO UPDATE SET erro = excluded.erro
+            """, (table, str(error))).result()
+        except Exception as e:
+            print(f"Erro ao registrar falha de sincronização: {e}")
+
+    def lag(self):
+        # {tabela: {'pendentes', 'watermark_local', 'watermark_origem', 'segundos_desde_sync', 'erro'}}
+        report = {}
+        conn = self.source.connect()
+        try:
+            for table in self.tables:
+                last_watermark, last_key, _count, synced = self.state(table)
+                error = self.db_handler.read("SELECT erro FROM sync_estado WHERE tabela = ?", (table,))
+                pending, remote = None, None
+                try:
+                    key, watermark = self.source_key(conn, table)
+                    body = f"COUNT(*), MAX({watermark}) FROM {table}"
+                    params = ()
+                    if last_watermark is not None:
+                        body += f" WHERE ({watermark} > ? OR ({watermark} = ? AND {key} > ?))"
+                        params = (last_watermark, last_watermark, last_key)
+                    pending, remote = conn.cursor().execute(f"SELECT {body}", params).fetchone()
+                except Exception as e:
+                    # Uma tabela com erro na origem não impede o relatório das demais
+                    error = [(str(e),)]
+                report[table] = {
+                    'pendentes': pending,
+                    'watermark_local': last_watermark,
+                    'watermark_origem': remote if pending else last_watermark,
+                    'segundos_desde_sync': time.time() - time.mktime(time.strptime(synced, "%Y-%m-%d %H:%M:%S"))
+                    if synced else None,
+                    'erro': error[0][0] if error else None,
+                }
+        finally:
+            conn.close()
+        return report
+
+
+def print_lag(report):
+    for table, entry in report.items():
+        since = entry['segundos_desde_sync']
+        since = f"{since:.0f} s" if since is not None else "nunca"
+        pending = entry['pendentes'] if entry['pendentes'] is not None else '?'
+        print(f"{table:<20} pendentes: {pending:>8}  watermark local: {entry['watermark_local']}  "
+              f"origem: {entry['watermark_origem']}  último sync: {since}"
+              + (f"  erro: {entry['erro']}" if entry['erro'] else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sincronização incremental do banco central para o mesalpha.db")
+    parser.add_argument('--db', default='mesalpha.db')
+    parser.add_argument('--source', required=True,
+                        help="sqlite:caminho.db ou connection string ODBC do servidor central")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--lag', action='store_true', help="Só mostra o atraso de cada tabela")
+    parser.add_argument('--watch', action='store_true', help="Continua sincronizando a cada --interval segundos")
+    parser.add_argument('--interval', type=float, default=SYNC_INTERVAL)
+    parser.add_argument('--watermark', action='append', default=[], metavar='TABELA=EXPRESSAO',
+                        help="Watermark de uma tabela na origem, ex.: coluna de data de alteração")
+    args = parser.parse_args()
+    try:
+        tables = sync_tables(args.watermark)
+    except ValueError as e:
+        parser.error(str(e))
+
+    from database.db_handler import DatabaseHandler
+    db = DatabaseHandler(args.db)
+    engine = SyncEngine(db, open_source(args.source), tables, batch_size=args.batch_size, interval=args.interval)
+    try:
+        if not args.lag:
+            while True:
+                start = time.perf_counter()
+                applied = engine.sync()
+                print(f"{sum(applied.values())} linhas em {time.perf_counter() - start:.2f} s: {applied}")
+                if not args.watch:
+                    break
+                time.sleep(args.interval)
+        print_lag(engine.lag())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
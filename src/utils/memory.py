@@ -0,0 +1,129 @@
+import os
+import time
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+DEFAULT_BUDGET_MB = 256
+
+
+def dataframe_bytes(df):
+    if df is None:
+        return 0
+    # deep=True conta o conteúdo das strings (colunas object), que é a maior parte de TabelaTeste
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def array_bytes(*arrays):
+    return sum(int(getattr(array, 'nbytes', 0)) for array in arrays)
+
+
+def process_rss():
+    # RSS do processo inteiro (Python, Qt, matplotlib); só informativo, o orçamento usa as estimativas por página
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def format_bytes(size):
+    if size is None:
+        return "n/d"
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.2f} GB"
+
+
+class MemoryBudget:
+    # Páginas registradas expõem memory_footprint() -> {componente: bytes}, release_memory() e
+    # restore_memory(). Acima do orçamento, as páginas ocultas usadas há mais tempo liberam dados e
+    # canvases; ao voltarem a ser exibidas (touch no showEvent) são reconstruídas
+    def __init__(self, budget_bytes=None):
+        if budget_bytes is None:
+            budget_bytes = int(float(os.environ.get('MESALPHA_MEMORY_BUDGET_MB', DEFAULT_BUDGET_MB)) * 1024 * 1024)
+        self.budget_bytes = budget_bytes
+        self.pages = {}
+        self.evictions = 0
+
+    def register(self, name, page):
+        self.pages[name] = {'page': page, 'last_used': time.monotonic(), 'evicted': False}
+        page.destroyed.connect(lambda *_: self.unregister(name))
+
+    def unregister(self, name):
+        self.pages.pop(name, None)
+
+    def set_budget(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.enforce()
+
+    def touch(self, page):
+        # Chamado quando a página aparece: reconstrói o que foi liberado e marca como usada agora
+        entry = self._entry(page)
+        if entry is None:
+            return
+        entry['last_used'] = time.monotonic()
+        if entry['evicted']:
+            entry['evicted'] = False
+            try:
+                page.restore_memory()
+            except Exception as e:
+                print(f"Erro ao reconstruir página: {e}")
+        self.enforce()
+
+    def _entry(self, page):
+        return next((entry for entry in self.pages.values() if entry['page'] is page), None)
+
+    def footprint(self, page):
+        try:
+            return page.memory_footprint()
+        except Exception as e:
+            print(f"Erro ao medir memória da página: {e}")
+            return {}
+
+    def usage(self):
+        # [(nome, bytes, componentes, visível, liberada)] da maior para a menor
+        rows = []
+        for name, entry in list(self.pages.items()):
+            page = entry['page']
+            parts = self.footprint(page)
+            rows.append((name, sum(parts.values()), parts, page.isVisible(), entry['evicted']))
+        rows.sort(key=lambda row: row[1], reverse=True)
+        return rows
+
+    def total(self):
+        return sum(row[1] for row in self.usage())
+
+    def enforce(self, force=False):
+        # force=True libera todas as páginas ocultas, independente do orçamento
+        usage = {name: size for name, size, _parts, _visible, _evicted in self.usage()}
+        total = sum(usage.values())
+        if not force and total <= self.budget_bytes:
+            return 0
+        candidates = sorted(
+            (entry['last_used'], name) for name, entry in self.pages.items()
+            if not entry['evicted'] and not entry['page'].isVisible())
+        released = 0
+        for _last_used, name in candidates:
+            if not force and total <= self.budget_bytes:
+                break
+            entry = self.pages[name]
+            try:
+                entry['page'].release_memory()
+            except Exception as e:
+                print(f"Erro ao liberar memória da página {name}: {e}")
+                continue
+            entry['evicted'] = True
+            total -= usage.get(name, 0)
+            released += 1
+            self.evictions += 1
+        return released
+
+
+memory_budget = MemoryBudget()
@@ -0,0 +1,126 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'category', 'args', 'start')
+
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args = dict(self.args or {}, error=exc_type.__name__)
+        self.tracer.record(self.name, self.category, self.start, end - self.start, self.args)
+        return False
+
+
+class Tracer:
+    def __init__(self, max_spans=20000):
+        self.enabled = os.environ.get('MESALPHA_TRACE') == '1'
+        self.spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter_ns()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+
+    def span(self, name, category='app', **args):
+        # Desligado, devolve um objeto compartilhado: custo de uma checagem de atributo
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, category, args or None)
+
+    def traced(self, name=None, category='app'):
+        def decorator(func):
+            label = name or func.__qualname__
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Span(self, label, category, None):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, name, category, start_ns, duration_ns, args=None):
+        with self._lock:
+            self.spans.append((name, category, start_ns, duration_ns, threading.get_ident(), args))
+
+    def recent(self, count=50):
+        with self._lock:
+            return list(self.spans)[-count:]
+
+    def summary(self):
+        stats = {}
+        with self._lock:
+            spans = list(self.spans)
+        for name, category, _start, duration, _tid, _args in spans:
+            entry = stats.setdefault(name, {'category': category, 'count': 0, 'total_ms': 0.0,
+                                            'max_ms': 0.0, 'last_ms': 0.0})
+            ms = duration / 1e6
+            entry['count'] += 1
+            entry['total_ms'] += ms
+            entry['max_ms'] = max(entry['max_ms'], ms)
+            entry['last_ms'] = ms
+        return stats
+
+    def to_chrome_trace(self):
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self.spans)
+        events = []
+        for name, category, start, duration, tid, args in spans:
+            event = {
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': (start - self._origin) / 1000,
+                'dur': duration / 1000,
+                'pid': pid,
+                'tid': tid,
+            }
+            if args:
+                event['args'] = {key: str(value) for key, value in args.items()}
+            events.append(event)
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, file_path):
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_chrome_trace(), f)
+
+
+tracer = Tracer()
+span = tracer.span
+traced = tracer.traced